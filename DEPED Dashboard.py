@@ -1,14 +1,434 @@
 
-from dash import Dash, html, dcc, Input, Output, State, ctx, callback_context
-import plotly.express as px
+from dash import Dash, html, dcc, dash_table, Input, Output, State, ctx, callback_context
 import dash
-import pandas as pd
+import argparse
 import base64
+import collections
+import concurrent.futures
+import contextlib
+import contextvars
+import flask
+import functools
+import hashlib
+import importlib
+import importlib.util
 import io
-from dash.exceptions import PreventUpdate
+import json
+import logging
+import math
+import multiprocessing
+import operator
+import os
+import re
+import threading
+import time
+import urllib.parse
+import warnings
+import xml.sax.saxutils
+import zipfile
+from dash.exceptions import MissingCallbackContextException, PreventUpdate
+import deped.engine
+from deped.analytics import (add_baselines, add_views, dataset_mask, filtered_view, growth_summary, national_baseline,
+                             parse_upload, read_dataset, selection_key)
+from deped.columns import (ALL_GENDER_COLUMNS, ELEMENTARY_FEMALE, ELEMENTARY_MALE, FILTER_COLUMNS, JUNIOR_FEMALE,
+                           JUNIOR_MALE, K10_LEVELS, LEVEL_COLUMNS, SENIOR_FEMALE, SENIOR_MALE, STRAND_COLUMNS)
+from deped.engine import (ENGINES, LazyModule, arrow_table, clean_columns, column_sums, concat_frames,
+                          empty_frame, fill_missing, grouped_sums, is_polars, load_records, masked_rows, np, pd,
+                          pq, read_parquet_file, read_upload, row_chunks, row_count, row_mask, row_sums,
+                          set_engine, to_records, write_parquet)
+from deped.indexes import (BLOCKS, FILTER_INDEXES, SEARCH_COLUMNS, VIEW_CACHE, EnrollmentBlocks, FilterIndex,
+                           LRUCache, ValueSearch)
+
+
+# Plotly Express takes a large share of the import time, so a worker loads it on the first figure instead of at
+# boot; the data helpers in the deped package load pandas and NumPy the same way
+px = LazyModule('plotly.express')
+go = LazyModule('plotly.graph_objects')
+
+# =========================================================== INSTRUMENTATION ============================================================================
+# Every callback registered with app.callback is timed. Callbacks mark their own phases with `timed(...)`:
+# 'parse' (rebuilding frames from dcc.Store records), 'ingest' (reading uploads), 'aggregate' and 'figure'.
+# Request and response sizes come from the HTTP exchange. The results are served as Prometheus histograms
+# on /metrics and, when DEPED_METRICS_LOG is set (a file path, or '-' for stderr), also logged as one JSON
+# object per callback call.
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216, 67108864)
+
+_current_record = contextvars.ContextVar('callback_record', default=None)
+metrics_logger = logging.getLogger('deped.metrics')
+
+
+class Histogram:
+    """A labelled Prometheus histogram rendered in the text exposition format"""
+
+    def __init__(self, name, help_text, buckets, label_names):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.label_names = label_names
+        self.series = {}
+
+    def observe(self, labels, value):
+        series = self.series.setdefault(labels, {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0})
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series['buckets'][i] += 1
+        series['sum'] += value
+        series['count'] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        for labels, series in sorted(self.series.items()):
+            label_text = ','.join(f'{name}="{value}"' for name, value in zip(self.label_names, labels))
+            for bound, count in zip(self.buckets, series['buckets']):
+                lines.append(f'{self.name}_bucket{{{label_text},le="{bound:g}"}} {count}')
+            lines.append(f'{self.name}_bucket{{{label_text},le="+Inf"}} {series["count"]}')
+            lines.append(f'{self.name}_sum{{{label_text}}} {series["sum"]:.6f}')
+            lines.append(f'{self.name}_count{{{label_text}}} {series["count"]}')
+        return lines
+
+
+class CallbackMetrics:
+    """Per-callback wall time, phase time and payload size histograms"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.duration = Histogram('deped_callback_duration_seconds', 'Wall time of a Dash callback.',
+                                  DURATION_BUCKETS, ('callback', 'status'))
+        self.phases = Histogram('deped_callback_phase_seconds', 'Time spent in one phase of a Dash callback.',
+                                DURATION_BUCKETS, ('callback', 'phase'))
+        self.request_bytes = Histogram('deped_callback_request_bytes', 'Size of the callback request body.',
+                                       SIZE_BUCKETS, ('callback',))
+        self.response_bytes = Histogram('deped_callback_response_bytes', 'Size of the callback response body.',
+                                        SIZE_BUCKETS, ('callback',))
+
+    def observe(self, record):
+        name = record['callback']
+        with self.lock:
+            self.duration.observe((name, record['status']), record['wall'])
+            for phase, seconds in record['phases'].items():
+                self.phases.observe((name, phase), seconds)
+            if 'request_bytes' in record:
+                self.request_bytes.observe((name,), record['request_bytes'])
+                self.response_bytes.observe((name,), record['response_bytes'])
+
+        if metrics_logger.handlers:
+            metrics_logger.info(json.dumps({
+                'ts': round(time.time(), 3),
+                'callback': name,
+                'status': record['status'],
+                'wall_ms': round(record['wall'] * 1000, 3),
+                **{f'{phase}_ms': round(seconds * 1000, 3) for phase, seconds in record['phases'].items()},
+                'request_bytes': record.get('request_bytes'),
+                'response_bytes': record.get('response_bytes'),
+            }))
+
+    def render(self):
+        with self.lock:
+            histograms = (self.duration, self.phases, self.request_bytes, self.response_bytes)
+            return '\n'.join(line for histogram in histograms for line in histogram.render()) + '\n'
+
+
+CALLBACK_METRICS = CallbackMetrics()
+
+
+@contextlib.contextmanager
+def timed(phase):
+    """
+    Add the time spent in the block to `phase` of the callback that is running; a call a newer one of the same
+    session has superseded stops here instead of starting the phase
+    """
+    drop_if_superseded()
+    record = _current_record.get()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if record is not None:
+            record['phases'][phase] = record['phases'].get(phase, 0.0) + time.perf_counter() - start
+
+
+def instrument(func):
+    """Time a callback; inside a request the sizes are added and the record is finished after the response"""
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        record = {'callback': func.__name__, 'phases': {}, 'status': 'ok'}
+        token = _current_record.set(record)
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        except PreventUpdate:
+            # Calls the scheduler turned away or cancelled keep that status
+            record['status'] = 'prevented' if record['status'] == 'ok' else record['status']
+            raise
+        except Exception:
+            record['status'] = 'error'
+            raise
+        finally:
+            record['wall'] = time.perf_counter() - start
+            _current_record.reset(token)
+            if flask.has_request_context():
+                flask.g.callback_record = record
+            else:
+                CALLBACK_METRICS.observe(record)
+
+    return wrapper
+
+
+class InstrumentedDash(Dash):
+    """
+    A Dash app whose callbacks are all wrapped by `instrument`; callbacks registered with heavy=True also go
+    through the admission scheduler, and those registered with coalesce=True only drop their superseded calls.
+    Scheduled callbacks also get the browser tab's id as a last State, which the scheduler takes off again.
+    """
+
+    def callback(self, *args, heavy=False, coalesce=False, **kwargs):
+        if not (heavy or coalesce):
+            register = super().callback(*args, **kwargs)
+            return lambda func: register(instrument(func))
+        register = super().callback(*args, State(TAB_STORE, 'data'), **kwargs)
+        return lambda func: register(instrument(admitted(func, heavy)))
+
+
+def register_metrics(server):
+    """Add the /metrics route and the hooks that attach payload sizes to callback records"""
+
+    @server.after_request
+    def record_callback_payload(response):
+        record = flask.g.pop('callback_record', None)
+        if record is not None:
+            record['request_bytes'] = flask.request.content_length or 0
+            record['response_bytes'] = response.calculate_content_length() or 0
+            CALLBACK_METRICS.observe(record)
+        return response
+
+    @server.teardown_request
+    def record_failed_callback(exc):
+        # after_request is skipped when a callback raises, the record is still counted
+        record = flask.g.pop('callback_record', None)
+        if record is not None:
+            CALLBACK_METRICS.observe(record)
+
+    @server.route('/metrics')
+    def metrics():
+        if flask.request.remote_addr not in ('127.0.0.1', '::1') and not os.environ.get('DEPED_METRICS_PUBLIC'):
+            flask.abort(403)
+        return flask.Response(CALLBACK_METRICS.render(), mimetype='text/plain; version=0.0.4')
+
+
+if os.environ.get('DEPED_METRICS_LOG'):
+    _log_target = os.environ['DEPED_METRICS_LOG']
+    _handler = logging.StreamHandler() if _log_target == '-' else logging.FileHandler(_log_target)
+    _handler.setFormatter(logging.Formatter('%(message)s'))
+    metrics_logger.addHandler(_handler)
+    metrics_logger.setLevel(logging.INFO)
+    metrics_logger.propagate = False
+
+# =========================================================== END OF INSTRUMENTATION =====================================================================
+
+# =========================================================== ADMISSION CONTROL ==========================================================================
+# Callbacks registered with heavy=True (the full aggregations behind the dashboards) run at most DEPED_HEAVY_SLOTS at
+# a time per worker. The excess waits in a queue served round-robin across browser sessions, so one session cannot
+# starve the others, and a session's newer call of a callback replaces its older one still in the queue. Past
+# DEPED_HEAVY_QUEUE waiting calls, or after DEPED_HEAVY_WAIT seconds in the queue, a call is turned away and the
+# browser keeps its current output. Cheap callbacks never wait; keep DEPED_HEAVY_QUEUE below the server's thread
+# count so they always find a free thread. The time spent waiting is the 'queue' phase of the callback metrics,
+# and turned away calls are counted with the status 'rejected' or 'cancelled'. Sessions are told apart by a cookie;
+# callbacks called outside a request (the benchmarks, the report renderer) are not scheduled.
+#
+# Heavy callbacks, and cheap ones registered with coalesce=True (the dropdown options), are also coalesced: only the
+# latest call per browser tab and callback is worth finishing, since the tab drops the outputs of the older ones.
+# Tabs are told apart by an id the layout hands each page load, as every tab of a browser shares the cookie. Calls
+# that only refresh a searched dropdown are coalesced apart from the full refreshes, so typing cannot cancel one. A
+# running call that a newer one has superseded stops at its next `timed` phase, or before its outputs are sent, with
+# the status 'cancelled'. Picking five provinces in a row then computes the last filter state instead of all five.
+# A running call is only cancelled once its successor is admitted, never for one that is still queued or turned away.
+HEAVY_SLOTS = int(os.environ.get('DEPED_HEAVY_SLOTS', '2'))
+HEAVY_QUEUE = int(os.environ.get('DEPED_HEAVY_QUEUE', '16'))
+HEAVY_WAIT = float(os.environ.get('DEPED_HEAVY_WAIT', '30'))
+SESSION_COOKIE = 'deped_session'
+TAB_STORE = 'tab-id'
+
+
+class Ticket:
+    """
+    One scheduled call: 'waiting' in the queue, then 'admitted', or turned away as 'rejected' or 'cancelled'. An
+    admitted call becomes 'superseded' once a newer call with the same key is admitted, and still holds its slot.
+    """
+    __slots__ = ('session', 'key', 'slotted', 'state')
+
+    def __init__(self, session, key, slotted):
+        self.session = session
+        self.key = key
+        self.slotted = slotted
+        self.state = 'waiting'
+
+
+class HeavyScheduler:
+    """Slots for heavy callbacks, with a bounded queue served round-robin across sessions"""
+
+    def __init__(self, slots, queue_limit):
+        self.slots = slots
+        self.queue_limit = queue_limit
+        self.running = 0
+        self.queued = 0
+        # Waiting tickets per session; the session at the front is served next and then moves to the back
+        self.waiting = collections.OrderedDict()
+        # The queued and the newest admitted call per coalescing key (browser tab and callback). An admitted call
+        # cancels the older one still running; a call that is turned away leaves both as they are.
+        self.queued_calls = {}
+        self.admitted_calls = {}
+        self.condition = threading.Condition()
+
+    def acquire(self, session, key, timeout, slotted=True):
+        """
+        A ticket for the call once it is admitted, turned away, or replaced by a newer call with the same key; calls
+        that are not slotted are admitted at once and only registered as the latest call with their key. The queue is
+        served round-robin by `session`.
+        """
+        with self.condition:
+            ticket = Ticket(session, key, slotted)
+            if not slotted or (self.running < self.slots and not self.queued):
+                self.running += 1 if slotted else 0
+                self._admit(ticket)
+                return ticket
+
+            # A newer call takes the queued call's place, so replacing it never finds the queue full
+            older = self.queued_calls.get(key)
+            if older is not None:
+                self._drop(older, 'cancelled')
+            elif self.queued >= self.queue_limit:
+                ticket.state = 'rejected'
+                return ticket
+
+            self.waiting.setdefault(session, collections.deque()).append(ticket)
+            self.queued_calls[key] = ticket
+            self.queued += 1
+            deadline = time.monotonic() + timeout
+            while ticket.state == 'waiting':
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._drop(ticket, 'rejected')
+                    break
+                self.condition.wait(remaining)
+            return ticket
+
+    def release(self, ticket):
+        """Free the slot of an admitted call and admit the next waiting ones"""
+        with self.condition:
+            if self.admitted_calls.get(ticket.key) is ticket:
+                del self.admitted_calls[ticket.key]
+            if not ticket.slotted:
+                return
+            self.running -= 1
+            while self.running < self.slots and self.waiting:
+                session, queue = next(iter(self.waiting.items()))
+                waiting = queue.popleft()
+                del self.queued_calls[waiting.key]
+                self.queued -= 1
+                self.running += 1
+                self._admit(waiting)
+                if queue:
+                    self.waiting.move_to_end(session)
+                else:
+                    del self.waiting[session]
+            self.condition.notify_all()
+
+    def _admit(self, ticket):
+        older = self.admitted_calls.get(ticket.key)
+        if older is not None:
+            older.state = 'superseded'
+        self.admitted_calls[ticket.key] = ticket
+        ticket.state = 'admitted'
+
+    def _drop(self, ticket, state):
+        queue = self.waiting[ticket.session]
+        queue.remove(ticket)
+        if not queue:
+            del self.waiting[ticket.session]
+        del self.queued_calls[ticket.key]
+        self.queued -= 1
+        ticket.state = state
+        self.condition.notify_all()
+
+
+HEAVY_SCHEDULER = HeavyScheduler(HEAVY_SLOTS, HEAVY_QUEUE)
+_current_ticket = contextvars.ContextVar('callback_ticket', default=None)
+
+
+def session_id():
+    """Browser session of the running request, from its cookie or the one about to be set"""
+    return flask.request.cookies.get(SESSION_COOKIE) or flask.g.setdefault('new_session', os.urandom(12).hex())
+
+
+def coalescing_key(tab, func):
+    """Calls of `func` from one tab replace each other, apart from those that only refresh a searched dropdown"""
+    searching = any(prop.endswith('.search_value') for prop in triggered_props())
+    return tab, func.__name__, 'search' if searching else 'refresh'
+
+
+def turn_away(state):
+    """Leave the outputs of the running callback as they are, counting the call with `state`"""
+    record = _current_record.get()
+    if record is not None:
+        record['status'] = state
+    raise PreventUpdate
+
+
+def drop_if_superseded():
+    """Stop the running callback if a newer call of it from the same tab has been admitted"""
+    ticket = _current_ticket.get()
+    if ticket is not None and ticket.state == 'superseded':
+        turn_away('cancelled')
+
+
+def admitted(func, slotted=True):
+    """
+    Run a callback once the scheduler admits it, taking one of the heavy slots if `slotted`; a call it turns away or
+    a newer call supersedes leaves the outputs as they are
+    """
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not flask.has_request_context():
+            return func(*args, **kwargs)
+        # The tab id State added by InstrumentedDash.callback
+        *args, tab = args
+        with timed('queue'):
+            key = coalescing_key(tab or session_id(), func)
+            ticket = HEAVY_SCHEDULER.acquire(session_id(), key, HEAVY_WAIT, slotted)
+        if ticket.state in ('rejected', 'cancelled'):
+            turn_away(ticket.state)
+        token = _current_ticket.set(ticket)
+        try:
+            drop_if_superseded()
+            outputs = func(*args, **kwargs)
+            drop_if_superseded()
+            return outputs
+        finally:
+            _current_ticket.reset(token)
+            HEAVY_SCHEDULER.release(ticket)
+
+    return wrapper
+
+
+def register_sessions(server):
+    """Give every browser a session cookie on its first response"""
+
+    @server.after_request
+    def set_session_cookie(response):
+        if SESSION_COOKIE not in flask.request.cookies:
+            response.set_cookie(SESSION_COOKIE, flask.g.get('new_session') or os.urandom(12).hex(),
+                                httponly=True, samesite='Lax')
+        return response
+
+# =========================================================== END OF ADMISSION CONTROL ===================================================================
 
 # Initialize the Dash app
-app = Dash(__name__, suppress_callback_exceptions=True)
+app = InstrumentedDash(__name__, suppress_callback_exceptions=True)
+register_metrics(app.server)
+register_sessions(app.server)
 
 # =========================================================== STYLING =====================================================================================
 # Styling
@@ -252,906 +672,1427 @@ enrollment_chart_style = {
 # =========================================================== END OF STYLING =============================================================================
 
 # =========================================================== LAYOUTS =====================================================================================
-app.layout = html.Div([
-    dcc.Location(id='url', refresh=False),
-    html.Div(id='page-content')
-])
+def serve_layout():
+    """Served on every page load, so each browser tab gets its own id for the scheduler"""
+    return html.Div([
+        dcc.Location(id='url', refresh=False),
+        dcc.Store(id=TAB_STORE, data=os.urandom(12).hex(), storage_type='memory'),
+        html.Div(id='page-content')
+    ])
 
-# Main Dashboard Layout
-main_dashboard_layout = html.Section([
-    dcc.Store(id='stored-data'),
 
-    # Header with Logo
-    html.Div([
-        # Left side with logo and title
+app.layout = serve_layout
+
+# Main Dashboard Layout
+@functools.lru_cache(maxsize=None)
+def main_dashboard_layout():
+    """Built on the first request for the page and reused after that"""
+    return html.Section([
+        dcc.Store(id='stored-data'),
+        dcc.Store(id='national-baseline', storage_type='local'),
+
+        # Header with Logo
         html.Div([
-            html.Img(
-                src='https://upload.wikimedia.org/wikipedia/commons/f/fa/Seal_of_the_Department_of_Education_of_the_Philippines.png',
-                style={'height': '100px', 'marginRight': '8px'}
-            ),
+            # Left side with logo and title
             html.Div([
-                html.H1("REPUBLIC OF THE PHILIPPINES",
-                        style={'fontFamily': "'EB Garamond', serif", 'fontSize': '22px', 'margin': '0', 'marginBottom': '3px', 'fontWeight': '400'}),
-                html.H2("DEPARTMENT OF EDUCATION",
-                        style={'fontFamily': "'EB Garamond', serif", 'fontSize': '36px', 'margin': '0', 'fontWeight': '500'})
-            ], style=header_text_style)
-        ], style={'display': 'flex', 'alignItems': 'center'}),
+                html.Img(
+                    src='https://upload.wikimedia.org/wikipedia/commons/f/fa/Seal_of_the_Department_of_Education_of_the_Philippines.png',
+                    style={'height': '100px', 'marginRight': '8px'}
+                ),
+                html.Div([
+                    html.H1("REPUBLIC OF THE PHILIPPINES",
+                            style={'fontFamily': "'EB Garamond', serif", 'fontSize': '22px', 'margin': '0', 'marginBottom': '3px', 'fontWeight': '400'}),
+                    html.H2("DEPARTMENT OF EDUCATION",
+                            style={'fontFamily': "'EB Garamond', serif", 'fontSize': '36px', 'margin': '0', 'fontWeight': '500'})
+                ], style=header_text_style)
+            ], style={'display': 'flex', 'alignItems': 'center'}),
 
-        # Right side status
-        html.Div(id='header-status', style={'color': COLORS['accent'], 'fontSize': '13px'}),
+            # Right side status
+            html.Div(id='header-status', style={'color': COLORS['accent'], 'fontSize': '13px'}),
+
+        ], style={
+            **upper_header_style,
+            'display': 'flex',
+            'justifyContent': 'space-between',
+            'alignItems': 'center'
+        }),
 
-    ], style={
-        **upper_header_style,
-        'display': 'flex',
-        'justifyContent': 'space-between',
-        'alignItems': 'center'
-    }),
-
-    html.Div([
-        html.H3("School Enrollment Dashboard",
-                style={'fontFamily': 'Arial, sans-serif',
-                       'color': COLORS['primary'],
-                       'fontWeight': 'bold',
-                       'fontSize': '40px',
-                       'margin': '24px 0',
-                       'marginLeft' : '20px',
-                       'textAlign': 'left'})
-    ]),
-
-    # Upload Controls and Compare Button
-    html.Div([
-        # Left side with upload controls
         html.Div([
-            dcc.Upload(
-                id='upload-dataset',
-                children=html.Button('Upload Data', style=primary_button_style),
-                multiple=False
-            ),
-            html.Button('Clear Data', id='clear-btn', style=danger_button_style),
-            html.Div(id='output-upload')
-        ], style={'display': 'flex', 'alignItems': 'center', 'gap': '10px', 'flex': '1'}),
-
-        # Right side with compare button
-        dcc.Link(
-            html.Button('Compare Dashboard', style={
-                **button_style,
-                'backgroundColor': COLORS['green'],
-                'color': 'white',
-                'marginRight': 'auto'
-            }),
-            href='/comparison-dashboard'
-        )
-    ], style={
-        **header_style,
-        'display': 'flex',
-        'justifyContent': 'space-between',
-        'alignItems': 'center'
-    }),
-
-    # Main Content Area
-    html.Div([
-        # Left: Filters
+            html.H3("School Enrollment Dashboard",
+                    style={'fontFamily': 'Arial, sans-serif',
+                           'color': COLORS['primary'],
+                           'fontWeight': 'bold',
+                           'fontSize': '40px',
+                           'margin': '24px 0',
+                           'marginLeft' : '20px',
+                           'textAlign': 'left'})
+        ]),
+
+        # Upload Controls and Compare Button
+        html.Div([
+            # Left side with upload controls
+            html.Div([
+                dcc.Upload(
+                    id='upload-dataset',
+                    children=html.Button('Upload Data', style=primary_button_style),
+                    multiple=True
+                ),
+                dcc.Upload(
+                    id='append-dataset',
+                    children=html.Button('Append Division File', style={
+                        **button_style,
+                        'backgroundColor': COLORS['secondary'],
+                        'color': 'white'
+                    }),
+                    multiple=False
+                ),
+                html.Button('Clear Data', id='clear-btn', style=danger_button_style),
+                html.Div("No file uploaded yet.", id='output-upload'),
+                html.Div(id='export-links')
+            ], style={'display': 'flex', 'alignItems': 'center', 'gap': '10px', 'flex': '1'}),
+
+            # Right side with the GPI explorer and compare buttons
+            html.Div([
+                dcc.Link(
+                    html.Button('GPI Explorer', style={
+                        **button_style,
+                        'backgroundColor': COLORS['purple'],
+                        'color': 'white'
+                    }),
+                    href='/gpi'
+                ),
+                dcc.Link(
+                    html.Button('Compare Dashboard', style={
+                        **button_style,
+                        'backgroundColor': COLORS['green'],
+                        'color': 'white',
+                        'marginRight': 'auto'
+                    }),
+                    href='/comparison-dashboard'
+                )
+            ], style={'display': 'flex'})
+        ], style={
+            **header_style,
+            'display': 'flex',
+            'justifyContent': 'space-between',
+            'alignItems': 'center'
+        }),
+
+        # Main Content Area
         html.Div([
-            html.Button("Clear Filters", id="clear_btn", style=filter_button_style),
+            # Left: Filters
+            html.Div([
+                html.Button("Clear Filters", id="clear_btn", style=filter_button_style),
 
-            html.Label("Region", style=filter_label_style),
-            dcc.Dropdown(id="region_dd", placeholder="Select Region(s)", multi=True,
-                         style=dropdown_style),
+                html.Label("Region", style=filter_label_style),
+                dcc.Dropdown(id="region_dd", placeholder="Select Region(s)", multi=True,
+                             style=dropdown_style),
 
-            html.Label("Province", style=filter_label_style),
-            dcc.Dropdown(id="province_dd", placeholder="Select Province(s)", multi=True,
-                         style=dropdown_style),
+                html.Label("Province", style=filter_label_style),
+                dcc.Dropdown(id="province_dd", placeholder="Select Province(s)", multi=True,
+                             style=dropdown_style),
 
-            html.Label("Division", style=filter_label_style),
-            dcc.Dropdown(id="division_dd", placeholder="Select Division(s)", multi=True,
-                         style=dropdown_style),
+                html.Label("Division", style=filter_label_style),
+                dcc.Dropdown(id="division_dd", placeholder="Select Division(s)", multi=True,
+                             style=dropdown_style),
 
-            html.Label("District", style=filter_label_style),
-            dcc.Dropdown(id="district_dd", placeholder="Select District(s)", multi=True,
-                         style=dropdown_style),
+                html.Label("District", style=filter_label_style),
+                dcc.Dropdown(id="district_dd", placeholder="Select District(s)", multi=True,
+                             search_order='original', style=dropdown_style),
 
-            html.Label("Municipality", style=filter_label_style),
-            dcc.Dropdown(id="municipality_dd", placeholder="Select Municipality(s)", multi=True,
-                         style=dropdown_style),
+                html.Label("Municipality", style=filter_label_style),
+                dcc.Dropdown(id="municipality_dd", placeholder="Select Municipality(s)", multi=True,
+                             search_order='original', style=dropdown_style),
 
-            html.Label("Legislative District", style=filter_label_style),
-            dcc.Dropdown(id="legislative_district_dd", placeholder="Select Legislative District(s)", multi=True,
-                         style=dropdown_style),
+                html.Label("Legislative District", style=filter_label_style),
+                dcc.Dropdown(id="legislative_district_dd", placeholder="Select Legislative District(s)", multi=True,
+                             style=dropdown_style),
 
-            html.Label("Sector", style=filter_label_style),
-            dcc.Dropdown(id="sector_dd", placeholder="Select Sector(s)", multi=True,
-                         style=dropdown_style),
+                html.Label("Sector", style=filter_label_style),
+                dcc.Dropdown(id="sector_dd", placeholder="Select Sector(s)", multi=True,
+                             style=dropdown_style),
 
-            html.Label("School Type", style=filter_label_style),
-            dcc.Dropdown(id="school_type_dd", placeholder="Select School Type(s)", multi=True,
-                         style=dropdown_style),
+                html.Label("School Type", style=filter_label_style),
+                dcc.Dropdown(id="school_type_dd", placeholder="Select School Type(s)", multi=True,
+                             style=dropdown_style),
 
-            html.Label("Modified COC", style=filter_label_style),
-            dcc.Dropdown(id="modified_coc_dd", placeholder="Select Modified COC(s)", multi=True,
-                         style=dropdown_style),
+                html.Label("Modified COC", style=filter_label_style),
+                dcc.Dropdown(id="modified_coc_dd", placeholder="Select Modified COC(s)", multi=True,
+                             style=dropdown_style),
 
-            html.Label("Subclass", style=filter_label_style),
-            dcc.Dropdown(id="school_subclass_dd", placeholder="Select Subclass(s)", multi=True,
-                         style=dropdown_style),
-        ], style=filters_container_style),
+                html.Label("Subclass", style=filter_label_style),
+                dcc.Dropdown(id="school_subclass_dd", placeholder="Select Subclass(s)", multi=True,
+                             style=dropdown_style),
+            ], style=filters_container_style),
 
-        # Right: Metrics & Charts
-        html.Div([
-            # Top row metrics
+            # Right: Metrics & Charts
             html.Div([
+                # Top row metrics
                 html.Div([
-                    html.Div(id="male_summary_card", style=male_number_style),
-                    html.Div(style=metric_label_style)
-                ], style=male_card_style),
-
-                html.Div([
-                    html.Div(id="female_summary_card", style=female_number_style),
-                    html.Div(style=metric_label_style)
-                ], style=female_card_style),
-
+                    html.Div([
+                        html.Div(id="male_summary_card", style=male_number_style),
+                        html.Div(style=metric_label_style)
+                    ], style=male_card_style),
+
+                    html.Div([
+                        html.Div(id="female_summary_card", style=female_number_style),
+                        html.Div(style=metric_label_style)
+                    ], style=female_card_style),
+
+                    html.Div([
+                        html.Div(id="total_summary_card", style=total_enrollees_number_style),
+                        html.Div(style=metric_label_style)
+                    ], style=total_enrollees_card_style),
+
+                    html.Div([
+                        html.Div(id="total_school_card", style=total_schools_number_style),
+                        html.Div(style=metric_label_style)
+                    ], style=total_schools_card_style),
+                ], style={
+                    'display': 'flex',
+                    'gap': '15px',
+                    'marginBottom': '16px',
+                    'justifyContent': 'space-between',
+                    'width': '100%'
+                }),
+
+                # Wrap both charts in a flex container
                 html.Div([
-                    html.Div(id="total_summary_card", style=total_enrollees_number_style),
-                    html.Div(style=metric_label_style)
-                ], style=total_enrollees_card_style),
-
+                    html.Div([
+                        html.H3("Educational Level Comparison", style=chart_heading_style),
+                        dcc.Graph(
+                            id="education_bar_chart",
+                            style={"height": "250px", "width": "100%"},
+                            config={'displayModeBar': False}
+                        )
+                    ], style={**enrollment_chart_style, "flex": "1"}),
+
+                    html.Div([
+                        html.H3("Average Student Count per Grade Level", style=chart_heading_style),
+                        dcc.Graph(
+                            id="enrollment_rate_chart",
+                            style={"height": "250px", "width": "100%"},
+                            config={'displayModeBar': False}
+                        )
+                    ], style={**enrollment_chart_style, "flex": "1"}),
+
+                    html.Div([
+                        html.H3("Average Student Count per Track", style=chart_heading_style),
+                        dcc.Graph(
+                            id="tracks_rate_chart",
+                            style={"height": "250px", "width": "100%"},
+                            config={'displayModeBar': False}
+                        )
+                    ], style={**enrollment_chart_style, "flex": "1"}),
+
+                ], style={"display": "flex", "gap": "15px"}),
+
+                # School Level Charts in a row layout for better comparison
                 html.Div([
-                    html.Div(id="total_school_card", style=total_schools_number_style),
-                    html.Div(style=metric_label_style)
-                ], style=total_schools_card_style),
-            ], style={
-                'display': 'flex',
-                'gap': '15px',
-                'marginBottom': '16px',
-                'justifyContent': 'space-between',
-                'width': '100%'
-            }),
-
-            # Wrap both charts in a flex container
-            html.Div([
+                    # Elementary Level
+                    html.Div([
+                        html.H3("Elementary Level", style=chart_heading_style),
+                        dcc.Graph(
+                            id="elementary_bar_chart",
+                            config={'displayModeBar': False},
+                            style={"height": "250px", "width": "100%"}
+                        )
+                    ], style={**enrollment_chart_style, "flex": "1"}),
+
+                    # Junior High School
+                    html.Div([
+                        html.H3("Junior High School", style=chart_heading_style),
+                        dcc.Graph(
+                            id="jhs_bar_chart",
+                            config={'displayModeBar': False},
+                            style={"height": "250px", "width": "100%"}
+                        )
+                    ], style={**enrollment_chart_style, "flex": "1"}),
+
+                    # Senior High School
+                    html.Div([
+                        html.H3("Senior High School", style=chart_heading_style),
+                        dcc.Graph(
+                            id="shs_bar_chart",
+                            config={'displayModeBar': False},
+                            style={"height": "250px", "width": "100%"}
+                        )
+                    ], style={**enrollment_chart_style, "flex": "1"}),
+                ], style={'display': 'flex', "gap": "15px"}),
+
+                # School size distribution, drawn with WebGL from a server-side sample
                 html.Div([
-                    html.H3("Educational Level Comparison", style=chart_heading_style),
+                    html.Div([
+                        html.H3("School Size Distribution", style=chart_heading_style),
+                        dcc.RadioItems(
+                            id='size-level',
+                            options=[{'label': 'All Levels', 'value': 'All'}] +
+                                    [{'label': level, 'value': level} for level in LEVEL_COLUMNS],
+                            value='All',
+                            inline=True,
+                            inputStyle={'marginRight': '4px', 'marginLeft': '12px'},
+                            style={'fontSize': '13px'}
+                        )
+                    ], style={'display': 'flex', 'justifyContent': 'space-between', 'alignItems': 'center'}),
                     dcc.Graph(
-                        id="education_bar_chart",
-                        style={"height": "250px", "width": "100%"},
-                        config={'displayModeBar': False}
+                        id="school_size_chart",
+                        config={'displayModeBar': False},
+                        style={"height": "420px", "width": "100%"}
                     )
-                ], style={**enrollment_chart_style, "flex": "1"}),
+                ], style={**enrollment_chart_style, 'marginTop': '15px'}),
 
+                # School-level table, paged, sorted and filtered on the server
                 html.Div([
-                    html.H3("Average Student Count per Grade Level", style=chart_heading_style),
-                    dcc.Graph(
-                        id="enrollment_rate_chart",
-                        style={"height": "250px", "width": "100%"},
-                        config={'displayModeBar': False}
+                    html.H3("Schools", style=chart_heading_style),
+                    html.Div(id='school-table-count', style={'fontSize': '14px', 'color': COLORS['accent']}),
+                    dash_table.DataTable(
+                        id='school-table',
+                        columns=SCHOOL_TABLE_COLUMNS,
+                        page_current=0,
+                        page_size=SCHOOL_PAGE_SIZE,
+                        page_action='custom',
+                        sort_action='custom',
+                        sort_mode='multi',
+                        sort_by=[],
+                        filter_action='custom',
+                        filter_query='',
+                        filter_options={'case': 'insensitive'},
+                        style_table={'overflowX': 'auto'},
+                        style_cell={'fontSize': '13px', 'fontFamily': 'inherit', 'textAlign': 'left'},
+                        style_header={'fontWeight': 'bold'}
                     )
-                ], style={**enrollment_chart_style, "flex": "1"}),
+                ], style={**enrollment_chart_style, 'marginTop': '15px'})
 
+            ], style={'flex': '1', 'width': '75%'}),
+        ], style={'display': 'flex', 'gap': '15px', 'width': '100%'}),
+    ], style={
+        'width': '100%',
+        'maxWidth': '1440px',
+        'margin': '0 auto',
+        'padding': '20px',
+        'backgroundColor': COLORS['background'],
+        'minHeight': '100vh',
+        'fontFamily': 'Helvetica Neue, Arial, sans-serif',
+        'boxSizing': 'border-box'
+    })
+
+# Comparison Dashboard Layout
+@functools.lru_cache(maxsize=None)
+def comparison_dashboard_layout():
+    """Built on the first request for the page and reused after that"""
+    return html.Section([
+
+        # Store cleaned data
+        dcc.Store(id='stored-data-present'),
+        dcc.Store(id='stored-data-previous'),
+        dcc.Store(id='baseline-present', storage_type='local'),
+        dcc.Store(id='baseline-previous', storage_type='local'),
+
+        # Header with Logo
+        html.Div([
+            # Left side with logo and title
+            html.Div([
+                html.Img(
+                    src='https://upload.wikimedia.org/wikipedia/commons/f/fa/Seal_of_the_Department_of_Education_of_the_Philippines.png',
+                    style={'height': '100px', 'marginRight': '8px'}
+                ),
                 html.Div([
-                    html.H3("Average Student Count per Track", style=chart_heading_style),
-                    dcc.Graph(
-                        id="tracks_rate_chart",
-                        style={"height": "250px", "width": "100%"},
-                        config={'displayModeBar': False}
-                    )
-                ], style={**enrollment_chart_style, "flex": "1"}),
+                    html.H1("REPUBLIC OF THE PHILIPPINES",
+                            style={'fontFamily': "'EB Garamond', serif", 'fontSize': '22px', 'margin': '0', 'marginBottom': '3px', 'fontWeight': '400'}),
+                    html.H2("DEPARTMENT OF EDUCATION",
+                            style={'fontFamily': "'EB Garamond', serif", 'fontSize': '36px', 'margin': '0', 'fontWeight': '500'})
+                ], style=header_text_style)
+            ], style={'display': 'flex', 'alignItems': 'center'}),
+
+            # Right side status
+            html.Div(id='header-status', style={'color': COLORS['accent'], 'fontSize': '13px'}),
+        ], style={
+            **upper_header_style,
+            'display': 'flex',
+            'justifyContent': 'space-between',
+            'alignItems': 'center'
+        }),
 
-            ], style={"display": "flex", "gap": "15px"}),
+        html.Div([
+            html.H3("School Enrollment Dashboard",
+                    style={'fontFamily': 'Arial, sans-serif',
+                           'color': COLORS['primary'],
+                           'fontWeight': 'bold',
+                           'fontSize': '40px',
+                           'margin': '24px 0',
+                           'marginLeft' : '20px',
+                           'textAlign': 'left'})
+        ]),
+
+        # Upload Controls
+        html.Div([
+            html.Div([
+                dcc.Upload(
+                    id='upload-data1',
+                    children=html.Button('Upload Present Year', style=primary_button_style),
+                    multiple=True,
+                    style={'marginRight': '10px'}
+                ),
+                dcc.Upload(
+                    id='upload-data2',
+                    children=html.Button('Upload Previous Year', style=primary_button_style),
+                    multiple=True,
+                    style={'marginRight': '10px'}
+                ),
+                html.Button(
+                    "Clear Files",
+                    id="clear-files-btn",
+                    style=danger_button_style
+                )
+            ], style={'display': 'flex', 'alignItems': 'center', "backgroundColor": 'white'}),
+
+            # Upload Messages
+            html.Div([
+                html.Div(id='output-data1', style={'marginRight': '20px'}),
+                html.Div(id='output-data2', style={'marginRight': '20px'}),
+                html.Div(id='export-links-comparison')
+            ], style={'display': 'flex', 'alignItems': 'center', 'marginLeft': '20px'}),
+
+            # Right side with back button
+            dcc.Link(
+                html.Button('Back to Main Dashboard', style={
+                    **button_style,
+                    'backgroundColor': COLORS['purple'],
+                    'color': 'white',
+                    'marginLeft': 'auto'  # Pushes to far right
+                }),
+                href='/'
+            )
+        ], style={
+            **header_style,
+            'display': 'flex',
+            'justifyContent': 'space-between',
+            'alignItems': 'center'
+        }),
 
-            # School Level Charts in a row layout for better comparison
+        # Main Content
+        html.Div([
+            # Left: Filters
             html.Div([
-                # Elementary Level
+                html.Button(
+                    "Clear Filters",
+                    id="clear-filters-btn",
+                    style=filter_button_style
+                ),
+
+                html.Label("Region", style=filter_label_style),
+                dcc.Dropdown(
+                    id='region-dropdown',
+                    placeholder='Select Region',
+                    multi=True,
+                    style=dropdown_style
+                ),
+
+                html.Label("Province", style=filter_label_style),
+                dcc.Dropdown(
+                    id='province-dropdown',
+                    placeholder='Select Province',
+                    multi=True,
+                    style=dropdown_style
+                ),
+
+                html.Label("Division", style=filter_label_style),
+                dcc.Dropdown(
+                    id='division-dropdown',
+                    placeholder='Select Division',
+                    multi=True,
+                    style=dropdown_style
+                ),
+
+                html.Label("District", style=filter_label_style),
+                dcc.Dropdown(
+                    id='district-dropdown',
+                    placeholder='Select District',
+                    multi=True,
+                    search_order='original',
+                    style=dropdown_style
+                ),
+
+                html.Label("Municipality", style=filter_label_style),
+                dcc.Dropdown(
+                    id='municipality-dropdown',
+                    placeholder='Select Municipality',
+                    multi=True,
+                    search_order='original',
+                    style=dropdown_style
+                ),
+
+                html.Label("Legislative District", style=filter_label_style),
+                dcc.Dropdown(
+                    id='legislative-dropdown',
+                    placeholder='Select Legislative District',
+                    multi=True,
+                    style=dropdown_style
+                ),
+
+                html.Label("Sector", style=filter_label_style),
+                dcc.Dropdown(
+                    id='sector-dropdown',
+                    placeholder='Select Sector',
+                    multi=True,
+                    style=dropdown_style
+                ),
+
+                html.Label("School Type", style=filter_label_style),
+                dcc.Dropdown(
+                    id='school-type-dropdown',
+                    placeholder='Select School Type',
+                    multi=True,
+                    style=dropdown_style
+                ),
+
+                html.Label("Modified COC", style=filter_label_style),
+                dcc.Dropdown(
+                    id='coc-dropdown',
+                    placeholder='Select Modified COC',
+                    multi=True,
+                    style=dropdown_style
+                ),
+
+                html.Label("Subclass", style=filter_label_style),
+                dcc.Dropdown(
+                    id='subclass-dropdown',
+                    placeholder='Select Subclassification',
+                    multi=True,
+                    style=dropdown_style
+                ),
+            ], style=filters_container_style),
+
+            # Right: Metrics & Charts
+            html.Div([
+                # Growth Card
+                html.Div(id='growth-card', style={
+                    'backgroundColor': COLORS['white'],
+                    'padding': '16px 20px',
+                    'borderRadius': '12px',
+                    'marginBottom': '16px',
+                    'boxShadow': '0 2px 4px rgba(0,0,0,0.05)'
+                }),
+
+                # Overall Growth Chart
                 html.Div([
-                    html.H3("Elementary Level", style=chart_heading_style),
-                    dcc.Graph(
-                        id="elementary_bar_chart",
-                        config={'displayModeBar': False},
-                        style={"height": "250px", "width": "100%"}
-                    )
-                ], style={**enrollment_chart_style, "flex": "1"}),
-
-                # Junior High School
+                    html.Div([
+                        html.H3("Enrollment Growth", style=chart_heading_style),
+                        dcc.Graph(
+                            id='growth-chart',
+                            config={'displayModeBar': False},
+                            style={"height": "290px", "width": "100%"}
+                        )
+                    ], style={**chart_style, "flex": "1"}),
+                ], style={'display': 'flex', "gap": "15px"}),
+
+                # Strand Comparison Charts
                 html.Div([
-                    html.H3("Junior High School", style=chart_heading_style),
-                    dcc.Graph(
-                        id="jhs_bar_chart",
-                        config={'displayModeBar': False},
-                        style={"height": "250px", "width": "100%"}
-                    )
-                ], style={**enrollment_chart_style, "flex": "1"}),
-
-                # Senior High School
+                    html.Div([
+                        html.H3("SHS Strand Comparison", style=chart_heading_style),
+                        dcc.Graph(
+                            id='strand-chart',
+                            config={'displayModeBar': False},
+                            style={"height": "290px", "width": "100%"}
+                        )
+                    ], style={**chart_style, "flex": "1"}),
+                ], style={'display': 'flex', "gap": "15px"}),
+
+                #Kinder to Grade 10 Comparison - Moved inside the right-side container
                 html.Div([
-                    html.H3("Senior High School", style=chart_heading_style),
-                    dcc.Graph(
-                        id="shs_bar_chart",
-                        config={'displayModeBar': False},
-                        style={"height": "250px", "width": "100%"}
+                    html.Div([
+                        html.H3("Kinder to Grade 10 Comparison", style=chart_heading_style),
+                        dcc.Graph(
+                            id='k10-comparison-chart',
+                            config={'displayModeBar': False},
+                            style={"height": "290px", "width": "100%"}
+                        )
+                    ], style={**chart_style, "flex": "1"}),
+                ], style={'display': 'flex', "gap": "15px"}),
+
+                # Schools with implausible swings between the two years
+                html.Div([
+                    html.H3("Year-over-Year Anomalies", style=chart_heading_style),
+                    html.Div(id='anomaly-count', style={'fontSize': '14px', 'color': COLORS['accent']}),
+                    dcc.Checklist(
+                        id='exclude-anomalies',
+                        options=[{'label': ' Exclude flagged schools from the charts', 'value': 'exclude'}],
+                        value=[],
+                        style={'fontSize': '14px', 'margin': '8px 0'}
+                    ),
+                    dash_table.DataTable(
+                        id='anomaly-table',
+                        columns=ANOMALY_COLUMNS,
+                        page_size=10,
+                        sort_action='native',
+                        style_table={'overflowX': 'auto'},
+                        style_cell={'fontSize': '13px', 'fontFamily': 'inherit', 'textAlign': 'left'},
+                        style_header={'fontWeight': 'bold'}
                     )
-                ], style={**enrollment_chart_style, "flex": "1"}),
-            ], style={'display': 'flex', "gap": "15px"})
+                ], style=chart_style),
 
-        ], style={'flex': '1', 'width': '75%'}),
-    ], style={'display': 'flex', 'gap': '15px', 'width': '100%'}),
-], style={
-    'width': '100%',
-    'maxWidth': '1440px',
-    'margin': '0 auto',
-    'padding': '20px',
-    'backgroundColor': COLORS['background'],
-    'minHeight': '100vh',
-    'fontFamily': 'Helvetica Neue, Arial, sans-serif',
-    'boxSizing': 'border-box'
-})
+            ], style={'flex': '1', 'width': '75%'}), # Keep the flex and width for the right side
+        ], style={'display': 'flex', 'gap': '15px', 'width': '100%'}),
 
-# Comparison Dashboard Layout
-comparison_dashboard_layout = html.Section([
+    ], style={
+        'width': '100%',
+        'maxWidth': '1440px',
+        'margin': '0 auto',
+        'padding': '20px',
+        'backgroundColor': COLORS['background'],
+        'minHeight': '100vh',
+        'fontFamily': 'Helvetica Neue, Arial, sans-serif',
+        'boxSizing': 'border-box'
+    })
 
-    # Store cleaned data
-    dcc.Store(id='stored-data-present'),
-    dcc.Store(id='stored-data-previous'),
+# Gender Parity Index Explorer Layout
+@functools.lru_cache(maxsize=None)
+def gpi_explorer_layout():
+    """Built on the first request for the page and reused after that"""
+    return html.Section([
 
-    # Header with Logo
-    html.Div([
-        # Left side with logo and title
+        # The browser's own uploads, kept in local storage by the dashboards
+        dcc.Store(id='national-baseline', storage_type='local'),
+        dcc.Store(id='baseline-present', storage_type='local'),
+        dcc.Store(id='baseline-previous', storage_type='local'),
+
+        # Header with Logo
         html.Div([
-            html.Img(
-                src='https://upload.wikimedia.org/wikipedia/commons/f/fa/Seal_of_the_Department_of_Education_of_the_Philippines.png',
-                style={'height': '100px', 'marginRight': '8px'}
-            ),
             html.Div([
-                html.H1("REPUBLIC OF THE PHILIPPINES",
-                        style={'fontFamily': "'EB Garamond', serif", 'fontSize': '22px', 'margin': '0', 'marginBottom': '3px', 'fontWeight': '400'}),
-                html.H2("DEPARTMENT OF EDUCATION",
-                        style={'fontFamily': "'EB Garamond', serif", 'fontSize': '36px', 'margin': '0', 'fontWeight': '500'})
-            ], style=header_text_style)
-        ], style={'display': 'flex', 'alignItems': 'center'}),
-
-        # Right side status
-        html.Div(id='header-status', style={'color': COLORS['accent'], 'fontSize': '13px'}),
-    ], style={
-        **upper_header_style,
-        'display': 'flex',
-        'justifyContent': 'space-between',
-        'alignItems': 'center'
-    }),
-
-    html.Div([
-        html.H3("School Enrollment Dashboard",
-                style={'fontFamily': 'Arial, sans-serif',
-                       'color': COLORS['primary'],
-                       'fontWeight': 'bold',
-                       'fontSize': '40px',
-                       'margin': '24px 0',
-                       'marginLeft' : '20px',
-                       'textAlign': 'left'})
-    ]),
-
-    # Upload Controls
-    html.Div([
-        html.Div([
-            dcc.Upload(
-                id='upload-data1',
-                children=html.Button('Upload Present Year', style=primary_button_style),
-                multiple=False,
-                style={'marginRight': '10px'}
-            ),
-            dcc.Upload(
-                id='upload-data2',
-                children=html.Button('Upload Previous Year', style=primary_button_style),
-                multiple=False,
-                style={'marginRight': '10px'}
-            ),
-            html.Button(
-                "Clear Files",
-                id="clear-files-btn",
-                style=danger_button_style
-            )
-        ], style={'display': 'flex', 'alignItems': 'center', "backgroundColor": 'white'}),
+                html.Img(
+                    src='https://upload.wikimedia.org/wikipedia/commons/f/fa/Seal_of_the_Department_of_Education_of_the_Philippines.png',
+                    style={'height': '100px', 'marginRight': '8px'}
+                ),
+                html.Div([
+                    html.H1("REPUBLIC OF THE PHILIPPINES",
+                            style={'fontFamily': "'EB Garamond', serif", 'fontSize': '22px', 'margin': '0', 'marginBottom': '3px', 'fontWeight': '400'}),
+                    html.H2("DEPARTMENT OF EDUCATION",
+                            style={'fontFamily': "'EB Garamond', serif", 'fontSize': '36px', 'margin': '0', 'fontWeight': '500'})
+                ], style=header_text_style)
+            ], style={'display': 'flex', 'alignItems': 'center'}),
+        ], style={
+            **upper_header_style,
+            'display': 'flex',
+            'justifyContent': 'space-between',
+            'alignItems': 'center'
+        }),
 
-        # Upload Messages
-        html.Div([
-            html.Div(id='output-data1', style={'marginRight': '20px'}),
-            html.Div(id='output-data2')
-        ], style={'display': 'flex', 'alignItems': 'center', 'marginLeft': '20px'}),
-
-        # Right side with back button
-        dcc.Link(
-            html.Button('Back to Main Dashboard', style={
-                **button_style,
-                'backgroundColor': COLORS['purple'],
-                'color': 'white',
-                'marginLeft': 'auto'  # Pushes to far right
-            }),
-            href='/'
-        )
-    ], style={
-        **header_style,
-        'display': 'flex',
-        'justifyContent': 'space-between',
-        'alignItems': 'center'
-    }),
-
-    # Main Content
-    html.Div([
-        # Left: Filters
         html.Div([
-            html.Button(
-                "Clear Filters",
-                id="clear-filters-btn",
-                style=filter_button_style
-            ),
-
-            html.Label("Region", style=filter_label_style),
-            dcc.Dropdown(
-                id='region-dropdown',
-                placeholder='Select Region',
-                multi=True,
-                style=dropdown_style
-            ),
-
-            html.Label("Province", style=filter_label_style),
-            dcc.Dropdown(
-                id='province-dropdown',
-                placeholder='Select Province',
-                multi=True,
-                style=dropdown_style
-            ),
-
-            html.Label("Division", style=filter_label_style),
-            dcc.Dropdown(
-                id='division-dropdown',
-                placeholder='Select Division',
-                multi=True,
-                style=dropdown_style
-            ),
-
-            html.Label("District", style=filter_label_style),
-            dcc.Dropdown(
-                id='district-dropdown',
-                placeholder='Select District',
-                multi=True,
-                style=dropdown_style
-            ),
-
-            html.Label("Municipality", style=filter_label_style),
-            dcc.Dropdown(
-                id='municipality-dropdown',
-                placeholder='Select Municipality',
-                multi=True,
-                style=dropdown_style
-            ),
-
-            html.Label("Legislative District", style=filter_label_style),
-            dcc.Dropdown(
-                id='legislative-dropdown',
-                placeholder='Select Legislative District',
-                multi=True,
-                style=dropdown_style
-            ),
-
-            html.Label("Sector", style=filter_label_style),
-            dcc.Dropdown(
-                id='sector-dropdown',
-                placeholder='Select Sector',
-                multi=True,
-                style=dropdown_style
-            ),
-
-            html.Label("School Type", style=filter_label_style),
-            dcc.Dropdown(
-                id='school-type-dropdown',
-                placeholder='Select School Type',
-                multi=True,
-                style=dropdown_style
-            ),
-
-            html.Label("Modified COC", style=filter_label_style),
-            dcc.Dropdown(
-                id='coc-dropdown',
-                placeholder='Select Modified COC',
-                multi=True,
-                style=dropdown_style
-            ),
-
-            html.Label("Subclass", style=filter_label_style),
-            dcc.Dropdown(
-                id='subclass-dropdown',
-                placeholder='Select Subclassification',
-                multi=True,
-                style=dropdown_style
-            ),
-        ], style=filters_container_style),
-
-        # Right: Metrics & Charts
+            html.H3("Gender Parity Index Explorer",
+                    style={'fontFamily': 'Arial, sans-serif',
+                           'color': COLORS['primary'],
+                           'fontWeight': 'bold',
+                           'fontSize': '40px',
+                           'margin': '24px 0',
+                           'marginLeft': '20px',
+                           'textAlign': 'left'})
+        ]),
+
+        # Controls
         html.Div([
-            # Growth Card
-            html.Div(id='growth-card', style={
-                'backgroundColor': COLORS['white'],
-                'padding': '16px 20px',
-                'borderRadius': '12px',
-                'marginBottom': '16px',
-                'boxShadow': '0 2px 4px rgba(0,0,0,0.05)'
-            }),
-
-            # Overall Growth Chart
             html.Div([
-                html.Div([
-                    html.H3("Enrollment Growth", style=chart_heading_style),
-                    dcc.Graph(
-                        id='growth-chart',
-                        config={'displayModeBar': False},
-                        style={"height": "290px", "width": "100%"}
-                    )
-                ], style={**chart_style, "flex": "1"}),
-            ], style={'display': 'flex', "gap": "15px"}),
-
-            # Strand Comparison Charts
+                html.Label("School Year", style=filter_label_style),
+                dcc.RadioItems(id='gpi-year', options=[{'label': 'Present', 'value': 'present'},
+                                                       {'label': 'Previous', 'value': 'previous'}],
+                               value='present', inline=True, inputStyle={'marginRight': '4px', 'marginLeft': '8px'}),
+            ]),
             html.Div([
-                html.Div([
-                    html.H3("SHS Strand Comparison", style=chart_heading_style),
-                    dcc.Graph(
-                        id='strand-chart',
-                        config={'displayModeBar': False},
-                        style={"height": "290px", "width": "100%"}
-                    )
-                ], style={**chart_style, "flex": "1"}),
-            ], style={'display': 'flex', "gap": "15px"}),
-
-            #Kinder to Grade 10 Comparison - Moved inside the right-side container
+                html.Label("Geography", style=filter_label_style),
+                dcc.RadioItems(id='gpi-level', options=GPI_LEVELS, value='Region', inline=True,
+                               inputStyle={'marginRight': '4px', 'marginLeft': '8px'}),
+            ]),
             html.Div([
-                html.Div([
-                    html.H3("Kinder to Grade 10 Comparison", style=chart_heading_style),
-                    dcc.Graph(
-                        id='k10-comparison-chart',
-                        config={'displayModeBar': False},
-                        style={"height": "290px", "width": "100%"}
-                    )
-                ], style={**chart_style, "flex": "1"}),
-            ], style={'display': 'flex', "gap": "15px"}),
+                html.Label("Sort By", style=filter_label_style),
+                dcc.Dropdown(id='gpi-sort', options=['Name'] + list(GPI_MEASURES), value='Name', clearable=False,
+                             style={**dropdown_style, 'width': '220px'}),
+            ]),
+            html.Div([
+                html.Label("Order", style=filter_label_style),
+                dcc.RadioItems(id='gpi-order', options=[{'label': 'Ascending', 'value': 'asc'},
+                                                        {'label': 'Descending', 'value': 'desc'}],
+                               value='asc', inline=True, inputStyle={'marginRight': '4px', 'marginLeft': '8px'}),
+            ]),
+            dcc.Link(
+                html.Button('Back to Main Dashboard', style={
+                    **button_style,
+                    'backgroundColor': COLORS['purple'],
+                    'color': 'white',
+                }),
+                href='/',
+                style={'marginLeft': 'auto'}
+            )
+        ], style={
+            **header_style,
+            'display': 'flex',
+            'gap': '30px',
+            'alignItems': 'flex-end'
+        }),
 
-        ], style={'flex': '1', 'width': '75%'}), # Keep the flex and width for the right side
-    ], style={'display': 'flex', 'gap': '15px', 'width': '100%'}),
+        html.Div([
+            html.Div(id='gpi-status', style={'fontSize': '14px', 'color': COLORS['accent'], 'marginBottom': '8px'}),
+            html.Div(dcc.Graph(id='gpi-heatmap', config={'displayModeBar': False}),
+                     style={'maxHeight': '80vh', 'overflowY': 'auto'})
+        ], style={**enrollment_chart_style, 'height': 'auto'})
 
-], style={
-    'width': '100%',
-    'maxWidth': '1440px',
-    'margin': '0 auto',
-    'padding': '20px',
-    'backgroundColor': COLORS['background'],
-    'minHeight': '100vh',
-    'fontFamily': 'Helvetica Neue, Arial, sans-serif',
-    'boxSizing': 'border-box'
-})
+    ], style={
+        'width': '100%',
+        'maxWidth': '1440px',
+        'margin': '0 auto',
+        'padding': '20px',
+        'backgroundColor': COLORS['background'],
+        'minHeight': '100vh',
+        'fontFamily': 'Helvetica Neue, Arial, sans-serif',
+        'boxSizing': 'border-box'
+    })
 
 # =========================================================== END OF LAYOUTS =============================================================================
 
 # =========================================================== HELPER FUNCTIONS ===========================================================================
-def initial_dataset(contents):
+def initial_dataset(contents, filename='upload.csv'):
     if contents is None:
-        return pd.DataFrame()
+        return empty_frame()
 
     content_type, content_string = contents.split(',')
-    decoded = base64.b64decode(content_string)
-    try:
-        df = pd.read_csv(io.StringIO(decoded.decode('utf-8')), skiprows=4)  # **EDIT HERE**
-    except UnicodeDecodeError:
-        df = pd.read_csv(io.StringIO(decoded.decode('latin-1')), skiprows=4)  # **EDIT HERE**
-
-    df = df.fillna('Not Applicable')
-
-    # Clean column names:
-    df.columns = (
-        df.columns
-        .str.replace('-', '', regex=False)
-        .str.replace(r'\s+', ' ', regex=True)
-        .str.strip()
-    )
-
-    return df
+    return read_dataset(base64.b64decode(content_string), filename)
 
 
 def parse_contents(contents, filename):
     if contents is None:
-        return pd.DataFrame()
+        return empty_frame()
 
     content_type, content_string = contents.split(',')
     decoded = base64.b64decode(content_string)
 
     try:
-        if 'csv' in filename.lower():
-            try:
-                df = pd.read_csv(io.StringIO(decoded.decode('utf-8')), skiprows=4)  # **EDIT HERE**
-            except UnicodeDecodeError:
-                df = pd.read_csv(io.StringIO(decoded.decode('latin-1')), skiprows=4)  # **EDIT HERE**
-        elif 'xls' in filename.lower():
-            df = pd.read_excel(io.BytesIO(decoded), skiprows=4)
-        else:
-            return pd.DataFrame()
-
-        df = df.fillna('Not Applicable')
-        df.columns = df.columns.str.replace('-', '', regex=False).str.replace(r'\s+', ' ', regex=True).str.strip()
-        return df
+        df = read_upload(decoded, filename, skiprows=4)
+        df = fill_missing(df)
+        return clean_columns(df)
     except Exception as e:
         print(f"Error parsing file: {str(e)}")
-        return pd.DataFrame()
+        return empty_frame()
+
+
+# Multi-file uploads (one export per region) are parsed in a process pool of DEPED_INGEST_WORKERS processes
+INGEST_WORKERS = int(os.environ.get('DEPED_INGEST_WORKERS', '0')) or os.cpu_count() or 1
+_ingest_pool = None
+_ingest_pool_lock = threading.Lock()
+
+
+def ingest_pool():
+    global _ingest_pool
+    with _ingest_pool_lock:
+        if _ingest_pool is None:
+            # Forking the threaded server risks children that inherit a held lock, and polars' thread pool does not
+            # survive a fork either, so the workers are started fresh: from a fork server that only loads the deped
+            # package where there is one, spawned elsewhere. They parse with deped.analytics.parse_upload, which
+            # they can import by name, on the engine the server runs.
+            if 'forkserver' in multiprocessing.get_all_start_methods():
+                context = multiprocessing.get_context('forkserver')
+                context.set_forkserver_preload(['deped.analytics'])
+            else:
+                context = multiprocessing.get_context('spawn')
+            _ingest_pool = concurrent.futures.ProcessPoolExecutor(INGEST_WORKERS, mp_context=context,
+                                                                  initializer=deped.engine.set_engine,
+                                                                  initargs=(deped.engine.ENGINE,))
+        return _ingest_pool
+
+
+def parse_uploads(contents, filenames):
+    """
+    Parse the files of a multi-file upload in parallel and merge the ones whose header matches the first
+    readable file. Returns the merged frame and a (filename, rows, problem) status per file.
+    """
+    if isinstance(contents, str):
+        contents, filenames = [contents], [filenames]
+    tasks = list(zip(contents, filenames))
+
+    results = None
+    if len(tasks) > 1 and INGEST_WORKERS > 1:
+        try:
+            results = list(ingest_pool().map(parse_upload, tasks))
+        except Exception as e:  # a broken pool falls back to parsing here
+            logging.getLogger(__name__).warning("Parallel ingest failed, parsing serially: %s", e)
+    if results is None:
+        results = [parse_upload(task) for task in tasks]
+
+    frames, statuses, header = [], [], None
+    for (_, filename), (df, error) in zip(tasks, results):
+        if error is None and (df is None or not row_count(df)):
+            error = "no rows could be read"
+        if error is None:
+            columns = set(df.columns)
+            header = columns if header is None else header
+            if columns != header:
+                missing, extra = sorted(header - columns), sorted(columns - header)
+                error = "header differs from the first file (" + '; '.join(
+                    ([f"missing {', '.join(missing)}"] if missing else []) +
+                    ([f"unexpected {', '.join(extra)}"] if extra else [])) + ")"
+        if error is None:
+            frames.append(df)
+            statuses.append((filename, row_count(df), None))
+        else:
+            statuses.append((filename, 0, error))
+    return (concat_frames(frames) if frames else empty_frame()), statuses
+
+
+def upload_status(statuses, single="Uploaded: {}", summary="Uploaded {} of {} files, {:,} rows"):
+    """Upload message: `single` for one file, otherwise `summary` over a list of each file's rows or problem"""
+    if len(statuses) == 1:
+        filename, rows, error = statuses[0]
+        return single.format(filename) if error is None else f"Error reading {filename}: {error}"
+    loaded = [rows for _, rows, error in statuses if error is None]
+    return html.Details([
+        html.Summary(summary.format(len(loaded), len(statuses), sum(loaded))),
+        html.Ul([html.Li(f"{filename}: {rows:,} rows" if error is None else f"{filename}: skipped, {error}")
+                 for filename, rows, error in statuses], style={'margin': '4px 0', 'fontSize': '13px'}),
+    ])
 
 
 def get_active_df(present_data, previous_data):
     """Returns the most recent available dataframe"""
     if present_data:
-        return pd.DataFrame(present_data)
+        return load_records(present_data)
     elif previous_data:
-        return pd.DataFrame(previous_data)
-    return pd.DataFrame()
+        return load_records(previous_data)
+    return empty_frame()
 
 
-def calculate_totals(df):
+def calculate_totals(df, filters=None):
     """Calculate total enrollment from a dataframe"""
-    if df.empty:
-        return 0
-
     # Get all columns that contain Male/Female data
     gender_cols = [col for col in df.columns if 'Male' in col or 'Female' in col]
-    return df[gender_cols].sum().sum()
-
+    return int(column_sums(df, gender_cols, filters).sum())
+
+
+def dataset_key(contents):
+    """Stable handle of an upload (one file's contents or a list of them), used to find what was derived from it"""
+    if not isinstance(contents, str):
+        contents = '\n'.join(contents)
+    return hashlib.sha1(contents.encode()).hexdigest()[:16]
+
+
+def ingest_baseline(df, contents, filename=None, year='present'):
+    """
+    Baseline record of a fresh upload, tagged with its handle. The upload's filter index is built alongside and
+    both are persisted with the rows so a restarted server can reattach them. The upload becomes the one the
+    REST API serves for its school year ('present' or 'previous').
+    """
+    baseline = national_baseline(df)
+    baseline['dataset'] = dataset_key(contents)
+    index = FilterIndex(df)
+    FILTER_INDEXES.put(baseline['dataset'], index)
+    BASELINES.put(baseline['dataset'], baseline)
+    DATASET_FRAMES.put(baseline['dataset'], df)
+    persist_dataset(baseline, index, filename, df=df)
+    publish_dataset(baseline['dataset'], year)
+    return baseline
+
+
+def append_upload(data, baseline, contents, filename='upload.csv'):
+    """
+    Add a late submission to the stored upload. The new rows must have the upload's columns; schools whose
+    'BEIS School ID' is already present are skipped. The baseline, filter index and cached views are carried
+    forward by aggregating the new rows only. Returns the records, the baseline and the number of added schools.
+    """
+    delta = initial_dataset(contents, filename)
+    columns = set(data[0]) if data else set()
+    missing, extra = sorted(columns - set(delta.columns)), sorted(set(delta.columns) - columns)
+    if missing or extra:
+        problems = ([f"missing {', '.join(missing)}"] if missing else []) + \
+                   ([f"unexpected {', '.join(extra)}"] if extra else [])
+        raise ValueError(f"columns do not match the loaded data ({'; '.join(problems)})")
+
+    existing = {str(row['BEIS School ID']) for row in data}
+    new_rows, seen = [], set()
+    for row in to_records(delta):
+        school = str(row['BEIS School ID'])
+        if school not in existing and school not in seen:
+            seen.add(school)
+            new_rows.append(row)
+    if not new_rows:
+        return data, baseline, 0
+
+    delta = load_records(new_rows)
+    if not baseline or not baseline.get('dataset'):
+        baseline = ingest_baseline(load_records(data), json.dumps(data, default=str))
+    index = get_filter_index(baseline, data)
+    df = dataset_frame(baseline['dataset'])
+    df = concat_frames([load_records(data) if df is None else df, delta])
+
+    combined = add_baselines(baseline, national_baseline(delta))
+    combined['dataset'] = dataset_key(baseline['dataset'] + contents)
+    index = index.extended(delta)
+    FILTER_INDEXES.put(combined['dataset'], index)
+    BASELINES.put(combined['dataset'], combined)
+    DATASET_FRAMES.put(combined['dataset'], df)
+    blocks = BLOCKS.get(baseline['dataset'])
+    if blocks is not None:
+        BLOCKS.put(combined['dataset'], blocks.extended(delta))
+    records = data + new_rows
+    persist_dataset(combined, index, filename, df=df)
+    publish_dataset(combined['dataset'], 'present')
+    carry_views(baseline['dataset'], combined['dataset'], delta)
+    return records, combined, len(new_rows)
+
+
+def triggered_id():
+    """Id of the component that fired the running callback, or None when the callback is called directly"""
+    try:
+        return ctx.triggered_id
+    except (MissingCallbackContextException, LookupError):  # threads Dash never set a context in raise LookupError
+        return None
 
-def apply_filters(df, filters):
-    """Apply all active filters to the dataframe"""
-    if df.empty:
-        return df
 
-    for column, values in filters.items():
-        if values:
-            df = df[df[column].isin(values)]
-    return df
+def triggered_props():
+    """'component.property' ids that fired the running callback, empty when the callback is called directly"""
+    try:
+        return set(ctx.triggered_prop_ids)
+    except (MissingCallbackContextException, LookupError):  # threads Dash never set a context in raise LookupError
+        return set()
 
 
 # =========================================================== END OF HELPER FUNCTIONS ====================================================================
 
-# =========================================================== CALLBACKS =================================================================================
-# Page routing callback
-@app.callback(
-    Output('page-content', 'children'),
-    Input('url', 'pathname')
-)
-def display_page(pathname):
-    if pathname == '/comparison-dashboard':
-        return comparison_dashboard_layout
-    else:
-        return main_dashboard_layout
-
+# =========================================================== FILTER INDEX ===============================================================================
+# The dropdown options and their "(5,210 schools · 3.1M)" facet counts come from the upload's FilterIndex and the
+# views from its EnrollmentBlocks (see deped.indexes), built once per upload and kept per worker. A worker that has
+# not seen an upload rebuilds them from the records or the saved rows.
+
+# Finished outputs of the main dashboard per (upload handle, filter selections)
+FIGURE_CACHE = LRUCache(int(os.environ.get('DEPED_FIGURE_CACHE', '64')))
+# Baseline records by handle, for requests that arrive without one (the REST API)
+BASELINES = LRUCache(int(os.environ.get('DEPED_INDEX_CACHE', '16')))
+
+
+def get_filter_index(baseline, data):
+    """The FilterIndex of an upload, from this worker's cache or rebuilt from the stored records"""
+    key = (baseline or {}).get('dataset')
+    if key:
+        attach_dataset(key)
+    index = FILTER_INDEXES.get(key) if key else None
+    if index is not None:
+        return index
+
+    with timed('parse'):
+        df = load_records(data)
+    with timed('aggregate'):
+        index = FilterIndex(df)
+    if key:
+        FILTER_INDEXES.put(key, index)
+    return index
+
+
+def dataset_view(key, filters):
+    """
+    The filtered view of an upload from its level blocks, built on first use from its rows, or None when the rows
+    are not on this server
+    """
+    blocks = BLOCKS.get(key) if key else None
+    if blocks is None:
+        df = dataset_frame(key) if key else None
+        if df is None:
+            return None
+        blocks = EnrollmentBlocks(df)
+        BLOCKS.put(key, blocks)
+    return blocks.view(filters)
+
+
+def view_key(baseline, filters):
+    """Cache key of a filtered view, or None for sessions without an upload handle"""
+    key = (baseline or {}).get('dataset')
+    if not key:
+        return None
+    return key, selection_key(filters)
+
+
+def remember_view(key, view):
+    VIEW_CACHE.put(key, view)
+    persist_view(key, view)
+
+
+def cached_view(baseline, filters, frame):
+    """
+    The filtered view of an upload through the shared view cache. `frame` is called for the rows on a miss and
+    may return None when they are not available, in which case so is the view.
+    """
+    key, view = view_key(baseline, filters), None
+    if key:
+        attach_dataset(key[0])
+        view = VIEW_CACHE.get(key)
+        if view is not None:
+            return view
+        with timed('aggregate'):
+            view = dataset_view(key[0], filters)
+    if view is None:
+        with timed('parse'):
+            df = frame()
+        if df is None:
+            return None
+        with timed('aggregate'):
+            view = filtered_view(df, filters)
+    if key:
+        remember_view(key, view)
+    return view
+
+
+def carry_views(old_key, new_key, delta):
+    """
+    Carry the cached views of an upload to its appended version: views none of the appended rows match are copied,
+    the others get the view of the appended rows added
+    """
+    for (key, selections), view in VIEW_CACHE.items():
+        if key != old_key:
+            continue
+        filters = dict(zip(FILTER_COLUMNS, selections))
+        if row_count(delta, filters):
+            view = add_views(view, filtered_view(delta, filters))
+        remember_view((new_key, selections), view)
+
+
+# =========================================================== END OF FILTER INDEX ========================================================================
+
+# =========================================================== DATASET STORE ==============================================================================
+# Every upload is saved under DEPED_DATA_DIR/<handle>: the rows as Parquet, the filter index as NumPy arrays, the
+# baseline record and the cached views. The browser keeps only the baseline record (with the handle) in local
+# storage, so after a restart or redeploy the session reattaches to its upload and its warm caches by handle.
+# An empty DEPED_DATA_DIR turns persistence off; the DEPED_PERSIST_LIMIT most recent uploads are kept.
+# published.json names the latest upload of each school year ('present', 'previous'), which the REST API serves.
+DATA_DIR = os.environ.get('DEPED_DATA_DIR', os.path.join(os.path.expanduser('~'), '.deped-dashboard', 'datasets'))
+PERSIST_LIMIT = int(os.environ.get('DEPED_PERSIST_LIMIT', '20'))
+_persist_pool = concurrent.futures.ThreadPoolExecutor(1, thread_name_prefix='deped-persist')
+_attached = set()
+_attach_lock = threading.Lock()
+PUBLISHED = {}
+_publish_lock = threading.Lock()
+DATASET_FRAMES = LRUCache(int(os.environ.get('DEPED_FRAME_CACHE', '4')))
+persist_logger = logging.getLogger('deped.persist')
+
+
+def dataset_dir(key):
+    return os.path.join(DATA_DIR, key) if DATA_DIR and key and re.fullmatch(r'[0-9a-f]+', key) else None
+
+
+def _background(task, *args, **kwargs):
+    """Run a persistence task on the writer thread; failures are logged and never reach the callbacks"""
+    def run():
+        try:
+            task(*args, **kwargs)
+        except Exception:
+            persist_logger.exception("Persisting %s failed", task.__name__)
+    return _persist_pool.submit(run)
+
+
+def persist_dataset(baseline, index, filename=None, df=None, records=None):
+    """Save an upload in the background, from its frame or its records"""
+    if dataset_dir(baseline.get('dataset')):
+        _background(_write_dataset, baseline, index, filename, df, records)
+
+
+def _write_dataset(baseline, index, filename, df, records):
+    target = dataset_dir(baseline['dataset'])
+    if os.path.isdir(target):
+        os.utime(target)
+        return
+    staging = f"{target}.{os.getpid()}.tmp"
+    os.makedirs(staging, exist_ok=True)
+    write_parquet(df if df is not None else load_records(records), os.path.join(staging, 'rows.parquet'))
+    arrays = {'codes': index.codes, 'schools': index.schools, 'enrollment': index.enrollment}
+    arrays.update({f'values_{i}': np.array(values, dtype=object) for i, values in enumerate(index.values)})
+    np.savez(os.path.join(staging, 'index.npz'), **arrays)
+    with open(os.path.join(staging, 'meta.json'), 'w') as f:
+        json.dump({'baseline': baseline, 'filename': filename, 'columns': index.columns, 'saved': time.time()},
+                  f, default=str)
+    os.replace(staging, target)
+    _prune()
+
+
+def _prune():
+    entries = sorted((entry for entry in os.scandir(DATA_DIR) if entry.is_dir() and dataset_dir(entry.name)),
+                     key=lambda entry: entry.stat().st_mtime, reverse=True)
+    for entry in entries[PERSIST_LIMIT:]:
+        for name in os.listdir(entry.path):
+            os.remove(os.path.join(entry.path, name))
+        os.rmdir(entry.path)
+
+
+def persist_view(key, view):
+    if dataset_dir(key[0]):
+        _background(_append_view, key, view)
+
+
+def _append_view(key, view):
+    target = dataset_dir(key[0])
+    if not os.path.isdir(target):
+        return
+    totals, offering, schools = view
+    with open(os.path.join(target, 'views.jsonl'), 'a') as f:
+        f.write(json.dumps({'selections': key[1], 'totals': totals, 'offering': offering, 'schools': schools},
+                           default=int) + '\n')
+
+
+def load_index(target, columns):
+    """Rebuild a saved FilterIndex without touching the rows"""
+    with np.load(os.path.join(target, 'index.npz'), allow_pickle=True) as arrays:
+        index = FilterIndex.__new__(FilterIndex)
+        index.columns = list(columns)
+        index.values = [list(arrays[f'values_{i}']) for i in range(len(index.columns))]
+        index.lookup = [{value: code for code, value in enumerate(values)} for values in index.values]
+        index.codes, index.schools, index.enrollment = arrays['codes'], arrays['schools'], arrays['enrollment']
+    index.searches = {i: ValueSearch(index.values[i]) for i, column in enumerate(index.columns)
+                      if column in SEARCH_COLUMNS}
+    return index
+
+
+def attach_dataset(key):
+    """
+    Load a saved upload's filter index and cached views into this worker, once per handle; an upload whose files
+    are still being written is tried again on its next request
+    """
+    target = dataset_dir(key)
+    with _attach_lock:
+        if not target or key in _attached:
+            return
+    if not os.path.isfile(os.path.join(target, 'meta.json')):
+        return
+    try:
+        with open(os.path.join(target, 'meta.json')) as f:
+            meta = json.load(f)
+        if FILTER_INDEXES.get(key) is None:
+            FILTER_INDEXES.put(key, load_index(target, meta['columns']))
+        views = os.path.join(target, 'views.jsonl')
+        if os.path.isfile(views):
+            with open(views) as f:
+                for line in f:
+                    view = json.loads(line)
+                    selections = tuple(tuple(values) for values in view['selections'])
+                    VIEW_CACHE.put((key, selections), (view['totals'], view['offering'], view['schools']))
+    except Exception:
+        persist_logger.exception("Reattaching dataset %s failed", key)
+        return
+    with _attach_lock:
+        _attached.add(key)
+
+
+def publish_dataset(key, year):
+    """Make an upload the one the REST API serves for its school year, in every worker sharing DATA_DIR"""
+    with _publish_lock:
+        PUBLISHED[year] = key
+        path = os.path.join(DATA_DIR, 'published.json') if DATA_DIR else None
+        if not path:
+            return
+        try:
+            os.makedirs(DATA_DIR, exist_ok=True)
+            published = dict(PUBLISHED)
+            if os.path.isfile(path):
+                with open(path) as f:
+                    published = dict(json.load(f), **{year: key})
+            with open(f"{path}.{os.getpid()}.tmp", 'w') as f:
+                json.dump(published, f)
+            os.replace(f"{path}.{os.getpid()}.tmp", path)
+        except (OSError, ValueError):
+            persist_logger.exception("Publishing dataset %s failed", key)
+
+
+def published_dataset(year):
+    """Handle of the upload served for a school year, or None"""
+    path = os.path.join(DATA_DIR, 'published.json') if DATA_DIR else None
+    if path and os.path.isfile(path):
+        try:
+            with open(path) as f:
+                return json.load(f).get(year)
+        except (OSError, ValueError):
+            pass
+    return PUBLISHED.get(year)
+
+
+def dataset_baseline(key):
+    """Baseline record of an upload by handle, from this worker or its saved metadata, or None"""
+    baseline = BASELINES.get(key)
+    target = dataset_dir(key)
+    if baseline is None and target and os.path.isfile(os.path.join(target, 'meta.json')):
+        with open(os.path.join(target, 'meta.json')) as f:
+            baseline = json.load(f)['baseline']
+        BASELINES.put(key, baseline)
+    return baseline
+
+
+def dataset_frame(key):
+    """Rows of an upload, kept from its ingest or read back from disk, or None when neither has them"""
+    df = DATASET_FRAMES.get(key)
+    target = dataset_dir(key)
+    if df is None and target and os.path.isfile(os.path.join(target, 'rows.parquet')):
+        df = read_parquet_file(os.path.join(target, 'rows.parquet'))
+        DATASET_FRAMES.put(key, df)
+    return df
 
-# Main Dashboard Callbacks
-@app.callback(
-    Output('output-upload', 'children'),
-    Output('stored-data', 'data'),
-    Input('upload-dataset', 'contents'),
-    Input('clear-btn', 'n_clicks'),
-    State('upload-dataset', 'filename')
-)
-def handle_upload_or_clear(contents, clear_clicks, filename):
-    triggered_id = ctx.triggered_id
-    if triggered_id == 'clear-btn':
-        return "Upload cleared. Please upload a new file.", None
-    if contents is None:
-        return "No file uploaded yet.", None
 
+def restore_records(baseline):
+    """Records and file name of a saved upload for a browser that kept only its baseline, or None"""
+    target = dataset_dir((baseline or {}).get('dataset'))
+    if not target or not os.path.isfile(os.path.join(target, 'meta.json')):
+        return None
+    attach_dataset(baseline['dataset'])
+    with open(os.path.join(target, 'meta.json')) as f:
+        meta = json.load(f)
+    with timed('parse'):
+        records = to_records(read_parquet_file(os.path.join(target, 'rows.parquet')))
+    os.utime(target)
+    return records, meta.get('filename') or 'previous upload'
+
+
+def restore_datasets(limit=PERSIST_LIMIT):
+    """
+    Reattach the most recently used saved uploads at startup, so their first requests are already warm, and
+    queue the most requested views of the main-dashboard uploads for warming
+    """
+    if not DATA_DIR or not os.path.isdir(DATA_DIR):
+        return
+    entries = sorted((entry for entry in os.scandir(DATA_DIR) if entry.is_dir() and dataset_dir(entry.name)),
+                     key=lambda entry: entry.stat().st_mtime, reverse=True)
+    for entry in entries[:limit]:
+        attach_dataset(entry.name)
+        # Only the main dashboard caches views, so uploads with saved views are the ones worth warming
+        if os.path.isfile(os.path.join(entry.path, 'views.jsonl')):
+            try:
+                with open(os.path.join(entry.path, 'meta.json')) as f:
+                    warm_views(json.load(f)['baseline'])
+            except (OSError, ValueError, KeyError):
+                persist_logger.exception("Reading dataset %s failed", entry.name)
+
+
+# =========================================================== END OF DATASET STORE =======================================================================
+
+# =========================================================== CACHE WARMING ==============================================================================
+# The server counts how often each filter state is opened on the main dashboard, across sessions and uploads. After
+# an upload, and at startup for the saved uploads, the unfiltered view, every region and the DEPED_WARM_TOP most
+# requested states are aggregated and drawn ahead of time on DEPED_WARM_WORKERS low-priority background threads.
+# Only the USAGE_LIMIT most requested states are kept: once twice as many are counted, the rest are forgotten.
+WARM_TOP = int(os.environ.get('DEPED_WARM_TOP', '20'))
+WARM_WORKERS = int(os.environ.get('DEPED_WARM_WORKERS', '1'))
+WARM_NICE = 10
+USAGE_LIMIT = max(WARM_TOP * 10, 100)
+VIEW_USAGE = collections.Counter()
+_usage_lock = threading.Lock()
+_usage_loaded = False
+_usage_requests = 0
+
+
+def _lower_priority():
+    """Pool initializer: let foreground requests win the CPU over warming (Linux nices single threads)"""
     try:
-        df = initial_dataset(contents)
-        return f"Uploaded: {filename}", df.to_dict('records')
-    except Exception as e:
-        return f"Error reading file: {e}", None
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), WARM_NICE)
+    except (AttributeError, OSError):
+        pass
+
+
+_warm_pool = concurrent.futures.ThreadPoolExecutor(max(WARM_WORKERS, 1), thread_name_prefix='deped-warm',
+                                                   initializer=_lower_priority)
+
+
+def _usage_path():
+    return os.path.join(DATA_DIR, 'view_usage.json') if DATA_DIR else None
+
+
+def _load_usage():
+    """Counts saved by earlier runs, read once per worker"""
+    global _usage_loaded
+    with _usage_lock:
+        if _usage_loaded:
+            return
+        _usage_loaded = True
+    path = _usage_path()
+    if path and os.path.isfile(path):
+        try:
+            with open(path) as f:
+                saved = json.load(f)
+            with _usage_lock:
+                for selections, count in saved:
+                    VIEW_USAGE[tuple(tuple(values) for values in selections)] += count
+                _trim_usage()
+        except (OSError, ValueError):
+            persist_logger.exception("Reading %s failed", path)
+
+
+def _trim_usage():
+    """Keep the USAGE_LIMIT most requested states once twice as many are counted; called holding _usage_lock"""
+    if len(VIEW_USAGE) > 2 * USAGE_LIMIT:
+        kept = VIEW_USAGE.most_common(USAGE_LIMIT)
+        VIEW_USAGE.clear()
+        VIEW_USAGE.update(dict(kept))
+
+
+def _save_usage():
+    path = _usage_path()
+    with _usage_lock:
+        counts = VIEW_USAGE.most_common(USAGE_LIMIT)
+    os.makedirs(DATA_DIR, exist_ok=True)
+    with open(f"{path}.tmp", 'w') as f:
+        json.dump(counts, f)
+    os.replace(f"{path}.tmp", path)
+
+
+def record_view_usage(selections):
+    """Count one request of a canonical filter state (a view_key without its upload handle)"""
+    global _usage_requests
+    _load_usage()
+    with _usage_lock:
+        VIEW_USAGE[selections] += 1
+        _trim_usage()
+        _usage_requests += 1
+        save = _usage_requests % 25 == 0
+    if _usage_path() and save:
+        _background(_save_usage)
+
+
+def warm_states(index, limit=WARM_TOP):
+    """Canonical filter states to warm for an upload: unfiltered, every region, then the most requested ones"""
+    _load_usage()
+    empty = ((),) * len(FILTER_COLUMNS)
+    region = FILTER_COLUMNS.index('Region')
+    states = [empty] + [empty[:region] + ((value,),) + empty[region + 1:] for value in index.values[region]]
+    with _usage_lock:
+        popular = [selections for selections, _ in VIEW_USAGE.most_common(limit)]
+    # States saved from other uploads only apply when this upload has every selected value
+    states += [selections for selections in popular
+               if all(value in lookup for values, lookup in zip(selections, index.lookup) for value in values)]
+    return list(dict.fromkeys(states))
+
+
+def warm_views(baseline, df=None, records=None):
+    """Queue an upload's common views for warming; rows are read from `df`, `records` or the saved upload"""
+    if (baseline or {}).get('dataset') and WARM_WORKERS > 0:
+        _warm_pool.submit(_warm, baseline, df, records)
+
+
+def _warm(baseline, df, records):
+    key = baseline['dataset']
+    try:
+        index = FILTER_INDEXES.get(key)
+        if index is None:
+            attach_dataset(key)
+            index = FILTER_INDEXES.get(key)
+        if index is None:
+            index = FilterIndex(df if df is not None else load_records(records))
+        pending = [selections for selections in warm_states(index) if FIGURE_CACHE.get((key, selections)) is None]
+        if not pending:
+            return
+        if df is None and records is not None:
+            df = load_records(records)
+        elif df is None:
+            df = read_parquet_file(os.path.join(dataset_dir(key), 'rows.parquet'))
+        for selections in pending:
+            view = VIEW_CACHE.get((key, selections))
+            if view is None:
+                view = filtered_view(df, dict(zip(FILTER_COLUMNS, (list(values) for values in selections))))
+                remember_view((key, selections), view)
+            FIGURE_CACHE.put((key, selections), main_dashboard_outputs(*view, baseline))
+    except Exception:
+        persist_logger.exception("Warming dataset %s failed", key)
+
+
+# =========================================================== END OF CACHE WARMING =======================================================================
+
+# =========================================================== FIGURES ===================================================================================
+def main_dashboard_outputs(totals, offering, total_schools, baseline):
+    """
+    Summary cards and charts of the main dashboard, built from the per-column totals of the filtered rows.
+    `offering` holds the number of filtered schools offering each level, which the per-school averages divide by.
+    The "% of Nationwide" lines read from the upload's national_baseline record.
+    """
+    national_enrollment = baseline['enrollment']
+    national_schools = baseline['schools']
+    total_male = sum(totals[col] for col in ALL_GENDER_COLUMNS if 'Male' in col)
+    total_female = sum(totals[col] for col in ALL_GENDER_COLUMNS if 'Female' in col)
+    total_enrollees = total_male + total_female
 
+    # Apple-style plot formatting
+    apple_theme = {
+        'plot_bgcolor': 'white',
+        'paper_bgcolor': 'white',
+        'font': {'color': '#1d1d1f', 'family': 'SF Pro Display, Helvetica, Arial, sans-serif'},
+        'title_font_size': 16,
+        'xaxis': {'showgrid': False},
+        'yaxis': {'showgrid': True, 'gridcolor': '#f5f5f7', 'title': None},
+        'legend': {'orientation': 'h', 'yanchor': 'bottom', 'y': 1.02, 'xanchor': 'right', 'x': 1},
+        'margin': dict(l=10, r=10, t=40, b=10),
+    }
 
-@app.callback(
-    Output('region_dd', 'options'),
-    Output('province_dd', 'options'),
-    Output('division_dd', 'options'),
-    Output('district_dd', 'options'),
-    Output('municipality_dd', 'options'),
-    Output('legislative_district_dd', 'options'),
-    Output('sector_dd', 'options'),
-    Output('school_type_dd', 'options'),
-    Output('modified_coc_dd', 'options'),
-    Output('school_subclass_dd', 'options'),
-    Input('stored-data', 'data'),
-    Input('region_dd', 'value'),
-    Input('province_dd', 'value'),
-    Input('division_dd', 'value'),
-    Input('district_dd', 'value'),
-    Input('municipality_dd', 'value'),
-    Input('legislative_district_dd', 'value'),
-    Input('sector_dd', 'value'),
-    Input('school_type_dd', 'value'),
-    Input('modified_coc_dd', 'value'),
-)
-def update_dropdown_options(data, region, province, division, district, municipality,
-                            legislative_district, sector, school_type, modified_coc):
-    if data is None:
-        return ([],) * 10
+    male_color = '#1582b5'
+    female_color = '#f05374'
 
-    df = pd.DataFrame(data)
+    # Education Level Bar Chart
+    bar_data = pd.DataFrame({
+        'Education Level': ['Elementary', 'Elementary', 'Junior High School', 'Junior High School',
+                            'Senior High School', 'Senior High School'],
+        'Gender': ['Male', 'Female'] * 3,
+        'Enrollment': [
+            sum(totals[col] for col in ELEMENTARY_MALE), sum(totals[col] for col in ELEMENTARY_FEMALE),
+            sum(totals[col] for col in JUNIOR_MALE), sum(totals[col] for col in JUNIOR_FEMALE),
+            sum(totals[col] for col in SENIOR_MALE), sum(totals[col] for col in SENIOR_FEMALE)
+        ]
+    })
 
-    # Region Options (use full data)
-    region_options = [{'label': r, 'value': r} for r in sorted(df['Region'].dropna().unique())]
+    # Calculate total enrollment per education level
+    bar_data["Total Enrollment"] = bar_data.groupby("Education Level")["Enrollment"].transform("sum")
 
-    # Province Options (filter only by region)
-    province_df = df[df['Region'].isin(region)] if region else df
-    province_options = [{'label': p, 'value': p} for p in sorted(province_df['Province'].dropna().unique())]
+    bar_data["Education Level"] = bar_data["Education Level"].replace({
+        "Junior High School": "Junior HS",
+        "Senior High School": "Senior HS"
+    })
 
-    # Division Options (filter by region and province)
-    division_df = province_df[province_df['Province'].isin(province)] if province else province_df
-    division_options = [{'label': d, 'value': d} for d in sorted(division_df['Division'].dropna().unique())]
+    edu_order = ["Elementary", "Junior HS", "Senior HS"]
 
-    # District Options (filter by region, province, and district)
-    district_df = division_df[division_df['Division'].isin(division)] if division else division_df
-    district_options = [{'label': d, 'value': d} for d in sorted(district_df['District'].dropna().unique())]
+    education_fig = px.bar(
+        bar_data,
+        y="Enrollment",
+        x="Education Level",
+        color="Gender",
+        barmode="stack",
+        custom_data=["Total Enrollment", "Gender"],
+        color_discrete_map={'Male': male_color, 'Female': female_color},
+        category_orders={"Education Level": edu_order}
+    )
 
-    # Municipality Options (filter by region, province, district, division)
-    municipality_df = district_df[district_df['District'].isin(district)] if district else district_df
-    municipality_options = [{'label': m, 'value': m} for m in sorted(municipality_df['Municipality'].dropna().unique())]
+    education_fig.update_traces(
+        hovertemplate="<b>%{x}</b><br>Gender: %{customdata[1]}<br>Enrollment: %{y}<br>Total Enrollment: %{customdata[0]:,}<extra></extra>"
+    )
 
-    # Legislative District Options
-    legislative_district_df = municipality_df[
-        municipality_df['Municipality'].isin(municipality)] if municipality else municipality_df
-    legislative_district_options = [{'label': l, 'value': l} for l in
-                                    sorted(legislative_district_df['Legislative District'].dropna().unique())]
+    education_fig.update_layout(**apple_theme)
 
-    # Sector Options
-    sector_df = legislative_district_df[legislative_district_df['Legislative District'].isin(
-        legislative_district)] if legislative_district else legislative_district_df
-    sector_options = [{'label': s, 'value': s} for s in sorted(sector_df['Sector'].dropna().unique())]
+    # Elementary
 
-    # School Type Options
-    school_type_df = sector_df[sector_df['Sector'].isin(sector)] if sector else sector_df
-    school_type_options = [{'label': s, 'value': s} for s in sorted(school_type_df['School Type'].dropna().unique())]
+    grade_levels = ['K', 'G1', 'G2', 'G3', 'G4', 'G5', 'G6', 'Elem NG']
+    male_values = [totals[f'{lvl} Male'] for lvl in grade_levels]
+    female_values = [totals[f'{lvl} Female'] for lvl in grade_levels]
+    total_values = [m + f for m, f in zip(male_values, female_values)]
 
-    # Modified COC Options
-    modified_coc_df = school_type_df[school_type_df['School Type'].isin(school_type)] if school_type else school_type_df
-    modified_coc_options = [{'label': m, 'value': m} for m in sorted(modified_coc_df['Modified COC'].dropna().unique())]
+    total_values_repeated = total_values * 2
+    genders = ['Male'] * len(grade_levels) + ['Female'] * len(grade_levels)
+    enrollments = male_values + female_values
 
-    # Subclass Options
-    school_subclass_df = modified_coc_df[
-        modified_coc_df['Modified COC'].isin(modified_coc)] if modified_coc else modified_coc_df
-    school_subclass_options = [{'label': s, 'value': s} for s in
-                               sorted(school_subclass_df['School Subclassification'].dropna().unique())]
+    elementary_df = pd.DataFrame({
+        'Grade Level': grade_levels * 2,
+        'Gender': genders,
+        'Enrollment': enrollments,
+        'Total': total_values_repeated
+    })
 
-    return (region_options, province_options, division_options, district_options,
-            municipality_options, legislative_district_options, sector_options,
-            school_type_options, modified_coc_options, school_subclass_options)
+    elementary_fig = px.bar(
+        elementary_df,
+        x='Grade Level',
+        y='Enrollment',
+        color='Gender',
+        barmode='stack',
+        text='Enrollment',
+        color_discrete_map={'Male': male_color, 'Female': female_color},
+        custom_data=['Total', 'Gender'],
+        category_orders={
+            'Grade Level': ['K', 'G1', 'G2', 'G3', 'G4', 'G5', 'G6', 'Elem NG']
+        },
+        labels={'Grade Level': 'Grade Level'}
+    )
 
-
-@app.callback(
-    Output('region_dd', 'value'),
-    Output('province_dd', 'value'),
-    Output('division_dd', 'value'),
-    Output('district_dd', 'value'),
-    Output('municipality_dd', 'value'),
-    Output('legislative_district_dd', 'value'),
-    Output('sector_dd', 'value'),
-    Output('school_type_dd', 'value'),
-    Output('modified_coc_dd', 'value'),
-    Output('school_subclass_dd', 'value'),
-    Input('clear_btn', 'n_clicks'),
-    prevent_initial_call=True
-)
-def clear_all_dropdowns(n_clicks):
-    return ([],) * 10
-
-
-@app.callback(
-    Output('male_summary_card', 'children'),
-    Output('female_summary_card', 'children'),
-    Output('total_summary_card', 'children'),
-    Output('total_school_card', 'children'),
-    Output('education_bar_chart', 'figure'),
-    Output('elementary_bar_chart', 'figure'),
-    Output('jhs_bar_chart', 'figure'),
-    Output('shs_bar_chart', 'figure'),
-    Output('enrollment_rate_chart', 'figure'),
-    Output('tracks_rate_chart', 'figure'),
-    Input('stored-data', 'data'),
-    Input('region_dd', 'value'),
-    Input('province_dd', 'value'),
-    Input('division_dd', 'value'),
-    Input('district_dd', 'value'),
-    Input('municipality_dd', 'value'),
-    Input('legislative_district_dd', 'value'),
-    Input('sector_dd', 'value'),
-    Input('school_type_dd', 'value'),
-    Input('modified_coc_dd', 'value'),
-    Input('school_subclass_dd', 'value')
-)
-def update_metrics_and_chart(data, region, province, division, district, municipality,
-                             legislative_district, sector, school_type, modified_coc, school_subclass):
-    if data is None:
-        empty_fig = px.bar(
-            x=["Elementary", "Junior High School", "Senior High School"],
-            y=[0, 0, 0],
-            title="No data available",
-            labels={"x": "Education Level", "y": "Enrollment"}
-        )
-        empty_fig.update_layout(
-            plot_bgcolor='white',
-            paper_bgcolor='white',
-            font={'color': '#1d1d1f'},
-            margin=dict(l=10, r=10, t=40, b=10),
-            title_font_size=16,
-            showlegend=False
-        )
-        return (
-            html.Div(children=[html.Div("0", style={"font-size": "24px", "text-align": "center"}),
-                               html.Div("Males",
-                                        style={"font-size": "16px", "text-align": "center", "font-weight": "normal"})],
-                     style={
-                         "display": "flex", "flexDirection": "column", "alignItems": "center"}),
-            html.Div(children=[html.Div("0", style={"font-size": "24px", "text-align": "center"}),
-                               html.Div("Females",
-                                        style={"font-size": "16px", "text-align": "center", "font-weight": "normal"})],
-                     style={
-                         "display": "flex", "flexDirection": "column", "alignItems": "center"}),
-            html.Div(children=[html.Div("0", style={"font-size": "24px", "text-align": "center"}),
-                               html.Div("Enrollment",
-                                        style={"font-size": "16px", "text-align": "center", "font-weight": "normal"})],
-                     style={
-                         "display": "flex", "flexDirection": "column", "alignItems": "center"}),
-            html.Div(children=[html.Div("0", style={"font-size": "24px", "text-align": "center"}),
-                               html.Div("Schools",
-                                        style={"font-size": "16px", "text-align": "center", "font-weight": "normal"})],
-                     style={
-                         "display": "flex", "flexDirection": "column", "alignItems": "center"}),
-            empty_fig,
-            empty_fig,
-            empty_fig,
-            empty_fig,
-            empty_fig,
-            empty_fig)
-
-    df = pd.DataFrame(data)
-
-    # this is fixed enrollees sum (will  not be changed based on the filters)
-    enrollment_cols = [col for col in df.columns if 'Male' in col or 'Female' in col]
-    df[enrollment_cols] = df[enrollment_cols].apply(pd.to_numeric, errors='coerce').fillna(0)
-    fixed_enrollee_sum = int(df[enrollment_cols].sum().sum())
-
-    # fixed total schools
-    fixed_total_schools = df.drop_duplicates().shape[0]
-
-    # Define columns
-    elementary_male = ['K Male', 'G1 Male', 'G2 Male', 'G3 Male', 'G4 Male', 'G5 Male', 'G6 Male', 'Elem NG Male']
-    elementary_female = ['K Female', 'G1 Female', 'G2 Female', 'G3 Female', 'G4 Female', 'G5 Female', 'G6 Female',
-                         'Elem NG Female']
-    junior_male = ['G7 Male', 'G8 Male', 'G9 Male', 'G10 Male', 'JHS NG Male']
-    junior_female = ['G7 Female', 'G8 Female', 'G9 Female', 'G10 Female', 'JHS NG Female']
-    senior_male = [
-        'G11 ACAD ABM Male', 'G11 ACAD HUMSS Male', 'G11 ACAD STEM Male', 'G11 ACAD GAS Male', 'G11 ACAD PBM Male',
-        'G11 TVL Male', 'G11 SPORTS Male', 'G11 ARTS Male', 'G12 ACAD ABM Male', 'G12 ACAD HUMSS Male',
-        'G12 ACAD STEM Male', 'G12 ACAD GAS Male', 'G12 ACAD PBM Male', 'G12 TVL Male', 'G12 SPORTS Male',
-        'G12 ARTS Male'
-    ]
-    senior_female = [
-        'G11 ACAD ABM Female', 'G11 ACAD HUMSS Female', 'G11 ACAD STEM Female', 'G11 ACAD GAS Female',
-        'G11 ACAD PBM Female',
-        'G11 TVL Female', 'G11 SPORTS Female', 'G11 ARTS Female', 'G12 ACAD ABM Female', 'G12 ACAD HUMSS Female',
-        'G12 ACAD STEM Female', 'G12 ACAD GAS Female', 'G12 ACAD PBM Female', 'G12 TVL Female', 'G12 SPORTS Female',
-        'G12 ARTS Female'
-    ]
-    all_gender_cols = elementary_male + elementary_female + junior_male + junior_female + senior_male + senior_female
-
-    # Apply filters
-    filters = {
-        'Region': region,
-        'Province': province,
-        'Division': division,
-        'District': district,
-        'Municipality': municipality,
-        'Legislative District': legislative_district,
-        'Sector': sector,
-        'School Type': school_type,
-        'Modified COC': modified_coc,
-        'School Subclassification': school_subclass
-    }
-
-    for col, selected_values in filters.items():
-        if selected_values:
-            df = df[df[col].isin(selected_values)]
-
-    df[all_gender_cols] = df[all_gender_cols].replace('Not Applicable', 0)
-    df[all_gender_cols] = df[all_gender_cols].apply(pd.to_numeric, errors='coerce').fillna(0)
-
-    total_male = df[[col for col in all_gender_cols if 'Male' in col]].sum().sum()
-    total_female = df[[col for col in all_gender_cols if 'Female' in col]].sum().sum()
-    total_enrollees = total_male + total_female
-    total_schools = df['BEIS School ID'].nunique()
-
-    # Apple-style plot formatting
-    apple_theme = {
-        'plot_bgcolor': 'white',
-        'paper_bgcolor': 'white',
-        'font': {'color': '#1d1d1f', 'family': 'SF Pro Display, Helvetica, Arial, sans-serif'},
-        'title_font_size': 16,
-        'xaxis': {'showgrid': False},
-        'yaxis': {'showgrid': True, 'gridcolor': '#f5f5f7', 'title': None},
-        'legend': {'orientation': 'h', 'yanchor': 'bottom', 'y': 1.02, 'xanchor': 'right', 'x': 1},
-        'margin': dict(l=10, r=10, t=40, b=10),
-    }
-
-    male_color = '#1582b5'
-    female_color = '#f05374'
-
-    # Education Level Bar Chart
-    bar_data = pd.DataFrame({
-        'Education Level': ['Elementary', 'Elementary', 'Junior High School', 'Junior High School',
-                            'Senior High School', 'Senior High School'],
-        'Gender': ['Male', 'Female'] * 3,
-        'Enrollment': [
-            df[elementary_male].sum().sum(), df[elementary_female].sum().sum(),
-            df[junior_male].sum().sum(), df[junior_female].sum().sum(),
-            df[senior_male].sum().sum(), df[senior_female].sum().sum()
-        ]
-    })
-
-    # Calculate total enrollment per education level
-    bar_data["Total Enrollment"] = bar_data.groupby("Education Level")["Enrollment"].transform("sum")
-
-    bar_data["Education Level"] = bar_data["Education Level"].replace({
-        "Junior High School": "Junior HS",
-        "Senior High School": "Senior HS"
-    })
-
-    edu_order = ["Elementary", "Junior HS", "Senior HS"]
-
-    education_fig = px.bar(
-        bar_data,
-        y="Enrollment",
-        x="Education Level",
-        color="Gender",
-        barmode="stack",
-        custom_data=["Total Enrollment", "Gender"],
-        color_discrete_map={'Male': male_color, 'Female': female_color},
-        category_orders={"Education Level": edu_order}
-    )
-
-    education_fig.update_traces(
-        hovertemplate="<b>%{x}</b><br>Gender: %{customdata[1]}<br>Enrollment: %{y}<br>Total Enrollment: %{customdata[0]:,}<extra></extra>"
-    )
-
-    education_fig.update_layout(**apple_theme)
-
-    # Elementary
-
-    grade_levels = ['K', 'G1', 'G2', 'G3', 'G4', 'G5', 'G6', 'Elem NG']
-    male_values = [df[f'{lvl} Male'].sum() for lvl in grade_levels]
-    female_values = [df[f'{lvl} Female'].sum() for lvl in grade_levels]
-    total_values = [m + f for m, f in zip(male_values, female_values)]
-
-    total_values_repeated = total_values * 2
-    genders = ['Male'] * len(grade_levels) + ['Female'] * len(grade_levels)
-    enrollments = male_values + female_values
-
-    elementary_df = pd.DataFrame({
-        'Grade Level': grade_levels * 2,
-        'Gender': genders,
-        'Enrollment': enrollments,
-        'Total': total_values_repeated
-    })
-
-    elementary_fig = px.bar(
-        elementary_df,
-        x='Grade Level',
-        y='Enrollment',
-        color='Gender',
-        barmode='stack',
-        text='Enrollment',
-        color_discrete_map={'Male': male_color, 'Female': female_color},
-        custom_data=['Total', 'Gender'],
-        category_orders={
-            'Grade Level': ['K', 'G1', 'G2', 'G3', 'G4', 'G5', 'G6', 'Elem NG']
-        },
-        labels={'Grade Level': 'Grade Level'}
-    )
-
-    elementary_fig.update_layout(**apple_theme)
+    elementary_fig.update_layout(**apple_theme)
 
     elementary_fig.update_traces(
         texttemplate='%{text:,}',
@@ -1167,8 +2108,8 @@ def update_metrics_and_chart(data, region, province, division, district, municip
 
     # Junior HS
     jhs_levels = ['G7', 'G8', 'G9', 'G10', 'JHS NG']
-    jhs_male_values = [df[f'{lvl} Male'].sum() for lvl in jhs_levels]
-    jhs_female_values = [df[f'{lvl} Female'].sum() for lvl in jhs_levels]
+    jhs_male_values = [totals[f'{lvl} Male'] for lvl in jhs_levels]
+    jhs_female_values = [totals[f'{lvl} Female'] for lvl in jhs_levels]
     jhs_total_values = [m + f for m, f in zip(jhs_male_values, jhs_female_values)]
 
     jhs_total_repeated = jhs_total_values * 2
@@ -1213,16 +2154,8 @@ def update_metrics_and_chart(data, region, province, division, district, municip
         'ACAD ABM', 'ACAD HUMSS', 'ACAD STEM', 'ACAD GAS', 'ACAD PBM', 'TVL', 'SPORTS', 'ARTS'
     ]
 
-    male_shs_values = [
-        df[[f'G11 {track} Male' if 'G11' in f'G11 {track} Male' else f'G11 ACAD {track} Male',
-            f'G12 {track} Male' if 'G12' in f'G12 {track} Male' else f'G12 ACAD {track} Male']].sum().sum()
-        for track in shs_tracks
-    ]
-    female_shs_values = [
-        df[[f'G11 {track} Female' if 'G11' in f'G11 {track} Female' else f'G11 ACAD {track} Female',
-            f'G12 {track} Female' if 'G12' in f'G12 {track} Female' else f'G12 ACAD {track} Female']].sum().sum()
-        for track in shs_tracks
-    ]
+    male_shs_values = [totals[f'G11 {track} Male'] + totals[f'G12 {track} Male'] for track in shs_tracks]
+    female_shs_values = [totals[f'G11 {track} Female'] + totals[f'G12 {track} Female'] for track in shs_tracks]
 
     total_shs_values = [m + f for m, f in zip(male_shs_values, female_shs_values)]
     shs_total_repeated = total_shs_values * 2
@@ -1288,11 +2221,10 @@ def update_metrics_and_chart(data, region, province, division, district, municip
         male_cols = [col for col in cols if 'Male' in col]
         female_cols = [col for col in cols if 'Female' in col]
 
-        df[level + '_Male'] = df[male_cols].sum(axis=1)
-        df[level + '_Female'] = df[female_cols].sum(axis=1)
-
-        male_avg = round(df[level + '_Male'].mean())
-        female_avg = round(df[level + '_Female'].mean())
+        # Mean per school offering the level = column total / number of those schools
+        schools = offering['Elementary'] if cols[0] in ELEMENTARY_MALE else offering['Junior High School']
+        male_avg = round(sum(totals[col] for col in male_cols) / schools) if schools else 0
+        female_avg = round(sum(totals[col] for col in female_cols) / schools) if schools else 0
         total_avg = male_avg + female_avg
 
         data.append(
@@ -1362,13 +2294,14 @@ def update_metrics_and_chart(data, region, province, division, district, municip
         g11_female_col = [col for col in cols if 'G11' in col and 'Female' in col]
         g12_female_col = [col for col in cols if 'G12' in col and 'Female' in col]
 
-        g11_male_avg = df[g11_male_col].mean(axis=1)
-        g12_male_avg = df[g12_male_col].mean(axis=1)
-        g11_female_avg = df[g11_female_col].mean(axis=1)
-        g12_female_avg = df[g12_female_col].mean(axis=1)
+        g11_male = sum(totals[col] for col in g11_male_col)
+        g12_male = sum(totals[col] for col in g12_male_col)
+        g11_female = sum(totals[col] for col in g11_female_col)
+        g12_female = sum(totals[col] for col in g12_female_col)
 
-        male_avg = round(((g11_male_avg + g12_male_avg) / 2).mean())
-        female_avg = round(((g11_female_avg + g12_female_avg) / 2).mean())
+        schools = offering['Senior High School']
+        male_avg = round((g11_male + g12_male) / 2 / schools) if schools else 0
+        female_avg = round((g11_female + g12_female) / 2 / schools) if schools else 0
         total_avg = male_avg + female_avg
 
         data.append({'Track': track, 'Gender': 'Male', 'Average Enrollees': male_avg, 'Total Enrollees': total_avg})
@@ -1430,14 +2363,14 @@ def update_metrics_and_chart(data, region, province, division, district, municip
             html.H4("Enrollees", style={'fontSize': '15px', 'margin': '0px', 'marginTop': '5px'}),
             html.Div(f"{int(total_enrollees):,}", style={'fontSize': '30px', 'fontWeight': 'bold'}),
             html.Div(
-                f"{int(total_enrollees) / fixed_enrollee_sum * 100:.1f}% of Nationwide" if fixed_enrollee_sum > 0 else "0%",
+                f"{int(total_enrollees) / national_enrollment * 100:.1f}% of Nationwide" if national_enrollment > 0 else "0%",
                 style={'fontSize': '14px', 'color': '#888'}), ]),
 
         html.Div([
             html.H4("Schools", style={'fontSize': '15px', 'margin': '0px', 'marginTop': '5px'}),
             html.Div(f"{int(total_schools):,}", style={'fontSize': '30px', 'fontWeight': 'bold'}),
             html.Div(
-                f"{int(total_schools) / fixed_total_schools * 100:.1f}% of Nationwide" if fixed_total_schools > 0 else "0%",
+                f"{int(total_schools) / national_schools * 100:.1f}% of Nationwide" if national_schools > 0 else "0%",
                 style={'fontSize': '14px', 'color': '#888'}), ]),
 
         education_fig,
@@ -1449,65 +2382,720 @@ def update_metrics_and_chart(data, region, province, division, district, municip
     )
 
 
-# Comparison Dashboard Callbacks
-@app.callback(
-    Output('header-status', 'children'),
-    Input('stored-data-present', 'data'),
-    Input('stored-data-previous', 'data')
-)
-def update_header_status(present_data, previous_data):
-    if present_data and previous_data:
-        return "Present & Previous Year Data Loaded"
-    elif present_data:
-        return "Present Year Data Loaded"
-    elif previous_data:
-        return "Previous Year Data Loaded"
+def growth_outputs(present_totals, previous_totals):
+    """Growth card and year-over-year charts, built from the per-column totals of the filtered rows of both years"""
+    summary = growth_summary(present_totals, previous_totals)
+    total_present, total_previous = summary['present'], summary['previous']
+    difference, percent_change = summary['difference'], summary['percent_change']
+
+    # Determine color and arrow based on growth/decline
+    if difference > 0:
+        color = COLORS['success']
+        arrow = '↑'
+    elif difference < 0:
+        color = COLORS['error']
+        arrow = '↓'
     else:
-        return "No Data Loaded"
+        color = COLORS['accent']
+        arrow = '→'
 
+    # Create data for enrollment trend chart
+    trend_data = [{
+        'Level': label,
+        'Previous Year': level['previous'],
+        'Present Year': level['present'],
+        'Dropouts': level['dropouts'],
+        'Dropout Rate (%)': level['dropout_rate']
+    } for label, level in summary['levels'].items()]
 
-@app.callback(
-    Output('output-data1', 'children'),
-    Output('output-data2', 'children'),
-    Output('stored-data-present', 'data'),
-    Output('stored-data-previous', 'data'),
-    Input('upload-data1', 'contents'),
-    Input('upload-data2', 'contents'),
-    Input('clear-files-btn', 'n_clicks'),
-    State('upload-data1', 'filename'),
-    State('upload-data2', 'filename'),
-    prevent_initial_call=True
-)
-def handle_file_uploads(contents1, contents2, clear_clicks, filename1, filename2):
-    ctx = callback_context
+    # Convert to DataFrame for charting
+    trend_df = pd.DataFrame(trend_data)
 
-    if not ctx.triggered:
-        return dash.no_update, dash.no_update, dash.no_update, dash.no_update
+    # Set colors for current and previous years
+    present_color = '#199ad6'
+    previous_color = '#ff375f'
+    # Create enrollment comparison chart
+    enroll_fig = px.bar(trend_df, x='Level', y=['Previous Year', 'Present Year'], labels={'value': 'Number of Students', 'variable': 'Year'},
+                        barmode='group', color='variable', color_discrete_map={'Previous Year': previous_color, 'Present Year': present_color})
 
-    triggered_id = ctx.triggered[0]['prop_id'].split('.')[0]
+    enroll_fig.update_layout(
+        {
+    'plot_bgcolor': 'white',
+    'paper_bgcolor': 'white',
+    'font': {'color': '#1d1d1f', 'family': 'SF Pro Display, Helvetica, Arial, sans-serif'},
+    'title_font_size': 16,
+    'xaxis': {'showgrid': False},
+    'yaxis': {'showgrid': True, 'gridcolor': '#f5f5f7', 'title': None},
+    'legend': {'orientation': 'h', 'yanchor': 'bottom', 'y': 1.02, 'xanchor': 'right', 'x': 1},
+    'margin': dict(l=10, r=10, t=40, b=10),
+})
 
-    if triggered_id == 'clear-files-btn':
-        return "", "", None, None
+    # ===== SHS STRAND COMPARISON =====
+    strands = list(STRAND_COLUMNS)
 
-    outputs = [dash.no_update, dash.no_update, dash.no_update, dash.no_update]
+    # Create DataFrame for strand comparison
+    comparison_df = pd.DataFrame({
+        'Strand': strands,
+        'Previous Year': [summary['strands'][s]['previous'] for s in strands],
+        'Present Year': [summary['strands'][s]['present'] for s in strands]
 
-    if triggered_id == 'upload-data1' and contents1:
-        df = parse_contents(contents1, filename1)
-        if not df.empty:
-            outputs[0] = f"{filename1} uploaded as present year"
-            outputs[2] = df.to_dict('records')
-        else:
-            outputs[0] = f"Error reading {filename1}"
+    })
 
-    if triggered_id == 'upload-data2' and contents2:
-        df = parse_contents(contents2, filename2)
-        if not df.empty:
-            outputs[1] = f"{filename2} uploaded as previous year"
-            outputs[3] = df.to_dict('records')
-        else:
-            outputs[1] = f"Error reading {filename2}"
+    # Create strand comparison chart
+    strand_comparison_fig = px.bar(
+        comparison_df.melt(id_vars='Strand'),
+        x='Strand', y='value', color='variable',
+        labels={'value': 'Number of Students', 'variable': 'Year'},
+        barmode='group',
+        color_discrete_map={'Present Year': present_color, 'Previous Year': previous_color}
+    )
 
-    return tuple(outputs)
+    # Apply custom layout and theme
+    apple_theme = {
+    'plot_bgcolor': 'white',
+    'paper_bgcolor': 'white',
+    'font': {'color': '#1d1d1f', 'family': 'SF Pro Display, Helvetica, Arial, sans-serif'},
+    'title_font_size': 16,
+    'xaxis': {'showgrid': False},
+    'yaxis': {'showgrid': True, 'gridcolor': '#f5f5f7', 'title': None},
+    'legend': {'orientation': 'h', 'yanchor': 'bottom', 'y': 1.02, 'xanchor': 'right', 'x': 1},
+    'margin': dict(l=10, r=10, t=40, b=10),
+}
+    strand_comparison_fig.update_layout(
+        **apple_theme)
+
+    # ===== KINDER TO GRADE 10 COMPARISON =====
+    all_levels = K10_LEVELS
+
+    # Create DataFrame for K10 comparison
+    k10_comparison_df = pd.DataFrame({
+        'Grade Level': all_levels,
+        'Previous Year': [summary['k10'][level]['previous'] for level in all_levels],
+        'Present Year': [summary['k10'][level]['present'] for level in all_levels]
+    })
+
+    # Create K10 comparison chart
+    k10_comparison_fig = px.bar(
+        k10_comparison_df.melt(id_vars='Grade Level'),
+        x='Grade Level', y='value', color='variable',
+        labels={'value': 'Number of Students', 'variable': 'Year'},
+        color_discrete_map={'Previous Year': previous_color, 'Present Year': present_color, },
+        barmode='group'
+    )
+
+    k10_comparison_fig.update_layout(
+        **apple_theme)
+
+    # Create growth card display
+    growth_card = html.Div([
+        html.Div([
+            # Previous Year
+            html.Div([
+                html.Div("Previous Year", style={'fontSize': '14px', 'color': COLORS['accent'], 'textAlign': 'center'}),
+                html.Div(f"{int(total_previous):,}", style={
+                    'fontSize': '24px',
+                    'fontWeight': 'bold',
+                    'textAlign': 'center',
+                    'margin': '5px 0'
+                })
+            ], style={'flex': 1, 'padding': '10px'}),
+
+            # Present Year
+            html.Div([
+                html.Div("Present Year", style={'fontSize': '14px', 'color': COLORS['accent'], 'textAlign': 'center'}),
+                html.Div(f"{int(total_present):,}", style={
+                    'fontSize': '24px',
+                    'fontWeight': 'bold',
+                    'textAlign': 'center',
+                    'margin': '5px 0'
+                })
+            ], style={'flex': 1, 'padding': '10px', 'borderLeft': '1px solid #d2d2d7',
+                      'borderRight': '1px solid #d2d2d7'}),
+
+            # Change
+            html.Div([
+                html.Div("Change", style={'fontSize': '14px', 'color': COLORS['accent'], 'textAlign': 'center'}),
+                html.Div([
+                    html.Span(f"{arrow} {abs(int(difference)):,}", style={
+                        'color': color,
+                        'fontSize': '24px',
+                        'fontWeight': 'bold',
+                        'marginRight': '5px'
+                    }),
+                    html.Span(f"({percent_change:.1f}%)", style={
+                        'color': color,
+                        'fontSize': '18px'
+                    })
+                ], style={'textAlign': 'center', 'margin': '5px 0'})
+            ], style={'flex': 1, 'padding': '10px'})
+        ], style={
+            'display': 'flex',
+            'justifyContent': 'space-around',
+            'alignItems': 'center'
+        })
+    ])
+
+    # Return all four outputs as a tuple
+    return growth_card, enroll_fig, strand_comparison_fig, k10_comparison_fig
+
+
+def school_size_outputs(size, female, school_ids, level='All'):
+    """
+    WebGL scatter of school enrollment against the female share, with histograms of both binned here over every
+    matching school. Only a density-preserving sample of the schools is drawn; outliers are always drawn.
+    """
+    if not len(size):
+        return px.bar(title="No data available")
+
+    share = female / size * 100
+    shown, outliers = downsample_points(size, female)
+    size_counts, size_edges = np.histogram(size, bins=min(50, max(len(np.unique(size)), 1)))
+    share_counts, share_edges = np.histogram(share, bins=20, range=(0, 100))
+    male_color = '#1582b5'
+    female_color = '#f05374'
+    hover = "<b>School %{customdata}</b><br>Enrollment: %{x:,}<br>Female: %{y:.1f}%<extra></extra>"
+
+    fig = go.Figure()
+    for name, keep, color in (('Schools', ~outliers[shown], male_color), ('Outliers', outliers[shown], female_color)):
+        points = shown[keep]
+        fig.add_trace(go.Scattergl(
+            x=size[points], y=share[points], customdata=school_ids[points], mode='markers', name=name,
+            marker={'size': 5, 'color': color, 'opacity': 0.5 if name == 'Schools' else 0.9},
+            hovertemplate=hover
+        ))
+    fig.add_trace(go.Bar(
+        x=(size_edges[:-1] + size_edges[1:]) / 2, y=size_counts, width=np.diff(size_edges), yaxis='y2',
+        marker={'color': male_color}, opacity=0.6, showlegend=False, hovertemplate="%{y:,} schools<extra></extra>"
+    ))
+    fig.add_trace(go.Bar(
+        y=(share_edges[:-1] + share_edges[1:]) / 2, x=share_counts, width=np.diff(share_edges), orientation='h',
+        xaxis='x2', marker={'color': female_color}, opacity=0.6, showlegend=False,
+        hovertemplate="%{x:,} schools<extra></extra>"
+    ))
+
+    fig.update_layout(
+        plot_bgcolor='white',
+        paper_bgcolor='white',
+        font={'color': '#1d1d1f', 'family': 'SF Pro Display, Helvetica, Arial, sans-serif'},
+        margin=dict(l=10, r=10, t=40, b=10),
+        bargap=0,
+        legend={'orientation': 'h', 'yanchor': 'bottom', 'y': 1.02, 'xanchor': 'right', 'x': 1},
+        xaxis={'domain': [0, 0.84], 'showgrid': False,
+               'title': f"Enrollment per school ({'all levels' if level == 'All' else level})"},
+        yaxis={'domain': [0, 0.8], 'range': [0, 100], 'gridcolor': '#f5f5f7', 'title': 'Female share (%)'},
+        xaxis2={'domain': [0.86, 1], 'showticklabels': False, 'showgrid': False},
+        yaxis2={'domain': [0.82, 1], 'showticklabels': False, 'showgrid': False},
+        title={'text': f"{len(size):,} schools, {len(shown):,} drawn", 'font': {'size': 13}, 'x': 0}
+    )
+    return fig
+
+
+def gpi_heatmap_outputs(names, gpi, sort='Name', descending=False):
+    """Heatmap of the GPI of every geography (rows) per level and strand (columns), centred on parity"""
+    measures = list(GPI_MEASURES)
+    if sort in measures:
+        # Geographies without enrollment in the sorted measure go last either way
+        values = gpi[:, measures.index(sort)]
+        order = np.argsort(np.where(np.isnan(values), np.inf, -values if descending else values), kind='stable')
+    else:
+        order = np.argsort(np.array(names, dtype=object), kind='stable')
+        order = order[::-1] if descending else order
+    names, gpi = [names[i] for i in order], gpi[order]
+
+    spread = min(max(np.nanmax(np.abs(gpi - 1)) if np.isfinite(gpi).any() else 0.1, 0.05), 0.5)
+    fig = go.Figure(go.Heatmap(
+        z=gpi, x=measures, y=names, colorscale='RdBu', zmid=1, zmin=1 - spread, zmax=1 + spread,
+        texttemplate='%{z:.2f}' if len(names) <= 80 else None, colorbar={'title': 'GPI'},
+        hovertemplate="<b>%{y}</b><br>%{x}: GPI %{z:.3f}<extra></extra>"
+    ))
+    fig.update_layout(
+        plot_bgcolor='white',
+        paper_bgcolor='white',
+        font={'color': '#1d1d1f', 'family': 'SF Pro Display, Helvetica, Arial, sans-serif'},
+        margin=dict(l=10, r=10, t=30, b=10),
+        height=max(400, 22 * len(names) + 120),
+        xaxis={'side': 'top'},
+        yaxis={'autorange': 'reversed', 'automargin': True}
+    )
+    return fig
+
+
+# =========================================================== END OF FIGURES ============================================================================
+
+# =========================================================== CALLBACKS =================================================================================
+# Page routing callback
+@app.callback(
+    Output('page-content', 'children'),
+    Input('url', 'pathname')
+)
+def display_page(pathname):
+    if pathname == '/comparison-dashboard':
+        return comparison_dashboard_layout()
+    elif pathname == '/gpi':
+        return gpi_explorer_layout()
+    else:
+        return main_dashboard_layout()
+
+
+# Main Dashboard Callbacks
+@app.callback(
+    Output('output-upload', 'children'),
+    Output('stored-data', 'data'),
+    Output('national-baseline', 'data'),
+    Input('upload-dataset', 'contents'),
+    Input('clear-btn', 'n_clicks'),
+    Input('append-dataset', 'contents'),
+    State('upload-dataset', 'filename'),
+    State('append-dataset', 'filename'),
+    State('stored-data', 'data'),
+    State('national-baseline', 'data')
+)
+def handle_upload_or_clear(contents, clear_clicks, append_contents, filename, append_filename, data, baseline):
+    triggered_id = ctx.triggered_id
+    if triggered_id == 'clear-btn':
+        return "Upload cleared. Please upload a new file.", None, None
+    if triggered_id == 'append-dataset' and append_contents is not None:
+        if not data:
+            # Nothing to append to yet: the file becomes the upload
+            contents, filename = append_contents, append_filename
+        else:
+            try:
+                with timed('ingest'):
+                    records, baseline, added = append_upload(data, baseline, append_contents, append_filename)
+            except Exception as e:
+                return f"Error appending {append_filename}: {e}", dash.no_update, dash.no_update
+            if not added:
+                return f"{append_filename}: no new schools to append", dash.no_update, dash.no_update
+            warm_views(baseline, records=records)
+            return f"Appended {added:,} schools from {append_filename}", records, baseline
+    if contents is None:
+        # A saved session may still be reattached from the browser's baseline record (see reattach_upload)
+        raise PreventUpdate
+
+    try:
+        with timed('ingest'):
+            df, statuses = parse_uploads(contents, filename)
+            if not row_count(df):
+                return upload_status(statuses), None, None
+            records = to_records(df)
+            baseline = ingest_baseline(df, contents, filename if isinstance(filename, str) else ', '.join(filename))
+        warm_views(baseline, df=df)
+        return upload_status(statuses), records, baseline
+    except Exception as e:
+        return f"Error reading file: {e}", None, None
+
+
+@app.callback(
+    Output('region_dd', 'options'),
+    Output('province_dd', 'options'),
+    Output('division_dd', 'options'),
+    Output('district_dd', 'options'),
+    Output('municipality_dd', 'options'),
+    Output('legislative_district_dd', 'options'),
+    Output('sector_dd', 'options'),
+    Output('school_type_dd', 'options'),
+    Output('modified_coc_dd', 'options'),
+    Output('school_subclass_dd', 'options'),
+    Input('stored-data', 'data'),
+    Input('region_dd', 'value'),
+    Input('province_dd', 'value'),
+    Input('division_dd', 'value'),
+    Input('district_dd', 'value'),
+    Input('municipality_dd', 'value'),
+    Input('legislative_district_dd', 'value'),
+    Input('sector_dd', 'value'),
+    Input('school_type_dd', 'value'),
+    Input('modified_coc_dd', 'value'),
+    Input('school_subclass_dd', 'value'),
+    Input('district_dd', 'search_value'),
+    Input('municipality_dd', 'search_value'),
+    State('national-baseline', 'data'),
+    coalesce=True
+)
+def update_dropdown_options(data, region, province, division, district, municipality,
+                            legislative_district, sector, school_type, modified_coc, school_subclass=None,
+                            district_search=None, municipality_search=None, baseline=None):
+    if not data:
+        return ([],) * 10
+
+    index = get_filter_index(baseline, data)
+
+    # Each dropdown lists the values left by the selections made above it, labelled with the schools and
+    # enrollment each value would leave given the selections in every other dropdown
+    selections = [region, province, division, district, municipality, legislative_district,
+                  sector, school_type, modified_coc, school_subclass]
+    searches = {FILTER_COLUMNS.index('District'): district_search,
+                FILTER_COLUMNS.index('Municipality'): municipality_search}
+    # Typing in a searchable dropdown only refreshes that dropdown's options
+    searched = {'district_dd': 'District', 'municipality_dd': 'Municipality'}.get(triggered_id())
+    positions = [FILTER_COLUMNS.index(searched)] if searched else None
+    with timed('aggregate'):
+        options = index.labelled_options(selections[:-1] + [None], selections, searches, positions)
+    if searched:
+        return tuple(options[0] if i == positions[0] else dash.no_update for i in range(10))
+    (region_options, province_options, division_options, district_options, municipality_options,
+     legislative_district_options, sector_options, school_type_options, modified_coc_options,
+     school_subclass_options) = options
+
+    return (region_options, province_options, division_options, district_options,
+            municipality_options, legislative_district_options, sector_options,
+            school_type_options, modified_coc_options, school_subclass_options)
+
+
+@app.callback(
+    Output('region_dd', 'value'),
+    Output('province_dd', 'value'),
+    Output('division_dd', 'value'),
+    Output('district_dd', 'value'),
+    Output('municipality_dd', 'value'),
+    Output('legislative_district_dd', 'value'),
+    Output('sector_dd', 'value'),
+    Output('school_type_dd', 'value'),
+    Output('modified_coc_dd', 'value'),
+    Output('school_subclass_dd', 'value'),
+    Input('clear_btn', 'n_clicks'),
+    prevent_initial_call=True
+)
+def clear_all_dropdowns(n_clicks):
+    return ([],) * 10
+
+
+@app.callback(
+    Output('male_summary_card', 'children'),
+    Output('female_summary_card', 'children'),
+    Output('total_summary_card', 'children'),
+    Output('total_school_card', 'children'),
+    Output('education_bar_chart', 'figure'),
+    Output('elementary_bar_chart', 'figure'),
+    Output('jhs_bar_chart', 'figure'),
+    Output('shs_bar_chart', 'figure'),
+    Output('enrollment_rate_chart', 'figure'),
+    Output('tracks_rate_chart', 'figure'),
+    Input('stored-data', 'data'),
+    Input('region_dd', 'value'),
+    Input('province_dd', 'value'),
+    Input('division_dd', 'value'),
+    Input('district_dd', 'value'),
+    Input('municipality_dd', 'value'),
+    Input('legislative_district_dd', 'value'),
+    Input('sector_dd', 'value'),
+    Input('school_type_dd', 'value'),
+    Input('modified_coc_dd', 'value'),
+    Input('school_subclass_dd', 'value'),
+    State('national-baseline', 'data'),
+    heavy=True
+)
+def update_metrics_and_chart(data, region, province, division, district, municipality,
+                             legislative_district, sector, school_type, modified_coc, school_subclass,
+                             baseline=None):
+    if data is None:
+        empty_fig = px.bar(
+            x=["Elementary", "Junior High School", "Senior High School"],
+            y=[0, 0, 0],
+            title="No data available",
+            labels={"x": "Education Level", "y": "Enrollment"}
+        )
+        empty_fig.update_layout(
+            plot_bgcolor='white',
+            paper_bgcolor='white',
+            font={'color': '#1d1d1f'},
+            margin=dict(l=10, r=10, t=40, b=10),
+            title_font_size=16,
+            showlegend=False
+        )
+        return (
+            html.Div(children=[html.Div("0", style={"font-size": "24px", "text-align": "center"}),
+                               html.Div("Males",
+                                        style={"font-size": "16px", "text-align": "center", "font-weight": "normal"})],
+                     style={
+                         "display": "flex", "flexDirection": "column", "alignItems": "center"}),
+            html.Div(children=[html.Div("0", style={"font-size": "24px", "text-align": "center"}),
+                               html.Div("Females",
+                                        style={"font-size": "16px", "text-align": "center", "font-weight": "normal"})],
+                     style={
+                         "display": "flex", "flexDirection": "column", "alignItems": "center"}),
+            html.Div(children=[html.Div("0", style={"font-size": "24px", "text-align": "center"}),
+                               html.Div("Enrollment",
+                                        style={"font-size": "16px", "text-align": "center", "font-weight": "normal"})],
+                     style={
+                         "display": "flex", "flexDirection": "column", "alignItems": "center"}),
+            html.Div(children=[html.Div("0", style={"font-size": "24px", "text-align": "center"}),
+                               html.Div("Schools",
+                                        style={"font-size": "16px", "text-align": "center", "font-weight": "normal"})],
+                     style={
+                         "display": "flex", "flexDirection": "column", "alignItems": "center"}),
+            empty_fig,
+            empty_fig,
+            empty_fig,
+            empty_fig,
+            empty_fig,
+            empty_fig)
+
+    filters = {
+        'Region': region,
+        'Province': province,
+        'Division': division,
+        'District': district,
+        'Municipality': municipality,
+        'Legislative District': legislative_district,
+        'Sector': sector,
+        'School Type': school_type,
+        'Modified COC': modified_coc,
+        'School Subclassification': school_subclass
+    }
+
+    # Views already drawn or aggregated for this upload are served without rebuilding the frame
+    key = view_key(baseline, filters)
+    if key:
+        attach_dataset(key[0])
+        record_view_usage(key[1])
+        outputs = FIGURE_CACHE.get(key)
+        if outputs is not None:
+            return outputs
+    view = VIEW_CACHE.get(key) if key else None
+    if view is None and key:
+        with timed('aggregate'):
+            view = dataset_view(key[0], filters)
+    if view is None:
+        with timed('parse'):
+            df = load_records(data)
+
+        with timed('aggregate'):
+            # The nationwide figures only change with the upload; sessions stored before the baseline rebuild it
+            if not baseline:
+                baseline = national_baseline(df)
+            view = filtered_view(df, filters)
+        if key:
+            remember_view(key, view)
+
+    with timed('figure'):
+        outputs = main_dashboard_outputs(*view, baseline)
+    if key:
+        FIGURE_CACHE.put(key, outputs)
+    return outputs
+
+
+@app.callback(
+    Output('output-upload', 'children', allow_duplicate=True),
+    Output('stored-data', 'data', allow_duplicate=True),
+    Input('national-baseline', 'modified_timestamp'),
+    State('national-baseline', 'data'),
+    State('stored-data', 'data'),
+    prevent_initial_call='initial_duplicate'
+)
+def reattach_upload(timestamp, baseline, data):
+    """Reload the saved upload of a browser that kept its baseline record across a reload or server restart"""
+    if data or not (baseline or {}).get('dataset'):
+        raise PreventUpdate
+    restored = restore_records(baseline)
+    if restored is None:
+        return "The previous upload is no longer on the server. Please upload the file again.", dash.no_update
+    records, filename = restored
+    return f"Restored: {filename}", records
+
+
+@app.callback(
+    Output('school-table', 'data'),
+    Output('school-table', 'page_count'),
+    Output('school-table', 'page_current'),
+    Output('school-table-count', 'children'),
+    Input('school-table', 'page_current'),
+    Input('school-table', 'page_size'),
+    Input('school-table', 'sort_by'),
+    Input('school-table', 'filter_query'),
+    Input('national-baseline', 'data'),
+    Input('region_dd', 'value'),
+    Input('province_dd', 'value'),
+    Input('division_dd', 'value'),
+    Input('district_dd', 'value'),
+    Input('municipality_dd', 'value'),
+    Input('legislative_district_dd', 'value'),
+    Input('sector_dd', 'value'),
+    Input('school_type_dd', 'value'),
+    Input('modified_coc_dd', 'value'),
+    Input('school_subclass_dd', 'value')
+)
+def update_school_table(page_current, page_size, sort_by, filter_query, baseline, *values):
+    """Only the visible page of the filtered, sorted schools is sent to the browser"""
+    key = (baseline or {}).get('dataset')
+    if not key:
+        return [], 1, 0, "Upload a file to list its schools."
+    # Any change other than turning the page starts again from the first page
+    props = triggered_props()
+    if props and 'school-table.page_current' not in props:
+        page_current = 0
+    page = school_page(key, dict(zip(FILTER_COLUMNS, values)), page_current or 0, page_size or SCHOOL_PAGE_SIZE,
+                       sort_by, filter_query)
+    if page is None:
+        return [], 1, 0, "The upload is no longer on the server. Please upload the file again."
+    rows, page_count, page_current, total = page
+    return rows, page_count, page_current, f"{total:,} school{'' if total == 1 else 's'}"
+
+
+@app.callback(
+    Output('school_size_chart', 'figure'),
+    Input('size-level', 'value'),
+    Input('national-baseline', 'data'),
+    Input('region_dd', 'value'),
+    Input('province_dd', 'value'),
+    Input('division_dd', 'value'),
+    Input('district_dd', 'value'),
+    Input('municipality_dd', 'value'),
+    Input('legislative_district_dd', 'value'),
+    Input('sector_dd', 'value'),
+    Input('school_type_dd', 'value'),
+    Input('modified_coc_dd', 'value'),
+    Input('school_subclass_dd', 'value'),
+    heavy=True
+)
+def update_school_size_chart(level, baseline, *values):
+    key = (baseline or {}).get('dataset')
+    sizes = school_sizes(key, dict(zip(FILTER_COLUMNS, values)), level or 'All') if key else None
+    if sizes is None:
+        return px.bar(title="No data available")
+    with timed('figure'):
+        return school_size_outputs(*sizes, level or 'All')
+
+
+@app.callback(
+    Output('gpi-heatmap', 'figure'),
+    Output('gpi-status', 'children'),
+    Input('gpi-year', 'value'),
+    Input('gpi-level', 'value'),
+    Input('gpi-sort', 'value'),
+    Input('gpi-order', 'value'),
+    Input('baseline-present', 'data'),
+    Input('baseline-previous', 'data'),
+    Input('national-baseline', 'data'),
+    heavy=True
+)
+def update_gpi_heatmap(year, level, sort, order, present_baseline=None, previous_baseline=None, baseline=None):
+    # The session's comparison uploads, with the main dashboard's upload standing in for the present year
+    if (year or 'present') == 'present':
+        key = (present_baseline or baseline or {}).get('dataset')
+    else:
+        key = (previous_baseline or {}).get('dataset')
+    table = gpi_table(key, level or 'Region') if key else None
+    if table is None:
+        return (px.bar(title="No data available"),
+                f"Upload the {year or 'present'} year data on the dashboards to explore its gender parity.")
+    names, gpi = table
+    with timed('figure'):
+        figure = gpi_heatmap_outputs(names, gpi, sort or 'Name', order == 'desc')
+    return figure, (f"{len(names):,} {(level or 'Region').lower()}s. GPI = female / male enrollment; "
+                    f"0.97 to 1.03 is parity.")
+
+
+@app.callback(
+    Output('export-links', 'children'),
+    Input('national-baseline', 'data'),
+    Input('region_dd', 'value'),
+    Input('province_dd', 'value'),
+    Input('division_dd', 'value'),
+    Input('district_dd', 'value'),
+    Input('municipality_dd', 'value'),
+    Input('legislative_district_dd', 'value'),
+    Input('sector_dd', 'value'),
+    Input('school_type_dd', 'value'),
+    Input('modified_coc_dd', 'value'),
+    Input('school_subclass_dd', 'value')
+)
+def update_export_links(baseline, *values):
+    return export_links(baseline, dict(zip(FILTER_COLUMNS, values)))
+
+
+# Comparison Dashboard Callbacks
+@app.callback(
+    Output('header-status', 'children'),
+    Input('stored-data-present', 'data'),
+    Input('stored-data-previous', 'data')
+)
+def update_header_status(present_data, previous_data):
+    if present_data and previous_data:
+        return "Present & Previous Year Data Loaded"
+    elif present_data:
+        return "Present Year Data Loaded"
+    elif previous_data:
+        return "Previous Year Data Loaded"
+    else:
+        return "No Data Loaded"
+
+
+@app.callback(
+    Output('output-data1', 'children'),
+    Output('output-data2', 'children'),
+    Output('stored-data-present', 'data'),
+    Output('stored-data-previous', 'data'),
+    Output('baseline-present', 'data'),
+    Output('baseline-previous', 'data'),
+    Input('upload-data1', 'contents'),
+    Input('upload-data2', 'contents'),
+    Input('clear-files-btn', 'n_clicks'),
+    State('upload-data1', 'filename'),
+    State('upload-data2', 'filename'),
+    prevent_initial_call=True
+)
+def handle_file_uploads(contents1, contents2, clear_clicks, filename1, filename2):
+    ctx = callback_context
+
+    if not ctx.triggered:
+        return (dash.no_update,) * 6
+
+    triggered_id = ctx.triggered[0]['prop_id'].split('.')[0]
+
+    if triggered_id == 'clear-files-btn':
+        return "", "", None, None, None, None
+
+    outputs = [dash.no_update] * 6
+
+    for position, (upload_id, contents, filename, year) in enumerate([
+            ('upload-data1', contents1, filename1, 'present'), ('upload-data2', contents2, filename2, 'previous')]):
+        if triggered_id != upload_id or not contents:
+            continue
+        with timed('ingest'):
+            df, statuses = parse_uploads(contents, filename)
+        if not row_count(df):
+            outputs[position] = upload_status(statuses)
+        else:
+            outputs[position] = upload_status(statuses, f"{{}} uploaded as {year} year",
+                                              f"Uploaded {{}} of {{}} files as {year} year, {{:,}} rows")
+            outputs[position + 2] = to_records(df)
+            outputs[position + 4] = ingest_baseline(
+                df, contents, filename if isinstance(filename, str) else ', '.join(filename), year)
+
+    return tuple(outputs)
+
+
+@app.callback(
+    Output('output-data1', 'children', allow_duplicate=True),
+    Output('output-data2', 'children', allow_duplicate=True),
+    Output('stored-data-present', 'data', allow_duplicate=True),
+    Output('stored-data-previous', 'data', allow_duplicate=True),
+    Input('baseline-present', 'modified_timestamp'),
+    Input('baseline-previous', 'modified_timestamp'),
+    State('baseline-present', 'data'),
+    State('baseline-previous', 'data'),
+    State('stored-data-present', 'data'),
+    State('stored-data-previous', 'data'),
+    prevent_initial_call='initial_duplicate'
+)
+def reattach_comparison(present_timestamp, previous_timestamp, present_baseline, previous_baseline,
+                        present_data, previous_data):
+    """Reload the saved present and previous year uploads of a browser that kept their baseline records"""
+    outputs = [dash.no_update] * 4
+    for position, (baseline, data, year) in enumerate([(present_baseline, present_data, 'present'),
+                                                      (previous_baseline, previous_data, 'previous')]):
+        if data or not (baseline or {}).get('dataset'):
+            continue
+        restored = restore_records(baseline)
+        if restored is None:
+            outputs[position] = f"The {year} year upload is no longer on the server. Please upload it again."
+        else:
+            outputs[position] = f"{restored[1]} restored as {year} year"
+            outputs[position + 2] = restored[0]
+    if all(output is dash.no_update for output in outputs):
+        raise PreventUpdate
+    return tuple(outputs)
 
 
 @app.callback(
@@ -1544,55 +3132,37 @@ def clear_filters(n):
     Input('sector-dropdown', 'value'),
     Input('school-type-dropdown', 'value'),
     Input('coc-dropdown', 'value'),
+    Input('subclass-dropdown', 'value'),
+    Input('district-dropdown', 'search_value'),
+    Input('municipality-dropdown', 'search_value'),
+    State('baseline-present', 'data'),
+    coalesce=True
 )
 def update_dropdowns(data, region, province, division, district, municipality,
-                     legislative, sector, school_type, coc):
+                     legislative, sector, school_type, coc, subclass=None,
+                     district_search=None, municipality_search=None, baseline=None):
 
-    if data is None:
+    if not data:
         return ([],) * 10
 
-    df = pd.DataFrame(data)
-
-    # Region Options (use full data)
-    region_options = [{'label': r, 'value': r} for r in sorted(df['Region'].dropna().unique())]
-
-    # Province Options (filter only by region)
-    province_df = df[df['Region'].isin(region)] if region else df
-    province_options = [{'label': p, 'value': p} for p in sorted(province_df['Province'].dropna().unique())]
-
-    # Division Options (filter by region and province)
-    division_df = province_df[province_df['Province'].isin(province)] if province else province_df
-    division_options = [{'label': d, 'value': d} for d in sorted(division_df['Division'].dropna().unique())]
-
-    # District Options (filter by region, province, and district)
-    district_df = division_df[division_df['Division'].isin(division)] if division else division_df
-    district_options = [{'label': d, 'value': d} for d in sorted(district_df['District'].dropna().unique())]
-
-    # Municipality Options (filter by region, province, district, division)
-    municipality_df = district_df[district_df['District'].isin(district)] if district else district_df
-    municipality_options = [{'label': m, 'value': m} for m in sorted(municipality_df['Municipality'].dropna().unique())]
-
-    # Legislative District Options
-    legislative_district_df = municipality_df[
-        municipality_df['Municipality'].isin(municipality)] if municipality else municipality_df
-    legislative_district_options = [{'label': l, 'value': l} for l in
-                                    sorted(legislative_district_df['Legislative District'].dropna().unique())]
-
-    # Sector Options
-    sector_df = legislative_district_df[legislative_district_df['Legislative District'].isin(legislative)] if legislative else legislative_district_df
-    sector_options = [{'label': s, 'value': s} for s in sorted(sector_df['Sector'].dropna().unique())]
-
-    # School Type Options
-    school_type_df = sector_df[sector_df['Sector'].isin(sector)] if sector else sector_df
-    school_type_options = [{'label': s, 'value': s} for s in sorted(school_type_df['School Type'].dropna().unique())]
-
-    # Modified COC Options
-    modified_coc_df = school_type_df[school_type_df['School Type'].isin(school_type)] if school_type else school_type_df
-    modified_coc_options = [{'label': m, 'value': m} for m in sorted(modified_coc_df['Modified COC'].dropna().unique())]
-
-    # Subclass Options
-    school_subclass_df = modified_coc_df[modified_coc_df['Modified COC'].isin(coc)] if coc else modified_coc_df
-    school_subclass_options = [{'label': s, 'value': s} for s in sorted(school_subclass_df['School Subclassification'].dropna().unique())]
+    index = get_filter_index(baseline, data)
+
+    # Each dropdown lists the values left by the selections made above it, labelled with the schools and
+    # enrollment each value would leave given the selections in every other dropdown
+    selections = [region, province, division, district, municipality, legislative,
+                  sector, school_type, coc, subclass]
+    searches = {FILTER_COLUMNS.index('District'): district_search,
+                FILTER_COLUMNS.index('Municipality'): municipality_search}
+    # Typing in a searchable dropdown only refreshes that dropdown's options
+    searched = {'district-dropdown': 'District', 'municipality-dropdown': 'Municipality'}.get(triggered_id())
+    positions = [FILTER_COLUMNS.index(searched)] if searched else None
+    with timed('aggregate'):
+        options = index.labelled_options(selections[:-1] + [None], selections, searches, positions)
+    if searched:
+        return tuple(options[0] if i == positions[0] else dash.no_update for i in range(10))
+    (region_options, province_options, division_options, district_options, municipality_options,
+     legislative_district_options, sector_options, school_type_options, modified_coc_options,
+     school_subclass_options) = options
 
     return (region_options, province_options, division_options, district_options,
             municipality_options, legislative_district_options, sector_options,
@@ -1616,10 +3186,15 @@ def update_dropdowns(data, region, province, division, district, municipality,
     Input('sector-dropdown', 'value'),
     Input('school-type-dropdown', 'value'),
     Input('coc-dropdown', 'value'),
-    Input('subclass-dropdown', 'value')
+    Input('subclass-dropdown', 'value'),
+    Input('exclude-anomalies', 'value'),
+    State('baseline-present', 'data'),
+    State('baseline-previous', 'data'),
+    heavy=True
 )
-def update_growth_card(present_data, previous_data, region, province, district, division,
-                       municipality, legislative, sector, school_type, coc, subclass):
+def update_growth_card(present_data, previous_data, region, province, division, district,
+                       municipality, legislative, sector, school_type, coc, subclass,
+                       exclude=None, present_baseline=None, previous_baseline=None):
     # Create empty figures for the case when data is not available
     empty_figure = px.bar(title="No data available")
 
@@ -1633,16 +3208,12 @@ def update_growth_card(present_data, previous_data, region, province, district,
             empty_figure   # Empty figure for k10 comparison chart
         )
 
-    # Convert stored data back to DataFrames
-    df_present = pd.DataFrame(present_data)
-    df_previous = pd.DataFrame(previous_data)
-
     # Apply filters - create a dictionary of filters to apply
     filters = {
         'Region': region,
         'Province': province,
-        'District': district,
         'Division': division,
+        'District': district,
         'Municipality': municipality,
         'Legislative District': legislative,
         'Sector': sector,
@@ -1651,12 +3222,12 @@ def update_growth_card(present_data, previous_data, region, province, district,
         'School Subclassification': subclass
     }
 
-    # Apply filters to both present and previous year data
-    filtered_present = apply_filters(df_present, filters)
-    filtered_previous = apply_filters(df_previous, filters)
+    # Per-column totals of the filtered rows of both years, shared with the REST API through the view cache
+    present_totals, _, present_schools = cached_view(present_baseline, filters, lambda: load_records(present_data))
+    previous_totals, _, previous_schools = cached_view(previous_baseline, filters,
+                                                       lambda: load_records(previous_data))
 
-    # Check if filtered data is empty after applying filters
-    if filtered_present.empty or filtered_previous.empty:
+    if not present_schools or not previous_schools:
         return (
             html.Div("No data available for the selected filters",
                      style={'textAlign': 'center', 'color': COLORS['accent']}),
@@ -1665,226 +3236,840 @@ def update_growth_card(present_data, previous_data, region, province, district,
             empty_figure
         )
 
-    # Calculate totals for growth card
-    total_present = calculate_totals(filtered_present)
-    total_previous = calculate_totals(filtered_previous)
+    if exclude:
+        # The flagged schools' share of the cached totals is taken off; the totals themselves are not recomputed
+        anomalies = yoy_anomalies((present_baseline or {}).get('dataset'), (previous_baseline or {}).get('dataset'))
+        if anomalies is not None:
+            _, present_rows, previous_rows = anomalies
+            present_totals = without_rows(present_totals, present_rows, filters)
+            previous_totals = without_rows(previous_totals, previous_rows, filters)
 
-    # Calculate growth
-    difference = total_present - total_previous
-    percent_change = (difference / total_previous * 100) if total_previous != 0 else 0
+    with timed('figure'):
+        return growth_outputs(present_totals, previous_totals)
+
+
+@app.callback(
+    Output('anomaly-table', 'data'),
+    Output('anomaly-count', 'children'),
+    Input('baseline-present', 'data'),
+    Input('baseline-previous', 'data'),
+    Input('region-dropdown', 'value'),
+    Input('province-dropdown', 'value'),
+    Input('division-dropdown', 'value'),
+    Input('district-dropdown', 'value'),
+    Input('municipality-dropdown', 'value'),
+    Input('legislative-dropdown', 'value'),
+    Input('sector-dropdown', 'value'),
+    Input('school-type-dropdown', 'value'),
+    Input('coc-dropdown', 'value'),
+    Input('subclass-dropdown', 'value'),
+    heavy=True
+)
+def update_anomaly_panel(present_baseline, previous_baseline, *values):
+    anomalies = yoy_anomalies((present_baseline or {}).get('dataset'), (previous_baseline or {}).get('dataset'))
+    if anomalies is None:
+        return [], "Upload both present and previous year data to check for year-over-year anomalies."
+    table = anomalies[0]
+    rows = table[row_mask(table, dict(zip(FILTER_COLUMNS, values)))][[column['id'] for column in ANOMALY_COLUMNS]]
+    count = len(rows)
+    return (rows.astype(object).where(rows.notna(), None).to_dict('records'),
+            f"{count:,} school{'' if count == 1 else 's'} flagged" if count else "No schools flagged")
 
-    # Determine color and arrow based on growth/decline
-    if difference > 0:
-        color = COLORS['success']
-        arrow = '↑'
-    elif difference < 0:
-        color = COLORS['error']
-        arrow = '↓'
-    else:
-        color = COLORS['accent']
-        arrow = '→'
 
-    # Helper function to compute totals for each education level
-    def compute_totals(df, level_prefixes):
-        total = 0
-        for prefix in level_prefixes:
-            male_cols = [col for col in df.columns if prefix in col and 'Male' in col]
-            female_cols = [col for col in df.columns if prefix in col and 'Female' in col]
-
-            # Only sum columns that actually exist in the dataframe
-            valid_cols = [col for col in male_cols + female_cols if col in df.columns]
-            if valid_cols:
-                total += df[valid_cols].sum().sum()
-        return total
-
-    # Define level prefixes for grouping
-    levels = {
-        'Elementary': ['K ', 'G1', 'G2', 'G3', 'G4', 'G5', 'G6'],
-        'JHS': ['G7', 'G8', 'G9', 'G10'],
-        'SHS': ['G11', 'G12']
+@app.callback(
+    Output('export-links-comparison', 'children'),
+    Input('baseline-present', 'data'),
+    Input('baseline-previous', 'data'),
+    Input('region-dropdown', 'value'),
+    Input('province-dropdown', 'value'),
+    Input('division-dropdown', 'value'),
+    Input('district-dropdown', 'value'),
+    Input('municipality-dropdown', 'value'),
+    Input('legislative-dropdown', 'value'),
+    Input('sector-dropdown', 'value'),
+    Input('school-type-dropdown', 'value'),
+    Input('coc-dropdown', 'value'),
+    Input('subclass-dropdown', 'value')
+)
+def update_comparison_export_links(present_baseline, previous_baseline, *values):
+    filters = dict(zip(FILTER_COLUMNS, values))
+    return html.Div([export_links(present_baseline, filters, "Export present year"),
+                     export_links(previous_baseline, filters, "Export previous year")])
+
+
+# =========================================================== REST API ===================================================================================
+# GET /api/v1/enrollment?year=present&region=...&region=... returns the numbers the dashboards show for one filter
+# state; POST {"queries": [{...}, ...]} answers many at once. Filters use the snake_case column names and may repeat.
+# The latest upload of each school year is served unless a `present` or `previous` handle pins another. Results go
+# through the same view cache as the callbacks, and the ETag is derived from the handles and selections alone, so an
+# unchanged query is answered with 304 before anything is aggregated.
+API_VERSION = 'v1'
+API_YEARS = ('present', 'previous')
+API_FILTERS = {column.lower().replace(' ', '_'): column for column in FILTER_COLUMNS}
+API_BATCH_LIMIT = int(os.environ.get('DEPED_API_BATCH_LIMIT', '500'))
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _api_values(value):
+    if value is None:
+        return []
+    return [str(value)] if isinstance(value, (str, int, float)) else [str(item) for item in value]
+
+
+def api_query(params):
+    """Resolve one query's parameters to its year, the handles of both years and the filters"""
+    unknown = set(params) - set(API_FILTERS) - {'year', *API_YEARS}
+    if unknown:
+        raise ApiError(400, f"unknown parameters: {', '.join(sorted(unknown))}")
+    year = (_api_values(params.get('year')) or ['present'])[0]
+    if year not in API_YEARS:
+        raise ApiError(400, f"year must be one of {', '.join(API_YEARS)}")
+    handles = {}
+    for name in API_YEARS:
+        pinned = _api_values(params.get(name))
+        handles[name] = pinned[0] if pinned else published_dataset(name)
+    if not handles[year]:
+        raise ApiError(404, f"no {year} year upload is available")
+    filters = {column: _api_values(params.get(name)) or None for name, column in API_FILTERS.items()}
+    return year, handles, filters
+
+
+def api_etag(queries):
+    selections = [(year, handles, view_key({'dataset': handles[year]}, filters)[1])
+                  for year, handles, filters in queries]
+    return hashlib.sha1(json.dumps([API_VERSION, selections]).encode()).hexdigest()
+
+
+def enrollment_payload(view, baseline):
+    """Cards, level, grade and track totals of a filtered view, as plain numbers"""
+    totals, offering, schools = view
+    male = sum(totals[col] for col in ALL_GENDER_COLUMNS if col.endswith(' Male'))
+    female = sum(totals[col] for col in ALL_GENDER_COLUMNS if col.endswith(' Female'))
+
+    def genders(columns):
+        return {'male': sum(totals[col] for col in columns if col.endswith(' Male')),
+                'female': sum(totals[col] for col in columns if col.endswith(' Female'))}
+
+    return {
+        'cards': {
+            'male': male,
+            'female': female,
+            'enrollment': male + female,
+            'schools': schools,
+            'enrollment_share': round((male + female) / baseline['enrollment'] * 100, 2) if baseline['enrollment'] else 0,
+            'school_share': round(schools / baseline['schools'] * 100, 2) if baseline['schools'] else 0,
+        },
+        'levels': {level: dict(genders(columns), schools=offering[level]) for level, columns in LEVEL_COLUMNS.items()},
+        'grades': {grade: genders([f'{grade} Male', f'{grade} Female']) for grade in K10_LEVELS},
+        'tracks': {track: genders(columns) for track, columns in STRAND_COLUMNS.items()},
     }
 
-    # Create data for enrollment trend chart
-    trend_data = []
-    for label, prefixes in levels.items():
-        prev_total = compute_totals(filtered_previous, prefixes)
-        curr_total = compute_totals(filtered_present, prefixes)
-        dropout = max(prev_total - curr_total, 0)
-        dropout_rate = dropout / prev_total * 100 if prev_total else 0
-        trend_data.append({
-            'Level': label,
-            'Previous Year': prev_total,
-            'Present Year': curr_total,
-            'Dropouts': dropout,
-            'Dropout Rate (%)': dropout_rate
-        })
 
-    # Convert to DataFrame for charting
-    trend_df = pd.DataFrame(trend_data)
+def api_result(year, handles, filters):
+    """Answer one resolved query; growth, strands and K10 are null unless both years are available"""
+    views = {}
+    for name, key in handles.items():
+        baseline = dataset_baseline(key) if key else None
+        view = cached_view(baseline, filters, lambda key=key: dataset_frame(key)) if baseline else None
+        if view is not None:
+            views[name] = view, baseline
+        elif name == year:
+            raise ApiError(404, f"upload {key} is no longer on the server")
+
+    result = {
+        'year': year,
+        'dataset': handles[year],
+        'filters': {name: filters[column] for name, column in API_FILTERS.items() if filters[column]},
+        **enrollment_payload(*views[year]),
+        'growth': None,
+        'strands': None,
+        'k10': None,
+    }
+    if len(views) == len(API_YEARS):
+        summary = growth_summary(views['present'][0][0], views['previous'][0][0])
+        result['growth'] = {
+            'previous': summary['previous'],
+            'present': summary['present'],
+            'difference': summary['difference'],
+            'percent_change': round(summary['percent_change'], 2),
+            'levels': {label: dict(level, dropout_rate=round(level['dropout_rate'], 2))
+                       for label, level in summary['levels'].items()},
+        }
+        result['strands'] = summary['strands']
+        result['k10'] = summary['k10']
+    return result
+
+
+def _api_response(payload, status=200, etag=None):
+    response = flask.Response(json.dumps(payload, separators=(',', ':'), default=int), status=status,
+                              mimetype='application/json')
+    if etag:
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+def register_api(server):
+    """Add the versioned read-only enrollment endpoint"""
+
+    @server.route(f'/api/{API_VERSION}/enrollment', methods=['GET', 'POST'])
+    def enrollment_api():
+        batch = flask.request.method == 'POST'
+        try:
+            if batch:
+                body = flask.request.get_json(silent=True)
+                queries = body.get('queries') if isinstance(body, dict) else None
+                if not isinstance(queries, list) or not all(isinstance(query, dict) for query in queries):
+                    raise ApiError(400, 'expected a JSON body of the form {"queries": [{...}, ...]}')
+                if len(queries) > API_BATCH_LIMIT:
+                    raise ApiError(400, f"at most {API_BATCH_LIMIT} queries per request")
+            else:
+                queries = [flask.request.args.to_dict(flat=False)]
+            resolved = [api_query(query) for query in queries]
+
+            etag = api_etag(resolved)
+            if flask.request.if_none_match.contains(etag):
+                response = _api_response(None, 304, etag)
+                response.set_data(b'')
+                return response
+            results = [api_result(*query) for query in resolved]
+        except ApiError as e:
+            return _api_response({'error': str(e)}, e.status)
+        return _api_response({'version': API_VERSION, 'results': results} if batch else results[0], etag=etag)
+
+
+register_api(app.server)
+
+# =========================================================== END OF REST API ============================================================================
+
+
+# =========================================================== EXPORT =====================================================================================
+# GET /export/<handle>.<csv|xlsx|parquet>?region=... streams the school rows behind a filter state. The rows come
+# from the upload's cached frame and a cached row mask, and are serialized EXPORT_CHUNK rows at a time, so the
+# download starts at once and memory stays flat however many rows match. Filters use the REST API parameter names.
+EXPORT_CHUNK = int(os.environ.get('DEPED_EXPORT_CHUNK', '5000'))
+_XML_ILLEGAL = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+XLSX_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="xl/workbook.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+        '</Relationships>'),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Schools" sheetId="1" r:id="rId1"/></sheets></workbook>'),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="worksheets/sheet1.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet"/>'
+        '</Relationships>'),
+}
 
-    # Set colors for current and previous years
-    present_color = '#199ad6'
-    previous_color = '#ff375f'
-    # Create enrollment comparison chart
-    enroll_fig = px.bar(trend_df, x='Level', y=['Previous Year', 'Present Year'], labels={'value': 'Number of Students', 'variable': 'Year'},
-                        barmode='group', color='variable', color_discrete_map={'Previous Year': previous_color, 'Present Year': present_color})
 
-    enroll_fig.update_layout(
-        {
-    'plot_bgcolor': 'white',
-    'paper_bgcolor': 'white',
-    'font': {'color': '#1d1d1f', 'family': 'SF Pro Display, Helvetica, Arial, sans-serif'},
-    'title_font_size': 16,
-    'xaxis': {'showgrid': False},
-    'yaxis': {'showgrid': True, 'gridcolor': '#f5f5f7', 'title': None},
-    'legend': {'orientation': 'h', 'yanchor': 'bottom', 'y': 1.02, 'xanchor': 'right', 'x': 1},
-    'margin': dict(l=10, r=10, t=40, b=10),
-})
+class _Drain(io.RawIOBase):
+    """Write-only, unseekable sink emptied piece by piece, so an archive can be sent while it is written"""
 
-    # ===== SHS STRAND COMPARISON =====
-    strands = ['ABM', 'HUMSS', 'STEM', 'GAS', 'PBM', 'TVL', 'SPORTS', 'ARTS']
-    strand_map = {
-        'ABM': ['G11 ACAD ABM Male', 'G11 ACAD ABM Female', 'G12 ACAD ABM Male', 'G12 ACAD ABM Female'],
-        'HUMSS': ['G11 ACAD HUMSS Male', 'G11 ACAD HUMSS Female', 'G12 ACAD HUMSS Male',
-                  'G12 ACAD HUMSS Female'],
-        'STEM': ['G11 ACAD STEM Male', 'G11 ACAD STEM Female', 'G12 ACAD STEM Male', 'G12 ACAD STEM Female'],
-        'GAS': ['G11 ACAD GAS Male', 'G11 ACAD GAS Female', 'G12 ACAD GAS Male', 'G12 ACAD GAS Female'],
-        'PBM': ['G11 ACAD PBM Male', 'G11 ACAD PBM Female', 'G12 ACAD PBM Male', 'G12 ACAD PBM Female'],
-        'TVL': ['G11 TVL Male', 'G11 TVL Female', 'G12 TVL Male', 'G12 TVL Female'],
-        'SPORTS': ['G11 SPORTS Male', 'G11 SPORTS Female', 'G12 SPORTS Male', 'G12 SPORTS Female'],
-        'ARTS': ['G11 ARTS Male', 'G11 ARTS Female', 'G12 ARTS Male', 'G12 ARTS Female']
-    }
+    def __init__(self):
+        super().__init__()
+        self._parts = []
+        self._position = 0
 
-    # Calculate strand totals using filtered data
-    df1_totals = {}
-    for s in strands:
-        cols = [col for col in strand_map[s] if col in filtered_present.columns]
-        df1_totals[s] = filtered_present[cols].sum().sum() if cols else 0
+    def writable(self):
+        return True
 
-    df2_totals = {}
-    for s in strands:
-        cols = [col for col in strand_map[s] if col in filtered_previous.columns]
-        df2_totals[s] = filtered_previous[cols].sum().sum() if cols else 0
+    def write(self, data):
+        self._parts.append(bytes(data))
+        self._position += len(data)
+        return len(data)
 
-    # Create DataFrame for strand comparison
-    comparison_df = pd.DataFrame({
-        'Strand': strands,
-        'Previous Year': [df2_totals[s] for s in strands],
-        'Present Year': [df1_totals[s] for s in strands]
+    def tell(self):
+        return self._position
 
-    })
+    def take(self):
+        data = b''.join(self._parts)
+        self._parts.clear()
+        return data
 
-    # Create strand comparison chart
-    strand_comparison_fig = px.bar(
-        comparison_df.melt(id_vars='Strand'),
-        x='Strand', y='value', color='variable',
-        labels={'value': 'Number of Students', 'variable': 'Year'},
-        barmode='group',
-        color_discrete_map={'Present Year': present_color, 'Previous Year': previous_color}
-    )
 
-    # Apply custom layout and theme
-    apple_theme = {
-    'plot_bgcolor': 'white',
-    'paper_bgcolor': 'white',
-    'font': {'color': '#1d1d1f', 'family': 'SF Pro Display, Helvetica, Arial, sans-serif'},
-    'title_font_size': 16,
-    'xaxis': {'showgrid': False},
-    'yaxis': {'showgrid': True, 'gridcolor': '#f5f5f7', 'title': None},
-    'legend': {'orientation': 'h', 'yanchor': 'bottom', 'y': 1.02, 'xanchor': 'right', 'x': 1},
-    'margin': dict(l=10, r=10, t=40, b=10),
+def _csv_stream(chunks):
+    for i, chunk in enumerate(chunks):
+        if is_polars(chunk):
+            yield chunk.write_csv(include_header=i == 0).encode()
+        else:
+            yield chunk.to_csv(index=False, header=i == 0).encode()
+
+
+def _xlsx_cell(value):
+    if value is None or isinstance(value, float) and value != value:
+        return '<c/>'
+    if isinstance(value, (int, float, np.integer, np.floating)) and not isinstance(value, bool):
+        return f'<c><v>{value}</v></c>'
+    return f'<c t="inlineStr"><is><t>{xml.sax.saxutils.escape(_XML_ILLEGAL.sub("", str(value)))}</t></is></c>'
+
+
+def _xlsx_column(values):
+    """Cells of one column as XML strings; numeric columns are formatted in one pass"""
+    if values.dtype.kind in 'iuf':
+        cells = '<c><v>' + values.astype(str).astype(object) + '</v></c>'
+        if values.dtype.kind == 'f':
+            cells[np.isnan(values)] = '<c/>'
+        return cells
+    return [_xlsx_cell(value) for value in values]
+
+
+def _xlsx_stream(chunks):
+    """A single-sheet workbook with inline strings, written straight into a streamed zip archive"""
+    sink = _Drain()
+    with zipfile.ZipFile(sink, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, part in XLSX_PARTS.items():
+            archive.writestr(name, part)
+        with archive.open('xl/worksheets/sheet1.xml', 'w') as sheet:
+            sheet.write(b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                        b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>')
+            for i, chunk in enumerate(chunks):
+                if i == 0:
+                    sheet.write(f"<row>{''.join(map(_xlsx_cell, chunk.columns))}</row>".encode())
+                columns = [_xlsx_column(chunk[column].to_numpy()) for column in chunk.columns]
+                sheet.write(''.join(f"<row>{''.join(row)}</row>" for row in zip(*columns)).encode())
+                yield sink.take()
+            sheet.write(b'</sheetData></worksheet>')
+    yield sink.take()
+
+
+def _parquet_stream(chunks):
+    """One Parquet row group per chunk"""
+    sink, writer = _Drain(), None
+    for chunk in chunks:
+        table = arrow_table(chunk, writer.schema if writer else None)
+        if writer is None:
+            writer = pq.ParquetWriter(sink, table.schema)
+        writer.write_table(table)
+        yield sink.take()
+    writer.close()
+    yield sink.take()
+
+
+EXPORT_FORMATS = {
+    'csv': ('text/csv', _csv_stream),
+    'xlsx': ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', _xlsx_stream),
+    'parquet': ('application/vnd.apache.parquet', _parquet_stream),
 }
-    strand_comparison_fig.update_layout(
-        **apple_theme)
 
-    # ===== KINDER TO GRADE 10 COMPARISON =====
-    grade_levels = ['K', 'G1', 'G2', 'G3', 'G4', 'G5', 'G6', 'Elem NG']
-    jhs_levels = ['G7', 'G8', 'G9', 'G10', 'JHS NG']
-    all_levels = grade_levels + jhs_levels
 
-    # Create dictionaries to map grade levels to their respective columns
-    grade_level_map = {level: [f'{level} Male', f'{level} Female'] for level in all_levels}
+def export_links(baseline, filters, label="Export"):
+    """Download links of the rows behind the current filters, or None for sessions without an upload handle"""
+    key = (baseline or {}).get('dataset')
+    if not key:
+        return None
+    query = urllib.parse.urlencode([(name, value) for name, column in API_FILTERS.items()
+                                    for value in filters.get(column) or []])
+    links = [html.A(fmt.upper(), href=f"/export/{key}.{fmt}" + (f"?{query}" if query else ''),
+                    style={'marginLeft': '8px', 'color': COLORS['primary']})
+             for fmt in EXPORT_FORMATS]
+    return html.Span([f"{label}:"] + links, style={'fontSize': '14px'})
+
+
+def register_export(server):
+    """Add the streaming export route"""
+
+    @server.route('/export/<key>.<fmt>')
+    def export_rows(key, fmt):
+        if fmt not in EXPORT_FORMATS:
+            flask.abort(404)
+        params = flask.request.args.to_dict(flat=False)
+        unknown = set(params) - set(API_FILTERS)
+        if unknown:
+            return _api_response({'error': f"unknown parameters: {', '.join(sorted(unknown))}"}, 400)
+        df = dataset_frame(key)
+        if df is None:
+            return _api_response({'error': f"upload {key} is no longer on the server"}, 404)
+
+        filters = {column: _api_values(params.get(name)) or None for name, column in API_FILTERS.items()}
+        mask = dataset_mask(key, df, filters)
+        mimetype, stream = EXPORT_FORMATS[fmt]
+        return flask.Response(stream(row_chunks(df, mask, EXPORT_CHUNK)), mimetype=mimetype, headers={
+            'Content-Disposition': f'attachment; filename="enrollment-{key}.{fmt}"',
+            'X-Row-Count': str(int(mask.sum())),
+        })
 
-    # Calculate K10 totals using filtered data
-    df1_k10_totals = {}
-    df2_k10_totals = {}
 
-    for level in all_levels:
-        cols = [col for col in grade_level_map[level] if col in filtered_present.columns]
-        df1_k10_totals[level] = filtered_present[cols].sum().sum() if cols else 0
+register_export(app.server)
 
-        cols = [col for col in grade_level_map[level] if col in filtered_previous.columns]
-        df2_k10_totals[level] = filtered_previous[cols].sum().sum() if cols else 0
+# =========================================================== END OF EXPORT ==============================================================================
 
-    # Create DataFrame for K10 comparison
-    k10_comparison_df = pd.DataFrame({
-        'Grade Level': all_levels,
-        'Previous Year': [df2_k10_totals.get(level, 0) for level in all_levels],
-        'Present Year': [df1_k10_totals.get(level, 0) for level in all_levels]
-    })
 
-    # Create K10 comparison chart
-    k10_comparison_fig = px.bar(
-        k10_comparison_df.melt(id_vars='Grade Level'),
-        x='Grade Level', y='value', color='variable',
-        labels={'value': 'Number of Students', 'variable': 'Year'},
-        color_discrete_map={'Previous Year': previous_color, 'Present Year': present_color, },
-        barmode='group'
-    )
+# =========================================================== BATCH REPORTS ==============================================================================
+# python "DEPED Dashboard.py" report present.csv --previous previous.csv --out reports renders one static page per
+# region and division without the server, through the same aggregation and figure code as the dashboards. The
+# datasets are loaded once; forked pool workers share that copy and each writes its own pages. Pages load Plotly
+# from one plotly.min.js in the output folder, so the folder works offline. Static images need kaleido.
+REPORT_LEVELS = {'region': ['Region'], 'division': ['Division'], 'both': ['Region', 'Division']}
+REPORT_CHARTS = {
+    'education': 'Enrollment by Level',
+    'elementary': 'Elementary Enrollment',
+    'jhs': 'Junior High School Enrollment',
+    'shs': 'Senior High School Tracks',
+    'grade_average': 'Average Enrollees per School by Grade',
+    'track_average': 'Average Enrollees per School by Track',
+}
+GROWTH_CHARTS = {
+    'growth': 'Present vs Previous Year by Level',
+    'strand': 'SHS Strands, Present vs Previous Year',
+    'k10': 'Kinder to Grade 10, Present vs Previous Year',
+}
+report_logger = logging.getLogger('deped.report')
+_report = {}
+_CSS_NAME = re.compile('([A-Z])')
+
+
+def load_dataset_file(path):
+    with open(path, 'rb') as f:
+        return read_dataset(f.read(), os.path.basename(path))
+
+
+def slug(text):
+    return re.sub(r'[^A-Za-z0-9]+', '-', str(text)).strip('-').lower() or 'blank'
+
+
+def component_html(component):
+    """Static HTML of a tree of Dash html components, such as the summary and growth cards"""
+    if component is None:
+        return ''
+    if isinstance(component, (list, tuple)):
+        return ''.join(map(component_html, component))
+    if not isinstance(component, dash.development.base_component.Component):
+        return xml.sax.saxutils.escape(str(component))
+    tag = component._type.lower()
+    style = ';'.join(_CSS_NAME.sub(r'-\1', key).lower() + f':{value}'
+                     for key, value in (getattr(component, 'style', None) or {}).items())
+    attributes = ' style="%s"' % xml.sax.saxutils.escape(style, {'"': '&quot;'}) if style else ''
+    return f"<{tag}{attributes}>{component_html(getattr(component, 'children', None))}</{tag}>"
+
+
+def report_page(title, cards, figures, growth_card=None):
+    titles = {**REPORT_CHARTS, **GROWTH_CHARTS}
+    charts = ''.join(f'<h2>{titles[name]}</h2>' + figure.to_html(full_html=False, include_plotlyjs=False)
+                     for name, figure in figures)
+    growth = f'<h2>Year-over-Year</h2><div class="card">{component_html(growth_card)}</div>' if growth_card else ''
+    return ('<!DOCTYPE html><html><head><meta charset="utf-8">'
+            f'<title>{xml.sax.saxutils.escape(title)}</title><script src="../plotly.min.js"></script>'
+            '<style>body{font-family:Helvetica,Arial,sans-serif;margin:24px;color:#1d1d1f}'
+            '.cards{display:flex;gap:16px}.card{flex:1;padding:12px;border:1px solid #d2d2d7;border-radius:8px}'
+            f'</style></head><body><h1>{xml.sax.saxutils.escape(title)}</h1>'
+            f'<div class="cards">{"".join(f"<div class=card>{component_html(card)}</div>" for card in cards)}</div>'
+            f'{growth}{charts}</body></html>')
+
+
+def _render_report(task):
+    """Write the page and images of one region or division in a pool worker; returns its index entry"""
+    column, value = task
+    started = time.perf_counter()
+    name = f"{slug(value)}.html"
+    try:
+        target = os.path.join(_report['out'], slug(column))
+        filters = {column: [value]}
+        totals, offering, schools = filtered_view(_report['present'], filters)
+        outputs = main_dashboard_outputs(totals, offering, schools, _report['baseline'])
+        figures = list(zip(REPORT_CHARTS, outputs[4:]))
+        growth_card = None
+        if _report['previous'] is not None:
+            previous_totals, _, previous_schools = filtered_view(_report['previous'], filters)
+            if previous_schools:
+                growth_card, *growth_figures = growth_outputs(totals, previous_totals)
+                figures += list(zip(GROWTH_CHARTS, growth_figures))
+
+        with open(os.path.join(target, name), 'w', encoding='utf-8') as f:
+            f.write(report_page(f"{value} ({column})", outputs[:4], figures, growth_card))
+        if _report['images']:
+            for chart, figure in figures:
+                figure.write_image(os.path.join(target, f"{slug(value)}-{chart}.{_report['images']}"),
+                                   width=1000, height=500)
+        error = None
+    except Exception as e:
+        report_logger.exception("Report for %s %s failed", column, value)
+        totals, schools, error = {}, 0, str(e)
+    return (column, value, f"{slug(column)}/{name}", sum(totals.values()), schools, error,
+            time.perf_counter() - started)
+
+
+def render_reports(dataset, previous=None, out='reports', by='both', workers=None, images='png'):
+    """Render the report of every region and/or division of a dataset; returns the index entries"""
+    started = time.perf_counter()
+    if images and importlib.util.find_spec('kaleido') is None:
+        report_logger.warning("kaleido is not installed, writing the HTML pages without static images")
+        images = None
+    present = load_dataset_file(dataset)
+    _report.update(present=present, previous=load_dataset_file(previous) if previous else None,
+                   baseline=national_baseline(present), out=out, images=images)
+
+    index = FilterIndex(present)
+    tasks = [(column, value) for column in REPORT_LEVELS[by]
+             for value in index.values[index.columns.index(column)]]
+    for column in REPORT_LEVELS[by]:
+        os.makedirs(os.path.join(out, slug(column)), exist_ok=True)
+    with open(os.path.join(out, 'plotly.min.js'), 'w', encoding='utf-8') as f:
+        f.write(importlib.import_module('plotly.offline').get_plotlyjs())
+
+    workers = workers or INGEST_WORKERS
+    # Forked workers inherit the loaded datasets instead of each reading and parsing the files; where processes
+    # cannot be forked (Windows) the reports are rendered one after the other
+    if workers > 1 and len(tasks) > 1 and 'fork' in multiprocessing.get_all_start_methods():
+        # Polars' thread pool does not survive a fork, so the workers get pandas copies of polars frames
+        for name in ('present', 'previous'):
+            if is_polars(_report[name]):
+                _report[name] = _report[name].to_pandas()
+        context = multiprocessing.get_context('fork')
+        with concurrent.futures.ProcessPoolExecutor(workers, mp_context=context) as pool:
+            entries = list(pool.map(_render_report, tasks, chunksize=max(1, len(tasks) // (workers * 4))))
+    else:
+        entries = [_render_report(task) for task in tasks]
+
+    rows = ''.join(
+        f'<tr><td>{column}</td><td><a href="{path}">{xml.sax.saxutils.escape(str(value))}</a></td>'
+        f'<td>{enrollment:,}</td><td>{schools:,}</td><td>{xml.sax.saxutils.escape(error or "")}</td></tr>'
+        for column, value, path, enrollment, schools, error, _ in entries)
+    with open(os.path.join(out, 'index.html'), 'w', encoding='utf-8') as f:
+        f.write('<!DOCTYPE html><html><head><meta charset="utf-8"><title>Enrollment reports</title></head>'
+                '<body style="font-family:Helvetica,Arial,sans-serif"><h1>Enrollment reports</h1>'
+                f'<p>{os.path.basename(dataset)}{f" compared with {os.path.basename(previous)}" if previous else ""}'
+                '</p><table><tr><th>Level</th><th>Name</th><th>Enrollment</th><th>Schools</th><th>Error</th></tr>'
+                f'{rows}</table></body></html>')
+    report_logger.info("Rendered %d reports in %.1fs", len(entries), time.perf_counter() - started)
+    return entries
+
+
+# =========================================================== END OF BATCH REPORTS =======================================================================
+
+
+# =========================================================== SCHOOL TABLE ===============================================================================
+# The school table below the main dashboard charts pages, sorts and filters on the server: per upload a per-school
+# frame (ID, filter columns, enrollment per level) is built once from the cached rows, the dashboard filters select
+# from it through the cached row mask, and only the requested page goes back to the browser. Column filters use the
+# DataTable query syntax, e.g. {Region} icontains "NCR" && {Total} > 500. The same frame feeds the school size chart.
+SCHOOL_PAGE_SIZE = int(os.environ.get('DEPED_SCHOOL_PAGE_SIZE', '15'))
+SCHOOL_TABLE_COLUMNS = (
+    [{'name': column, 'id': column} for column in ['BEIS School ID'] + FILTER_COLUMNS] +
+    [{'name': column, 'id': column, 'type': 'numeric', 'format': {'specifier': ','}}
+     for column in list(LEVEL_COLUMNS) + ['Total']]
+)
+SCHOOL_TABLES = LRUCache(int(os.environ.get('DEPED_FRAME_CACHE', '4')))
+SIZE_POINTS = int(os.environ.get('DEPED_SIZE_POINTS', '3000'))
+_QUERY_PART = re.compile(r'\{(?P<column>[^}]+)\}\s*(?P<op>\S+)\s*(?P<value>.*)')
+_COMPARISONS = {
+    '=': operator.eq, 'eq': operator.eq, '!=': operator.ne, 'ne': operator.ne,
+    '<': operator.lt, 'lt': operator.lt, '<=': operator.le, 'le': operator.le,
+    '>': operator.gt, 'gt': operator.gt, '>=': operator.ge, 'ge': operator.ge,
+}
 
-    k10_comparison_fig.update_layout(
-        **apple_theme)
 
-    # Create growth card display
-    growth_card = html.Div([
-        html.Div([
-            # Previous Year
-            html.Div([
-                html.Div("Previous Year", style={'fontSize': '14px', 'color': COLORS['accent'], 'textAlign': 'center'}),
-                html.Div(f"{int(total_previous):,}", style={
-                    'fontSize': '24px',
-                    'fontWeight': 'bold',
-                    'textAlign': 'center',
-                    'margin': '5px 0'
-                })
-            ], style={'flex': 1, 'padding': '10px'}),
+def school_table(key):
+    """Per-school frame of an upload, aligned with its rows, or None when the rows are not available"""
+    table = SCHOOL_TABLES.get(key)
+    if table is not None:
+        return table
+    df = dataset_frame(key)
+    if df is None:
+        return None
+    with timed('aggregate'):
+        table = pd.DataFrame({column: df[column].to_numpy() for column in ['BEIS School ID'] + FILTER_COLUMNS})
+        for level, columns in LEVEL_COLUMNS.items():
+            for gender in ('Male', 'Female'):
+                table[f'{level} {gender}'] = row_sums(df, [col for col in columns if col.endswith(f' {gender}')])
+            table[level] = table[f'{level} Male'] + table[f'{level} Female']
+        table['Total'] = table[list(LEVEL_COLUMNS)].sum(axis=1)
+    SCHOOL_TABLES.put(key, table)
+    return table
+
+
+def table_query(table, query):
+    """Rows of the table matching a DataTable filter query; parts that cannot be read are ignored"""
+    for part in (query or '').split(' && '):
+        match = _QUERY_PART.fullmatch(part.strip())
+        if not match or match['column'] not in table.columns:
+            continue
+        column, op, value = table[match['column']], match['op'], match['value'].strip()
+        if len(value) > 1 and value[0] == value[-1] and value[0] in '"\'`':
+            value = value[1:-1].replace(f'\\{value[0]}', value[0])
+        # 'i' and 's' prefixes ask for case-insensitive and case-sensitive matching
+        insensitive = op[0] == 'i'
+        op = op[1:] if op[0] in 'is' and (op[1:] in _COMPARISONS or op[1:] == 'contains') else op
+
+        if op in ('contains', 'datestartswith'):
+            text = column.astype(str)
+            if op == 'contains':
+                mask = text.str.contains(value, case=not insensitive, regex=False)
+            else:
+                mask = text.str.startswith(value)
+        elif op in _COMPARISONS:
+            if pd.api.types.is_numeric_dtype(column):
+                number = pd.to_numeric(value, errors='coerce')
+                if pd.isna(number):
+                    continue
+                mask = _COMPARISONS[op](column, number)
+            elif insensitive:
+                mask = _COMPARISONS[op](column.astype(str).str.lower(), value.lower())
+            else:
+                mask = _COMPARISONS[op](column.astype(str), value)
+        else:
+            continue
+        table = table[mask.fillna(False).to_numpy(dtype=bool)]
+    return table
+
+
+def school_page(key, filters, page, size, sort_by=None, query=None):
+    """
+    One page of the schools matching the dashboard filters and the table's own filter and sort, as
+    (records, page count, page number, matching schools), or None when the upload's rows are not available
+    """
+    table = school_table(key)
+    if table is None:
+        return None
+    rows = table_query(table[dataset_mask(key, dataset_frame(key), filters)], query)
+    sort_by = [item for item in sort_by or [] if item.get('column_id') in rows.columns]
+    if sort_by:
+        rows = rows.sort_values([item['column_id'] for item in sort_by],
+                                ascending=[item.get('direction') != 'desc' for item in sort_by], kind='stable')
+    total = len(rows)
+    page_count = max(1, math.ceil(total / size))
+    page = min(max(page, 0), page_count - 1)
+    visible = rows.iloc[page * size:(page + 1) * size][[column['id'] for column in SCHOOL_TABLE_COLUMNS]].astype(object)
+    return visible.where(visible.notna(), None).to_dict('records'), page_count, page, total
+
+
+def school_sizes(key, filters, level='All'):
+    """
+    Enrollment, female enrollment and ID of the schools matching the filters that enroll at the level ('All' for
+    every level), as NumPy arrays, or None when the upload's rows are not available
+    """
+    table = school_table(key)
+    if table is None:
+        return None
+    rows = table[dataset_mask(key, dataset_frame(key), filters)]
+    if level == 'All':
+        size, female = rows['Total'].to_numpy(), sum(rows[f'{name} Female'].to_numpy() for name in LEVEL_COLUMNS)
+    else:
+        size, female = rows[level].to_numpy(), rows[f'{level} Female'].to_numpy()
+    enrolled = size > 0
+    return size[enrolled], female[enrolled], rows['BEIS School ID'].to_numpy()[enrolled]
+
+
+def downsample_points(size, female, budget=SIZE_POINTS, seed=0):
+    """
+    Positions of the schools to draw and the outlier mask. Outliers (far above the upper quartile, or enrolling
+    one gender only) are always kept; the rest are sampled uniformly, which keeps their density, up to the budget.
+    The sample is seeded so the same selection draws the same points.
+    """
+    if not len(size):
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=bool)
+    q1, q3 = np.percentile(size, [25, 75])
+    outliers = (size > q3 + 3 * (q3 - q1)) | (female == 0) | (female == size)
+    rest = np.flatnonzero(~outliers)
+    room = max(budget - int(outliers.sum()), 0)
+    if len(rest) > room:
+        rest = np.random.default_rng(seed).choice(rest, size=room, replace=False)
+    return np.sort(np.concatenate([np.flatnonzero(outliers), rest])), outliers
+
+
+# =========================================================== END OF SCHOOL TABLE ========================================================================
+
+
+# =========================================================== GENDER PARITY =============================================================================
+# The GPI explorer (/gpi) shows female / male enrollment per level and SHS strand for every region, division or
+# district of the browser's own present or previous year upload. One grouped pass over the rows sums both genders of
+# every measure per district; regions and divisions are summed from that small cube, so switching the hierarchy level
+# never rescans the rows.
+GPI_LEVELS = ['Region', 'Division', 'District']
+GPI_MEASURES = {**LEVEL_COLUMNS, **STRAND_COLUMNS, 'Total': ALL_GENDER_COLUMNS}
+GPI_CUBES = LRUCache(int(os.environ.get('DEPED_FRAME_CACHE', '4')))
+
+
+def gpi_cube(key):
+    """Male and female enrollment of every measure per district of an upload, or None without its rows"""
+    cube = GPI_CUBES.get(key)
+    if cube is not None:
+        return cube
+    df = dataset_frame(key)
+    if df is None:
+        return None
+    with timed('aggregate'):
+        columns = [col for col in ALL_GENDER_COLUMNS if col in df.columns]
+        groups, sums = grouped_sums(df, GPI_LEVELS, columns)
+        # Column j * 2 holds the male and j * 2 + 1 the female enrollment of measure j
+        weights = np.zeros((len(columns), 2 * len(GPI_MEASURES)))
+        for j, measure_columns in enumerate(GPI_MEASURES.values()):
+            for i, col in enumerate(columns):
+                if col in measure_columns:
+                    weights[i, 2 * j + col.endswith(' Female')] = 1
+        cube = groups, sums @ weights
+    GPI_CUBES.put(key, cube)
+    return cube
+
+
+def gpi_table(key, level):
+    """Names and GPI matrix (geographies x measures, NaN without male enrollment) at a hierarchy level"""
+    cube = gpi_cube(key)
+    if cube is None:
+        return None
+    groups, measures = cube
+    path = zip(*(groups[column] for column in GPI_LEVELS[:GPI_LEVELS.index(level) + 1]))
+    codes, names = pd.factorize(pd.Series([' / '.join('—' if pd.isna(v) else str(v) for v in p) for p in path],
+                                          dtype=object))
+    sums = np.zeros((len(names), measures.shape[1]))
+    np.add.at(sums, codes, measures)
+    male, female = sums[:, 0::2], sums[:, 1::2]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return list(names), np.where(male > 0, female / male, np.nan)
+
+
+# =========================================================== END OF GENDER PARITY ======================================================================
+
+
+# =========================================================== ANOMALIES =================================================================================
+# With both years uploaded, every school in both is compared per grade and gender. The change of each cell is taken
+# on a log scale and scored against the same cell of all other schools with a robust z-score (median and MAD), so
+# a nationwide trend is not an anomaly; a swing is flagged when it is far off that trend or by at least
+# DEPED_ANOMALY_RATIO times either way (800 to 8, or 0 to hundreds), and only when it moves at least
+# DEPED_ANOMALY_MIN enrollees. The result is cached per pair of uploads, with the flagged schools' rows of each year,
+# so excluding them from the comparison charts only subtracts their share from the cached totals.
+ANOMALY_Z = float(os.environ.get('DEPED_ANOMALY_Z', '3.5'))
+ANOMALY_RATIO = float(os.environ.get('DEPED_ANOMALY_RATIO', '5'))
+ANOMALY_MIN = int(os.environ.get('DEPED_ANOMALY_MIN', '50'))
+ANOMALY_COLUMNS = (
+    [{'name': column, 'id': column} for column in ['BEIS School ID', 'Region', 'Division', 'District', 'Grade']] +
+    [{'name': column, 'id': column, 'type': 'numeric', 'format': {'specifier': ','}}
+     for column in ['Previous', 'Present']] +
+    [{'name': 'Score', 'id': 'Score', 'type': 'numeric', 'format': {'specifier': '.1f'}},
+     {'name': 'Test', 'id': 'Test'}]
+)
+ANOMALIES = LRUCache(int(os.environ.get('DEPED_FRAME_CACHE', '4')))
+
+
+def robust_scores(change, active):
+    """Modified z-score of each cell against the active cells of its column (0 for inactive cells)"""
+    values = np.where(active, change, np.nan)
+    with warnings.catch_warnings():
+        # Columns no school enrolls in have no median
+        warnings.simplefilter('ignore', RuntimeWarning)
+        centre = np.nanmedian(values, axis=0)
+        spread = np.nanmedian(np.abs(values - centre), axis=0)
+    # A MAD of 0 (most schools unchanged) would make every change infinitely far off
+    scores = 0.6745 * (change - centre) / np.maximum(np.nan_to_num(spread), 0.05)
+    return np.where(active, np.nan_to_num(scores), 0)
+
+
+def yoy_anomalies(present_key, previous_key):
+    """
+    The schools with implausible swings between two uploads, as (table, present rows, previous rows), or None when
+    either upload's rows are not available. The table has one row per flagged school: its filter values, the grade
+    and gender with the largest flagged swing ('Total' for the school total), both years' enrollment there, the
+    score (largest |z|) and the tests that flagged it.
+    """
+    if not present_key or not previous_key:
+        return None
+    cached = ANOMALIES.get((present_key, previous_key))
+    if cached is not None:
+        return cached
+    present, previous = dataset_frame(present_key), dataset_frame(previous_key)
+    if present is None or previous is None:
+        return None
+
+    with timed('aggregate'):
+        columns = [col for col in ALL_GENDER_COLUMNS if col in present.columns and col in previous.columns]
+        present_ids, present_sums = grouped_sums(present, ['BEIS School ID'], columns)
+        previous_ids, previous_sums = grouped_sums(previous, ['BEIS School ID'], columns)
+        present_ids, previous_ids = present_ids['BEIS School ID'], previous_ids['BEIS School ID']
+
+        # Align the schools of both years on their ID (as text, so CSV and Excel uploads match)
+        positions = pd.Index(previous_ids.astype(str)).get_indexer(present_ids.astype(str))
+        both = positions >= 0
+        now = np.column_stack([present_sums[both], present_sums[both].sum(axis=1)])
+        before = np.column_stack([previous_sums[positions[both]], previous_sums[positions[both]].sum(axis=1)])
+
+        swing = np.abs(now - before)
+        scores = robust_scores(np.log1p(now) - np.log1p(before), (now + before) > 0)
+        by_score = np.abs(scores) > ANOMALY_Z
+        by_ratio = (np.maximum(now, before) + 1) >= ANOMALY_RATIO * (np.minimum(now, before) + 1)
+        cells = (swing >= ANOMALY_MIN) & (by_score | by_ratio)
+        flagged = cells.any(axis=1)
+
+        # Describe each flagged school by its largest flagged swing, by grade and gender when one is flagged
+        rows = np.flatnonzero(flagged)
+        ranks = np.where(cells[rows], swing[rows], -1.0)
+        ranks[:, -1] = np.where(cells[rows, -1], 0, -1)
+        worst = np.argmax(ranks, axis=1)
+        grades = np.array(columns + ['Total'], dtype=object)
+        tests = np.where(by_score[rows, worst] & by_ratio[rows, worst], 'z-score, ratio',
+                         np.where(by_score[rows, worst], 'z-score', 'ratio'))
+        schools = school_table(present_key).drop_duplicates('BEIS School ID')
+        ids = present_ids[both][rows]
+        table = (schools.set_index(schools['BEIS School ID'].astype(str)).reindex(ids.astype(str))
+                 [['BEIS School ID'] + FILTER_COLUMNS].reset_index(drop=True))
+        table['BEIS School ID'] = ids
+        table['Grade'] = grades[worst]
+        table['Previous'] = before[rows, worst].astype(np.int64)
+        table['Present'] = now[rows, worst].astype(np.int64)
+        table['Score'] = np.abs(np.where(cells[rows], scores[rows], 0)).max(axis=1).round(1)
+        table['Test'] = tests
+        table = table.sort_values('Score', ascending=False, kind='stable').reset_index(drop=True)
+
+        previous_flagged = previous_ids[positions[both][rows]]
+        anomalies = (
+            table,
+            masked_rows(present, row_mask(present, {'BEIS School ID': list(ids)})),
+            masked_rows(previous, row_mask(previous, {'BEIS School ID': list(previous_flagged)})),
+        )
+    ANOMALIES.put((present_key, previous_key), anomalies)
+    return anomalies
 
-            # Present Year
-            html.Div([
-                html.Div("Present Year", style={'fontSize': '14px', 'color': COLORS['accent'], 'textAlign': 'center'}),
-                html.Div(f"{int(total_present):,}", style={
-                    'fontSize': '24px',
-                    'fontWeight': 'bold',
-                    'textAlign': 'center',
-                    'margin': '5px 0'
-                })
-            ], style={'flex': 1, 'padding': '10px', 'borderLeft': '1px solid #d2d2d7',
-                      'borderRight': '1px solid #d2d2d7'}),
 
-            # Change
-            html.Div([
-                html.Div("Change", style={'fontSize': '14px', 'color': COLORS['accent'], 'textAlign': 'center'}),
-                html.Div([
-                    html.Span(f"{arrow} {abs(int(difference)):,}", style={
-                        'color': color,
-                        'fontSize': '24px',
-                        'fontWeight': 'bold',
-                        'marginRight': '5px'
-                    }),
-                    html.Span(f"({percent_change:.1f}%)", style={
-                        'color': color,
-                        'fontSize': '18px'
-                    })
-                ], style={'textAlign': 'center', 'margin': '5px 0'})
-            ], style={'flex': 1, 'padding': '10px'})
-        ], style={
-            'display': 'flex',
-            'justifyContent': 'space-around',
-            'alignItems': 'center'
-        })
-    ])
+def without_rows(totals, rows, filters):
+    """Per-column totals less the share of the given rows that matches the filters"""
+    share = column_sums(rows, list(totals), filters)
+    return {col: total - int(part) for (col, total), part in zip(totals.items(), share)}
+
+
+# =========================================================== END OF ANOMALIES ==========================================================================
+
 
-    # Return all four outputs as a tuple
-    return growth_card, enroll_fig, strand_comparison_fig, k10_comparison_fig
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='DepEd school enrollment dashboard')
+    parser.add_argument('--engine', choices=ENGINES, default=deped.engine.ENGINE,
+                        help='library used for ingest and aggregation (default: $DEPED_ENGINE or pandas)')
+    commands = parser.add_subparsers(dest='command')
+    report_parser = commands.add_parser('report', help='render a static report per region and division')
+    report_parser.add_argument('dataset', help='present year export (CSV, Excel, Parquet, .gz or .zip)')
+    report_parser.add_argument('--previous', help='previous year export, adds the year-over-year section')
+    report_parser.add_argument('--out', default='reports', help='output folder (default: reports)')
+    report_parser.add_argument('--by', choices=REPORT_LEVELS, default='both', help='report level (default: both)')
+    report_parser.add_argument('--workers', type=int, default=INGEST_WORKERS,
+                               help='worker processes (default: $DEPED_INGEST_WORKERS or the CPU count)')
+    report_parser.add_argument('--images', choices=('png', 'svg', 'none'), default='png',
+                               help='static image format, rendered with kaleido (default: png)')
+    args = parser.parse_args()
+    set_engine(args.engine)
+    if args.command == 'report':
+        logging.basicConfig(level=logging.INFO, format='%(message)s')
+        render_reports(args.dataset, args.previous, args.out, args.by, args.workers,
+                       None if args.images == 'none' else args.images)
+    else:
+        threading.Thread(target=restore_datasets, name='deped-restore', daemon=True).start()
+        app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,81 @@
+"""
+Fixtures for the callback benchmarks.
+
+Every run is compared with the newest baseline in benchmarks/baselines and fails when a benchmark's mean
+regresses by more than DEPED_BENCH_THRESHOLD (25% by default):
+
+    python -m pytest benchmarks                                       # compare with the stored baseline
+    DEPED_BENCH_SIZES=1k,47k,500k python -m pytest benchmarks         # choose the dataset sizes
+    DEPED_ENGINE=polars python -m pytest benchmarks                   # benchmark the polars engine
+    python -m pytest benchmarks --benchmark-save=baseline             # store a new baseline
+
+Baselines are machine specific; record one on the box you compare on.
+"""
+import os
+import pathlib
+
+import pytest
+
+import synthetic
+from harness import as_upload, load_dashboard
+
+try:
+    import pytest_benchmark.utils
+except ImportError:  # the benchmarks need the pytest-benchmark plugin
+    collect_ignore = ['test_callbacks.py']
+
+# Uploads made by the benchmarks are not saved to disk
+os.environ.setdefault('DEPED_DATA_DIR', '')
+
+BASELINES = pathlib.Path(__file__).resolve().parent / 'baselines'
+BENCH_SIZES = [size.strip() for size in os.environ.get('DEPED_BENCH_SIZES', '1k,47k').split(',') if size.strip()]
+
+
+def pytest_configure(config):
+    if not hasattr(config.option, 'benchmark_storage'):
+        return
+    if config.option.benchmark_storage == 'file://./.benchmarks':
+        config.option.benchmark_storage = f'file://{BASELINES}'
+    saving = config.option.benchmark_save or config.option.benchmark_autosave
+    if config.option.benchmark_compare is None and not saving and any(BASELINES.glob('*/*.json')):
+        config.option.benchmark_compare = True
+        if not config.option.benchmark_compare_fail:
+            threshold = os.environ.get('DEPED_BENCH_THRESHOLD', '25%')
+            config.option.benchmark_compare_fail = [pytest_benchmark.utils.parse_compare_fail(f'mean:{threshold}')]
+
+
+@pytest.fixture(scope='session')
+def dashboard():
+    return load_dashboard()
+
+
+@pytest.fixture(scope='session', params=BENCH_SIZES)
+def export(request):
+    """Present- and previous-year uploads of one size, as dcc.Upload contents"""
+    present = synthetic.generate_frame(synthetic.SIZES.get(request.param) or int(request.param), seed=0)
+    previous = synthetic.previous_year(present, seed=1)
+    return {
+        'present': as_upload(synthetic.to_export_bytes(present)),
+        'previous': as_upload(synthetic.to_export_bytes(previous)),
+    }
+
+
+@pytest.fixture(scope='session')
+def stored(dashboard, export):
+    """What the dcc.Store components hold after the uploads"""
+    main = dashboard.initial_dataset(export['present'])
+    present = dashboard.parse_contents(export['present'], 'present.csv')
+    return {
+        'main': dashboard.to_records(main),
+        'baseline': dashboard.ingest_baseline(main, export['present']),
+        'present': dashboard.to_records(present),
+        'present_baseline': dashboard.ingest_baseline(present, export['present']),
+        'previous': dashboard.to_records(dashboard.parse_contents(export['previous'], 'previous.csv')),
+    }
+
+
+@pytest.fixture(scope='session')
+def selection(stored):
+    """A typical drill-down: one region and one of its divisions"""
+    row = stored['main'][0]
+    return {'Region': [row['Region']], 'Division': [row['Division']]}
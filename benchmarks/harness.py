@@ -0,0 +1,25 @@
+"""Helpers shared by the benchmark suite and the load test."""
+import base64
+import importlib.util
+import pathlib
+import sys
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+
+
+def load_dashboard():
+    """Import 'DEPED Dashboard.py' as a module (its file name is not importable)"""
+    # The dashboard imports the deped package that sits next to it
+    if str(ROOT) not in sys.path:
+        sys.path.insert(0, str(ROOT))
+    spec = importlib.util.spec_from_file_location('deped_dashboard', ROOT / 'DEPED Dashboard.py')
+    module = importlib.util.module_from_spec(spec)
+    # Registered before running so pool workers can unpickle the module's functions by name
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def as_upload(raw, mimetype='text/csv'):
+    """The `contents` string dcc.Upload hands to a callback"""
+    return f'data:{mimetype};base64,' + base64.b64encode(raw).decode('ascii')
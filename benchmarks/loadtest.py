@@ -0,0 +1,456 @@
+"""
+Concurrent-user load test against a locally started dashboard.
+
+Each simulated analyst behaves like the Dash renderer in a browser: it loads the page, uploads a file,
+walks the Region > Division > District dropdowns, clears the filters, switches to /comparison-dashboard,
+uploads both years, drills down there and goes back. Callbacks are fired over HTTP against
+/_dash-update-component in dependency order, exactly with the inputs, state and changedPropIds the
+browser would send.
+
+    python benchmarks/loadtest.py --clients 200 --duration 60
+    python benchmarks/loadtest.py --clients 50 --size 47k --engine polars --json report.json
+    python benchmarks/loadtest.py --url http://127.0.0.1:8050 --clients 20    # an already running server
+
+The report lists p50/p95/p99 latency, request and response size per callback, overall throughput and the
+server's resident memory. Only the standard library, the dashboard's own dependencies and the synthetic
+data generator are used.
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import synthetic
+from harness import as_upload, load_dashboard
+
+MAIN_UPLOAD = 'upload-dataset'
+MAIN_CASCADE = ['region_dd', 'division_dd', 'district_dd']
+MAIN_CLEAR = 'clear_btn'
+COMPARISON_UPLOADS = ['upload-data1', 'upload-data2']
+COMPARISON_CASCADE = ['region-dropdown', 'division-dropdown', 'district-dropdown']
+COMPARISON_CLEAR = 'clear-filters-btn'
+
+
+# =========================================================== SERVER =====================================================================================
+def serve(host, port):
+    """Run the dashboard with the threaded Werkzeug server (the process the load test measures)"""
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    dashboard = load_dashboard()
+    dashboard.app.server.run(host=host, port=port, threaded=True)
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(port, engine):
+    env = dict(os.environ, DEPED_ENGINE=engine) if engine else dict(os.environ)
+    # Every run starts cold: saved uploads from earlier runs are not reattached unless DEPED_DATA_DIR is set
+    env.setdefault('DEPED_DATA_DIR', '')
+    process = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), '--serve', '--port', str(port)],
+        cwd=os.path.dirname(os.path.abspath(__file__)), env=env
+    )
+    base_url = f'http://127.0.0.1:{port}'
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'Dashboard server exited with code {process.returncode}')
+        try:
+            urllib.request.urlopen(base_url + '/_dash-dependencies', timeout=1).read()
+            return process, base_url
+        except (urllib.error.URLError, OSError):
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError('Dashboard server did not start within 60s')
+
+
+class MemorySampler(threading.Thread):
+    """Samples the server's resident set size (RSS) in the background"""
+
+    def __init__(self, pid, interval=0.5):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.samples = []
+        self.stopped = threading.Event()
+
+    def rss(self):
+        try:
+            with open(f'/proc/{self.pid}/status') as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        return int(line.split()[1]) * 1024
+        except OSError:
+            pass
+        try:
+            import psutil
+            return psutil.Process(self.pid).memory_info().rss
+        except Exception:
+            return None
+
+    def run(self):
+        while not self.stopped.is_set():
+            value = self.rss()
+            if value is not None:
+                self.samples.append(value)
+            self.stopped.wait(self.interval)
+
+
+# =========================================================== CLIENT =====================================================================================
+class Recorder:
+    """Thread-safe collection of per-request timings"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = []
+        self.sessions = 0
+
+    def add(self, name, seconds, ok, sent, received):
+        with self.lock:
+            self.requests.append((name, seconds, ok, sent, received))
+
+    def session_done(self):
+        with self.lock:
+            self.sessions += 1
+
+
+class Callback:
+    def __init__(self, spec, name):
+        self.name = name
+        self.output = spec['output']
+        self.multi = self.output.startswith('..')
+        outputs = self.output.strip('.').split('...') if self.multi else [self.output]
+        self.outputs = [tuple(o.rsplit('.', 1)) for o in outputs]
+        self.inputs = [(i['id'], i['property']) for i in spec['inputs']]
+        self.state = [(s['id'], s['property']) for s in spec['state']]
+        self.prevent_initial_call = spec.get('prevent_initial_call', False)
+
+
+def callback_names():
+    """Output spec -> Python function name, read from the app's callback map"""
+    dashboard = load_dashboard()
+    return {output: entry['callback'].__name__ for output, entry in dashboard.app.callback_map.items()}
+
+
+def iter_components(node):
+    """Yield (id, props) for every component with an id in a layout tree"""
+    if isinstance(node, list):
+        for child in node:
+            yield from iter_components(child)
+    elif isinstance(node, dict) and 'props' in node:
+        props = node['props']
+        if 'id' in props:
+            yield props['id'], props
+        yield from iter_components(props.get('children'))
+
+
+class Browser:
+    """Just enough of the Dash renderer to replay a session: component props plus callback chaining"""
+
+    def __init__(self, base_url, callbacks, recorder, rng, think):
+        self.base_url = base_url
+        self.callbacks = callbacks
+        self.recorder = recorder
+        self.rng = rng
+        self.think = think
+        self.props = {}
+        self.page = set()
+        # Keeps the session cookie like a browser, so the server's scheduler can tell the clients apart
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor())
+
+    def request(self, name, path, body=None):
+        data = json.dumps(body).encode('utf-8') if body is not None else None
+        request = urllib.request.Request(self.base_url + path, data=data,
+                                         headers={'Content-Type': 'application/json'} if data else {})
+        start = time.perf_counter()
+        try:
+            with self.opener.open(request, timeout=300) as response:
+                payload = response.read()
+                status = response.status
+        except urllib.error.HTTPError as error:
+            payload, status = error.read(), error.code
+        except (urllib.error.URLError, OSError):
+            payload, status = b'', 0
+        elapsed = time.perf_counter() - start
+        self.recorder.add(name, elapsed, status in (200, 204), len(data or b''), len(payload))
+        return status, payload
+
+    def pause(self):
+        if self.think:
+            time.sleep(self.rng.expovariate(1 / self.think))
+
+    # ---- layout ----
+    def mount(self, layout, replace=None):
+        if replace is not None:
+            for component_id in replace:
+                for key in [key for key in self.props if key[0] == component_id]:
+                    del self.props[key]
+        mounted = set()
+        for component_id, props in iter_components(layout):
+            mounted.add(component_id)
+            for prop, value in props.items():
+                self.props[(component_id, prop)] = value
+        return mounted
+
+    def load(self, path='/'):
+        self.request('GET /', '/')
+        self.request('GET /_dash-dependencies', '/_dash-dependencies')
+        status, payload = self.request('GET /_dash-layout', '/_dash-layout')
+        self.props.clear()
+        self.mount(json.loads(payload))
+        self.props[('url', 'pathname')] = path
+        self.fire({('url', 'pathname')}, initial=True)
+
+    # ---- callbacks ----
+    def triggered_by(self, changed, initial):
+        present = {key[0] for key in self.props}
+        return [cb for cb in self.callbacks
+                if any(inp in changed for inp in cb.inputs)
+                and all(inp[0] in present for inp in cb.inputs)
+                and not (initial and cb.prevent_initial_call)]
+
+    def fire(self, changed, initial=False):
+        # callback -> the props that triggered it (empty for initial calls, like the renderer sends)
+        pending = {cb: set() if initial else set(changed) & set(cb.inputs)
+                   for cb in self.triggered_by(changed, initial)}
+        while pending:
+            # A callback waits while another pending callback still has to produce one of its inputs
+            blocked = {out for cb in pending for out in cb.outputs}
+            ready = [cb for cb in pending if not any(inp in blocked for inp in cb.inputs)] or [next(iter(pending))]
+            for cb in ready:
+                updated, mounted = self.call(cb, pending.pop(cb))
+                for follower in self.triggered_by(updated, initial=False):
+                    pending.setdefault(follower, set()).update(updated & set(follower.inputs))
+                if mounted:
+                    # Freshly rendered components fire their own initial callbacks
+                    for follower in self.triggered_by({key for key in self.props if key[0] in mounted}, True):
+                        pending.setdefault(follower, set())
+
+    def call(self, cb, triggers):
+        value = lambda key: self.props.get(key)
+        body = {
+            'output': cb.output,
+            'outputs': [{'id': i, 'property': p} for i, p in cb.outputs] if cb.multi
+            else {'id': cb.outputs[0][0], 'property': cb.outputs[0][1]},
+            'inputs': [{'id': i, 'property': p, 'value': value((i, p))} for i, p in cb.inputs],
+            'state': [{'id': i, 'property': p, 'value': value((i, p))} for i, p in cb.state],
+            'changedPropIds': [f'{i}.{p}' for i, p in cb.inputs if (i, p) in triggers],
+        }
+        status, payload = self.request(cb.name, '/_dash-update-component', body)
+        if status != 200:
+            return set(), set()
+
+        updated, mounted = set(), set()
+        for component_id, props in json.loads(payload).get('response', {}).items():
+            for prop, new_value in props.items():
+                if prop == 'children' and component_id == 'page-content':
+                    old_page, self.page = self.page, set()
+                    self.page = self.mount(new_value, replace=old_page)
+                    mounted = self.page
+                self.props[(component_id, prop)] = new_value
+                updated.add((component_id, prop))
+        return updated, mounted
+
+    # ---- user actions ----
+    def navigate(self, path):
+        self.props[('url', 'pathname')] = path
+        self.fire({('url', 'pathname')})
+        self.pause()
+
+    def upload(self, upload_id, contents, filename):
+        self.props[(upload_id, 'contents')] = contents
+        self.props[(upload_id, 'filename')] = filename
+        self.fire({(upload_id, 'contents')})
+        self.pause()
+
+    def click(self, button_id):
+        self.props[(button_id, 'n_clicks')] = (self.props.get((button_id, 'n_clicks')) or 0) + 1
+        self.fire({(button_id, 'n_clicks')})
+        self.pause()
+
+    def choose(self, dropdown_id):
+        options = self.props.get((dropdown_id, 'options')) or []
+        if not options:
+            return
+        self.props[(dropdown_id, 'value')] = [self.rng.choice(options)['value']]
+        self.fire({(dropdown_id, 'value')})
+        self.pause()
+
+
+def run_session(browser, uploads):
+    """One analyst session across both dashboards"""
+    browser.load('/')
+    browser.upload(MAIN_UPLOAD, [uploads['present']], ['enrollment_present.csv'])
+    for dropdown in MAIN_CASCADE:
+        browser.choose(dropdown)
+    browser.click(MAIN_CLEAR)
+
+    browser.navigate('/comparison-dashboard')
+    browser.upload(COMPARISON_UPLOADS[0], [uploads['present']], ['enrollment_present.csv'])
+    browser.upload(COMPARISON_UPLOADS[1], [uploads['previous']], ['enrollment_previous.csv'])
+    for dropdown in COMPARISON_CASCADE:
+        browser.choose(dropdown)
+    browser.click(COMPARISON_CLEAR)
+    browser.navigate('/')
+
+
+def client(index, args, base_url, callbacks, uploads, recorder, deadline):
+    rng = random.Random(args.seed + index)
+    time.sleep(args.ramp * index / max(args.clients, 1))
+    sessions = 0
+    while time.monotonic() < deadline and (not args.sessions or sessions < args.sessions):
+        run_session(Browser(base_url, callbacks, recorder, rng, args.think), uploads)
+        recorder.session_done()
+        sessions += 1
+
+
+# =========================================================== REPORT =====================================================================================
+def percentile(values, q):
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method='inclusive')[q - 1]
+
+
+def summarize(recorder, elapsed, memory):
+    rows = {}
+    for name, seconds, ok, sent, received in recorder.requests:
+        row = rows.setdefault(name, {'times': [], 'errors': 0, 'sent': 0, 'received': 0})
+        row['times'].append(seconds * 1000)
+        row['errors'] += not ok
+        row['sent'] += sent
+        row['received'] += received
+
+    callbacks = {}
+    for name, row in sorted(rows.items()):
+        times = sorted(row['times'])
+        callbacks[name] = {
+            'calls': len(times),
+            'errors': row['errors'],
+            'p50_ms': percentile(times, 50),
+            'p95_ms': percentile(times, 95),
+            'p99_ms': percentile(times, 99),
+            'mean_ms': statistics.fmean(times),
+            'mean_request_kb': row['sent'] / len(times) / 1024,
+            'mean_response_kb': row['received'] / len(times) / 1024,
+        }
+
+    total = len(recorder.requests)
+    return {
+        'elapsed_s': elapsed,
+        'sessions': recorder.sessions,
+        'requests': total,
+        'errors': sum(row['errors'] for row in callbacks.values()),
+        'throughput_rps': total / elapsed if elapsed else 0.0,
+        'sessions_per_minute': recorder.sessions / elapsed * 60 if elapsed else 0.0,
+        'server_rss_mb': {
+            'start': memory[0] / 2 ** 20 if memory else None,
+            'peak': max(memory) / 2 ** 20 if memory else None,
+            'end': memory[-1] / 2 ** 20 if memory else None,
+        },
+        'callbacks': callbacks,
+    }
+
+
+def print_report(report, args):
+    print(f"\n{args.clients} clients, {report['elapsed_s']:.1f}s, {report['sessions']} sessions, "
+          f"{report['requests']} requests, {report['errors']} errors")
+    header = f"{'request':<32}{'calls':>7}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}" \
+             f"{'mean ms':>10}{'req KB':>10}{'resp KB':>10}"
+    print(header)
+    print('-' * len(header))
+    for name, row in report['callbacks'].items():
+        print(f"{name:<32}{row['calls']:>7}{row['errors']:>8}{row['p50_ms']:>10.1f}{row['p95_ms']:>10.1f}"
+              f"{row['p99_ms']:>10.1f}{row['mean_ms']:>10.1f}{row['mean_request_kb']:>10.1f}"
+              f"{row['mean_response_kb']:>10.1f}")
+    print(f"\nthroughput: {report['throughput_rps']:.1f} requests/s, "
+          f"{report['sessions_per_minute']:.1f} sessions/min")
+    rss = report['server_rss_mb']
+    if rss['peak'] is not None:
+        print(f"server RSS: {rss['start']:.0f} MB at start, {rss['peak']:.0f} MB peak, {rss['end']:.0f} MB at end")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay concurrent analyst sessions against the dashboard')
+    parser.add_argument('--clients', type=int, default=50, help='concurrent simulated analysts')
+    parser.add_argument('--duration', type=float, default=60, help='seconds to keep starting new sessions')
+    parser.add_argument('--sessions', type=int, default=0, help='stop each client after this many sessions')
+    parser.add_argument('--ramp', type=float, default=5, help='seconds over which the clients start')
+    parser.add_argument('--think', type=float, default=0.5, help='mean think time between actions, seconds')
+    parser.add_argument('--size', default='1k', help="dataset size: '1k', '47k', '500k' or a row count")
+    parser.add_argument('--engine', choices=['pandas', 'polars'], help='engine for the started server')
+    parser.add_argument('--url', help='test an already running server instead of starting one')
+    parser.add_argument('--pid', type=int, help='process id of --url server, for RSS sampling')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help='also write the report to this file')
+    parser.add_argument('--serve', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, default=0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve('127.0.0.1', args.port)
+        return
+
+    n_rows = synthetic.SIZES.get(args.size) or int(args.size)
+    present = synthetic.generate_frame(n_rows, seed=args.seed)
+    uploads = {
+        'present': as_upload(synthetic.to_export_bytes(present)),
+        'previous': as_upload(synthetic.to_export_bytes(synthetic.previous_year(present, seed=args.seed + 1))),
+    }
+
+    server = None
+    if args.url:
+        base_url, pid = args.url.rstrip('/'), args.pid
+    else:
+        server, base_url = start_server(args.port or free_port(), args.engine)
+        pid = server.pid
+
+    try:
+        names = callback_names()
+        dependencies = json.loads(urllib.request.urlopen(base_url + '/_dash-dependencies').read())
+        callbacks = [Callback(spec, names.get(spec['output'], spec['output'])) for spec in dependencies]
+
+        sampler = MemorySampler(pid) if pid else None
+        if sampler:
+            sampler.start()
+
+        recorder = Recorder()
+        start = time.monotonic()
+        deadline = start + args.duration
+        threads = [threading.Thread(target=client, daemon=True,
+                                    args=(i, args, base_url, callbacks, uploads, recorder, deadline))
+                   for i in range(args.clients)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - start
+
+        if sampler:
+            sampler.stopped.set()
+            sampler.join()
+        report = summarize(recorder, elapsed, sampler.samples if sampler else [])
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=10)
+
+    print_report(report, args)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
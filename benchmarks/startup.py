@@ -0,0 +1,77 @@
+"""
+Worker boot time: how long a fresh interpreter takes to import the dashboard and answer its first requests.
+
+    python benchmarks/startup.py              # median of 5 cold starts
+    python benchmarks/startup.py --runs 10 --importtime
+
+Each run is a new process, so nothing is shared between runs. Reported per run:
+  import       importing 'DEPED Dashboard.py' (module-level code, layouts, callback registration)
+  first page   the first display_page call, serialized the way Dash sends it
+  first figure the first update_metrics_and_chart call on a small upload (deferred imports land here)
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+PROBE = r'''
+import json, sys, time
+start = time.perf_counter()
+sys.path.insert(0, {here!r})
+from harness import as_upload, load_dashboard
+dashboard = load_dashboard()
+imported = time.perf_counter()
+
+import plotly.io
+layout = dashboard.display_page('/')
+plotly.io.json.to_json_plotly(layout)
+paged = time.perf_counter()
+
+import synthetic
+data = dashboard.to_records(dashboard.initial_dataset(as_upload(synthetic.generate_export(200))))
+ready = time.perf_counter()
+dashboard.update_metrics_and_chart(data, *[None] * 10)
+figured = time.perf_counter()
+print(json.dumps({{'import': imported - start, 'first page': paged - imported,
+                  'first figure': figured - ready, 'modules': len(sys.modules)}}))
+'''
+
+
+def run_once(extra_flags=()):
+    here = os.path.dirname(os.path.abspath(__file__))
+    result = subprocess.run([sys.executable, *extra_flags, '-c', PROBE.format(here=here)],
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1]), result.stderr
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure dashboard cold-start time')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--importtime', action='store_true',
+                        help='also list the slowest imports of one run (python -X importtime)')
+    args = parser.parse_args()
+
+    runs = [run_once()[0] for _ in range(args.runs)]
+    for key in ('import', 'first page', 'first figure'):
+        values = [run[key] * 1000 for run in runs]
+        print(f'{key:<14} median {statistics.median(values):8.1f} ms   min {min(values):8.1f} ms   '
+              f'max {max(values):8.1f} ms')
+    print(f"{'modules':<14} {runs[0]['modules']} loaded after the first figure")
+
+    if args.importtime:
+        _, stderr = run_once(['-X', 'importtime'])
+        rows = []
+        for line in stderr.splitlines():
+            if line.startswith('import time:') and '|' in line:
+                _, cumulative, name = (part.strip() for part in line[len('import time:'):].split('|'))
+                if cumulative.isdigit():
+                    rows.append((int(cumulative), name))
+        print('\nslowest imports (cumulative):')
+        for cumulative, name in sorted(rows, reverse=True)[:15]:
+            print(f'  {cumulative / 1000:8.1f} ms  {name}')
+
+
+if __name__ == '__main__':
+    main()
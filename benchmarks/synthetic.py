@@ -0,0 +1,166 @@
+"""
+Synthetic DepEd enrollment exports for benchmarking.
+
+The files mimic the raw export that `initial_dataset` and `parse_contents` read: four preamble rows, the
+header row with the ten dimension columns and 'BEIS School ID', then one Male and one Female column for
+every grade (K-G10), the non-graded classes and each G11/G12 SHS track. Header names keep the dashes of
+the source system ('G11 ACAD - ABM Male') so the column-name cleanup is exercised too.
+
+    python benchmarks/synthetic.py --size 47k -o enrollment_47k.csv
+    python benchmarks/synthetic.py --size 47k --previous-year -o enrollment_47k_prev.csv
+"""
+import argparse
+import io
+
+import numpy as np
+import pandas as pd
+
+SIZES = {'1k': 1_000, '47k': 47_000, '500k': 500_000}
+
+PREAMBLE = [
+    'Department of Education',
+    'Learner Information System',
+    'Enrollment per School, by Grade Level and Sex',
+    '',
+]
+
+REGIONS = [
+    'Region I', 'Region II', 'Region III', 'Region IV-A', 'MIMAROPA', 'Region V', 'Region VI', 'Region VII',
+    'Region VIII', 'Region IX', 'Region X', 'Region XI', 'Region XII', 'CARAGA', 'BARMM', 'CAR', 'NCR'
+]
+SECTORS = ['Public', 'Private', 'SUCs/LUCs', 'PSO']
+SECTOR_WEIGHTS = [0.80, 0.18, 0.015, 0.005]
+SCHOOL_TYPES = ['School with no Annexes', 'Mother school', 'Annex or Extension school(s)',
+                'Mobile School(s)/Center(s)']
+SCHOOL_TYPE_WEIGHTS = [0.85, 0.07, 0.07, 0.01]
+SUBCLASSES = {
+    'Public': ['DepEd Managed', 'DOST Managed', 'Other GA Managed'],
+    'Private': ['Sectarian', 'Non-Sectarian', 'Local International School'],
+    'SUCs/LUCs': ['SUC Managed', 'LUC Managed'],
+    'PSO': ['Non-Sectarian'],
+}
+
+ELEMENTARY = ['K', 'G1', 'G2', 'G3', 'G4', 'G5', 'G6', 'Elem NG']
+JUNIOR_HIGH = ['G7', 'G8', 'G9', 'G10', 'JHS NG']
+SHS_TRACKS = ['ACAD - ABM', 'ACAD - HUMSS', 'ACAD - STEM', 'ACAD - GAS', 'ACAD - PBM', 'TVL', 'SPORTS', 'ARTS']
+SENIOR_HIGH = [f'{grade} {track}' for grade in ('G11', 'G12') for track in SHS_TRACKS]
+
+# Modified COC -> levels offered (elementary, junior high, senior high) and its share of schools
+OFFERINGS = {
+    'Purely ES': ((True, False, False), 0.72),
+    'ES and JHS (K to 10)': ((True, True, False), 0.03),
+    'All Offering (K to 12)': ((True, True, True), 0.03),
+    'Purely JHS': ((False, True, False), 0.06),
+    'JHS with SHS': ((False, True, True), 0.13),
+    'Purely SHS': ((False, False, True), 0.03),
+}
+
+DIMENSION_COLUMNS = ['Region', 'Division', 'District', 'BEIS School ID', 'Province', 'Municipality',
+                     'Legislative District', 'Sector', 'School Subclassification', 'School Type', 'Modified COC']
+
+
+def enrollment_columns():
+    """Raw (uncleaned) enrollment column names in export order"""
+    return [f'{level} {sex}' for level in ELEMENTARY + JUNIOR_HIGH + SENIOR_HIGH for sex in ('Male', 'Female')]
+
+
+def _level_mask(columns, levels):
+    return np.array([col.rsplit(' ', 1)[0] in levels for col in columns])
+
+
+def generate_frame(n_rows, seed=0):
+    """One row per school with a Region > Division > District geography and level-aware enrollment"""
+    rng = np.random.default_rng(seed)
+
+    # ~220 divisions and ~2,500 districts nationally, scaled down for small files so groups stay populated
+    # Provinces pair up divisions inside one region and municipalities pair up districts inside one division.
+    n_divisions = int(np.clip(n_rows // 200, 2 * len(REGIONS), 220))
+    n_districts = int(np.clip(n_rows // 19, n_divisions, 2_500))
+    division_region = (np.arange(n_divisions) // 2) % len(REGIONS)
+    district_division = np.sort(np.concatenate([
+        np.arange(n_divisions), rng.integers(0, n_divisions, n_districts - n_divisions)
+    ]))
+
+    district = rng.integers(0, n_districts, n_rows)
+    division = district_division[district]
+    region = division_region[division]
+    municipality = district // 2
+    province = division // 2
+    legislative = division * 3 + district % 3
+
+    sector = rng.choice(len(SECTORS), n_rows, p=SECTOR_WEIGHTS)
+    subclass = np.array([SUBCLASSES[SECTORS[s]][i % len(SUBCLASSES[SECTORS[s]])]
+                         for s, i in zip(sector, rng.integers(0, 6, n_rows))])
+    coc_names = list(OFFERINGS)
+    coc = rng.choice(len(coc_names), n_rows, p=[share for _, share in OFFERINGS.values()])
+
+    frame = pd.DataFrame({
+        'Region': np.array(REGIONS)[region],
+        'Division': np.char.add('Division ', (division + 1).astype(str)),
+        'District': np.char.add('District ', (district + 1).astype(str)),
+        'BEIS School ID': 100_000 + np.arange(n_rows),
+        'Province': np.char.add('Province ', (province + 1).astype(str)),
+        'Municipality': np.char.add('Municipality ', (municipality + 1).astype(str)),
+        'Legislative District': np.char.add('Lone District ', (legislative + 1).astype(str)),
+        'Sector': np.array(SECTORS)[sector],
+        'School Subclassification': subclass,
+        'School Type': np.array(SCHOOL_TYPES)[rng.choice(len(SCHOOL_TYPES), n_rows, p=SCHOOL_TYPE_WEIGHTS)],
+        'Modified COC': np.array(coc_names)[coc],
+    })
+
+    columns = enrollment_columns()
+    offers = np.array([offered for offered, _ in OFFERINGS.values()])[coc]
+    school_size = rng.lognormal(mean=3.2, sigma=0.8, size=n_rows)
+    values = rng.poisson(school_size[:, None], size=(n_rows, len(columns)))
+
+    for level, levels in enumerate((ELEMENTARY, JUNIOR_HIGH, SENIOR_HIGH)):
+        values[np.ix_(~offers[:, level], _level_mask(columns, levels))] = 0
+    # Non-graded classes are rare and SHS tracks are thin outside ACAD - STEM/HUMSS and TVL
+    values[:, _level_mask(columns, ['Elem NG', 'JHS NG'])] *= rng.random((n_rows, 1)) < 0.05
+    values[:, _level_mask(columns, [f'{g} {t}' for g in ('G11', 'G12') for t in ('ACAD - PBM', 'SPORTS', 'ARTS')])] //= 8
+
+    return pd.concat([frame, pd.DataFrame(values, columns=columns)], axis=1)
+
+
+def previous_year(frame, seed=1):
+    """The same schools a year earlier: every enrollment cell drifts by a few percent"""
+    rng = np.random.default_rng(seed)
+    previous = frame.copy()
+    columns = enrollment_columns()
+    drift = rng.normal(1.0, 0.06, size=(len(frame), len(columns)))
+    previous[columns] = np.rint(frame[columns].to_numpy() * drift).clip(min=0).astype(np.int64)
+    return previous
+
+
+def to_export_bytes(frame):
+    """Serialize a frame as a raw export CSV, preamble rows included"""
+    buffer = io.StringIO()
+    buffer.write('\n'.join(PREAMBLE) + '\n')
+    frame.to_csv(buffer, index=False)
+    return buffer.getvalue().encode('utf-8')
+
+
+def generate_export(size, seed=0, previous=False):
+    """Raw export bytes for a named size ('1k', '47k', '500k') or a row count"""
+    n_rows = SIZES[size] if size in SIZES else int(size)
+    frame = generate_frame(n_rows, seed=seed)
+    if previous:
+        frame = previous_year(frame, seed=seed + 1)
+    return to_export_bytes(frame)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Write a synthetic DepEd enrollment export')
+    parser.add_argument('--size', default='47k', help="'1k', '47k', '500k' or a row count")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--previous-year', action='store_true',
+                        help='write the previous-year file for the same schools')
+    parser.add_argument('-o', '--output', required=True)
+    args = parser.parse_args()
+
+    with open(args.output, 'wb') as f:
+        f.write(generate_export(args.size, seed=args.seed, previous=args.previous_year))
+
+
+if __name__ == '__main__':
+    main()
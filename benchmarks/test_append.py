@@ -0,0 +1,34 @@
+"""Late division submissions appended to an upload carry its caches forward."""
+import synthetic
+from harness import as_upload
+
+
+def test_append_updates_views_and_blocks(dashboard):
+    frame = synthetic.generate_frame(400, seed=3)
+    # The late submission is one division's schools
+    late = frame['Division'] == frame['Division'].iloc[-1]
+    upload = as_upload(synthetic.to_export_bytes(frame[~late]))
+    df = dashboard.initial_dataset(upload)
+    data = dashboard.to_records(df)
+    baseline = dashboard.ingest_baseline(df, upload)
+
+    row = dashboard.to_records(dashboard.initial_dataset(as_upload(synthetic.to_export_bytes(frame[late]))))[0]
+    untouched = next(region for region in frame['Region'].unique() if region != row['Region'])
+    states = [{}, {'Region': [row['Region']]}, {'Division': [row['Division']]}, {'Region': [untouched]}]
+    dashboard.dataset_view(baseline['dataset'], {})
+    for filters in states:
+        dashboard.cached_view(baseline, filters, lambda: df)
+
+    records, combined, added = dashboard.append_upload(
+        data, baseline, as_upload(synthetic.to_export_bytes(frame[late])), 'late.csv')
+    assert added == int(late.sum())
+
+    key = combined['dataset']
+    rows = dashboard.load_records(records)
+    assert dashboard.DATASET_FRAMES.get(key) is not None
+    assert dashboard.BLOCKS.get(key) is not None
+    for filters in states + [{'Division': [frame['Division'].iloc[0]]}]:
+        expected = dashboard.filtered_view(rows, filters)
+        if filters in states:
+            assert dashboard.VIEW_CACHE.get((key, dashboard.selection_key(filters))) == expected
+        assert dashboard.dataset_view(key, filters) == expected
@@ -0,0 +1,16 @@
+"""Request counts behind the cache warming."""
+import collections
+
+
+def test_view_usage_is_capped(dashboard, monkeypatch):
+    monkeypatch.setattr(dashboard, 'VIEW_USAGE', collections.Counter())
+    empty = ((),) * len(dashboard.FILTER_COLUMNS)
+    popular = (('NCR',),) + empty[1:]
+    for _ in range(5):
+        dashboard.record_view_usage(popular)
+    for i in range(dashboard.USAGE_LIMIT * 5):
+        dashboard.record_view_usage(((f'Region {i}',),) + empty[1:])
+        assert len(dashboard.VIEW_USAGE) <= 2 * dashboard.USAGE_LIMIT
+
+    assert dashboard.VIEW_USAGE[popular] == 5
+    assert [selections for selections, _ in dashboard.VIEW_USAGE.most_common(1)] == [popular]
@@ -0,0 +1,69 @@
+"""Timings of ingest and of the data callbacks, called directly without a Dash server."""
+import pytest
+
+FILTERS = ['unfiltered', 'drilldown']
+
+
+def filter_values(dashboard, selection, state):
+    """Dropdown values in callback argument order for a named filter state"""
+    chosen = selection if state == 'drilldown' else {}
+    return [chosen.get(column) for column in dashboard.FILTER_COLUMNS]
+
+
+def test_initial_dataset(benchmark, dashboard, export):
+    df = benchmark(dashboard.initial_dataset, export['present'])
+    assert dashboard.row_count(df) > 0
+
+
+def test_parse_contents(benchmark, dashboard, export):
+    df = benchmark(dashboard.parse_contents, export['previous'], 'previous.csv')
+    assert dashboard.row_count(df) > 0
+
+
+@pytest.mark.parametrize('state', FILTERS)
+def test_update_dropdown_options(benchmark, dashboard, stored, selection, state):
+    values = filter_values(dashboard, selection, state)
+    options = benchmark(dashboard.update_dropdown_options, stored['main'], *values, baseline=stored['baseline'])
+    assert options[0]
+
+
+@pytest.mark.parametrize('state', FILTERS)
+def test_update_metrics_and_chart(benchmark, dashboard, stored, selection, state):
+    values = filter_values(dashboard, selection, state)
+    # Without an upload handle nothing is served from the view and figure caches
+    uncached = dict(stored['baseline'], dataset=None)
+    outputs = benchmark(dashboard.update_metrics_and_chart, stored['main'], *values, baseline=uncached)
+    assert len(outputs) == 10
+
+
+@pytest.mark.parametrize('state', FILTERS)
+def test_filtered_view(benchmark, dashboard, stored, selection, state):
+    """Aggregation behind update_metrics_and_chart when the view is not cached yet"""
+    df = dashboard.load_records(stored['main'])
+    filters = dict(zip(dashboard.FILTER_COLUMNS, filter_values(dashboard, selection, state)))
+    totals, offering, schools = benchmark(dashboard.filtered_view, df, filters)
+    assert schools > 0
+
+
+@pytest.mark.parametrize('state', FILTERS)
+def test_block_view(benchmark, dashboard, stored, selection, state):
+    """The same view aggregated from the per-level blocks that serve uploads kept on the server"""
+    df = dashboard.load_records(stored['main'])
+    filters = dict(zip(dashboard.FILTER_COLUMNS, filter_values(dashboard, selection, state)))
+    blocks = dashboard.EnrollmentBlocks(df)
+    view = benchmark(blocks.view, filters)
+    assert view == dashboard.filtered_view(df, filters)
+
+
+@pytest.mark.parametrize('state', FILTERS)
+def test_update_dropdowns(benchmark, dashboard, stored, selection, state):
+    values = filter_values(dashboard, selection, state)
+    options = benchmark(dashboard.update_dropdowns, stored['present'], *values, baseline=stored['present_baseline'])
+    assert options[0]
+
+
+@pytest.mark.parametrize('state', FILTERS)
+def test_update_growth_card(benchmark, dashboard, stored, selection, state):
+    values = filter_values(dashboard, selection, state)
+    outputs = benchmark(dashboard.update_growth_card, stored['present'], stored['previous'], *values)
+    assert len(outputs) == 4
@@ -0,0 +1,23 @@
+"""Year-over-year growth behind the comparison dashboard and the REST API."""
+from deped.analytics import growth_summary
+
+
+def test_level_totals_match_whole_grades():
+    present = {'K Male': 1, 'G1 Female': 2, 'G10 Male': 4, 'G11 ACAD STEM Female': 8, 'G12 TVL Male': 16}
+    previous = dict.fromkeys(present, 0)
+    levels = growth_summary(present, previous)['levels']
+    assert {label: level['present'] for label, level in levels.items()} == {'Elementary': 3, 'JHS': 4, 'SHS': 24}
+
+
+def test_growth_card_filters_follow_the_dropdowns(dashboard, stored, selection, monkeypatch):
+    seen = []
+
+    def cached_view(baseline, filters, load):
+        seen.append(filters)
+        return {}, {}, 0
+
+    monkeypatch.setattr(dashboard, 'cached_view', cached_view)
+    values = [selection.get(column) for column in dashboard.FILTER_COLUMNS]
+    dashboard.update_growth_card(stored['present'], stored['previous'], *values)
+
+    assert seen and all(filters == dict(zip(dashboard.FILTER_COLUMNS, values)) for filters in seen)
@@ -0,0 +1,20 @@
+"""The deped package used on its own, as from a notebook."""
+import deped
+import deped.engine
+import synthetic
+
+
+def test_load_follows_the_engine():
+    raw = synthetic.generate_export(50, seed=4)
+    engine = deped.engine.ENGINE
+    try:
+        deped.set_engine('pandas')
+        on_pandas = deped.load(raw)
+        deped.set_engine('polars')
+        on_polars = deped.load(raw)
+        assert on_polars is not on_pandas and on_polars.key == on_pandas.key
+        assert deped.engine.is_polars(deped.filter(on_polars))
+        assert not deped.engine.is_polars(deped.filter(on_pandas))
+        assert deped.engine.row_count(deped.filter(on_polars)) == 50
+    finally:
+        deped.set_engine(engine)
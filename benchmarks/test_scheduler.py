@@ -0,0 +1,110 @@
+"""Behaviour of the admission scheduler in front of the heavy callbacks."""
+import threading
+import time
+
+
+def call_in_session(dashboard, session, func, *args):
+    """Call a scheduled callback inside a request from the browser session `session`; the last arg is the tab id"""
+    cookie = f'{dashboard.SESSION_COOKIE}={session}'
+    with dashboard.app.server.test_request_context(headers={'Cookie': cookie}):
+        try:
+            return func(*args)
+        except dashboard.PreventUpdate:
+            return 'prevented'
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_rejected_call_keeps_running_call(dashboard, monkeypatch):
+    scheduler = dashboard.HeavyScheduler(slots=1, queue_limit=1)
+    monkeypatch.setattr(dashboard, 'HEAVY_SCHEDULER', scheduler)
+    started, finish = threading.Event(), threading.Event()
+
+    @dashboard.admitted
+    def update_chart(value):
+        started.set()
+        finish.wait(5)
+        with dashboard.timed('figure'):
+            return value
+
+    results = {}
+
+    def run(session, value):
+        results[value] = call_in_session(dashboard, session, update_chart, value, f'{session}-tab')
+
+    first = threading.Thread(target=run, args=('a', 'first'))
+    first.start()
+    assert started.wait(5)
+    # Another session's call takes the only place in the queue
+    queued = threading.Thread(target=run, args=('b', 'queued'))
+    queued.start()
+    wait_for(lambda: scheduler.queued == 1)
+
+    # The session's newer call finds the queue full and is turned away without cancelling its running call
+    run('a', 'second')
+    finish.set()
+    first.join(5)
+    queued.join(5)
+
+    assert results == {'first': 'first', 'second': 'prevented', 'queued': 'queued'}
+    assert scheduler.running == 0 and scheduler.queued == 0
+    assert not scheduler.admitted_calls and not scheduler.queued_calls
+
+
+def test_admitted_call_supersedes_running_call(dashboard):
+    scheduler = dashboard.HeavyScheduler(slots=2, queue_limit=4)
+    older = scheduler.acquire('a', 'update_chart', timeout=1)
+    newer = scheduler.acquire('a', 'update_chart', timeout=1)
+    assert (older.state, newer.state) == ('superseded', 'admitted')
+    scheduler.release(older)
+    scheduler.release(newer)
+    assert scheduler.running == 0 and not scheduler.admitted_calls
+
+
+def test_tabs_of_one_session_do_not_cancel_each_other(dashboard, monkeypatch):
+    scheduler = dashboard.HeavyScheduler(slots=2, queue_limit=4)
+    monkeypatch.setattr(dashboard, 'HEAVY_SCHEDULER', scheduler)
+    started, finish = threading.Event(), threading.Event()
+
+    @dashboard.admitted
+    def update_chart(value):
+        if value == 'tab-a':
+            started.set()
+            finish.wait(5)
+        with dashboard.timed('figure'):
+            return value
+
+    results = {}
+
+    def run(tab):
+        results[tab] = call_in_session(dashboard, 'shared', update_chart, tab, tab)
+
+    first = threading.Thread(target=run, args=('tab-a',))
+    first.start()
+    assert started.wait(5)
+    run('tab-b')
+    finish.set()
+    first.join(5)
+
+    assert results == {'tab-a': 'tab-a', 'tab-b': 'tab-b'}
+
+
+def test_search_calls_are_coalesced_apart(dashboard, monkeypatch):
+    def update_dropdowns():
+        pass
+
+    monkeypatch.setattr(dashboard, 'triggered_props', lambda: {'region-dropdown.value'})
+    refresh = dashboard.coalescing_key('tab', update_dropdowns)
+    monkeypatch.setattr(dashboard, 'triggered_props', lambda: {'district-dropdown.search_value'})
+    search = dashboard.coalescing_key('tab', update_dropdowns)
+    assert refresh != search
+
+    scheduler = dashboard.HeavyScheduler(slots=2, queue_limit=4)
+    full = scheduler.acquire('session', refresh, timeout=1, slotted=False)
+    scheduler.acquire('session', search, timeout=1, slotted=False)
+    assert full.state == 'admitted'
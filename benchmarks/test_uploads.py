@@ -0,0 +1,36 @@
+"""Upload parsing picks the reader from the file extension, whatever else the name holds."""
+import io
+
+import pandas as pd
+import pytest
+
+import synthetic
+from deped.engine import read_upload, row_count
+
+
+@pytest.fixture(scope='module')
+def frame():
+    return synthetic.generate_frame(50, seed=0)
+
+
+def excel_export(frame):
+    """The frame as an .xlsx export, preamble rows included"""
+    buffer = io.BytesIO()
+    with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
+        pd.DataFrame([[line] for line in synthetic.PREAMBLE]).to_excel(writer, index=False, header=False)
+        frame.to_excel(writer, index=False, startrow=len(synthetic.PREAMBLE))
+    return buffer.getvalue()
+
+
+def test_upper_case_csv_extension(frame):
+    assert row_count(read_upload(synthetic.to_export_bytes(frame), '2024.CSV')) == len(frame)
+
+
+def test_csv_in_excel_file_name(frame):
+    assert row_count(read_upload(excel_export(frame), 'csv_summary.xlsx')) == len(frame)
+
+
+@pytest.mark.parametrize('filename', ['enrollment.csv.txt', 'xlsx_export.json', 'report.parquet.bak'])
+def test_unsupported_extension(frame, filename):
+    with pytest.raises(ValueError, match='unsupported file type'):
+        read_upload(synthetic.to_export_bytes(frame), filename)
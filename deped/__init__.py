@@ -0,0 +1,22 @@
+"""
+The enrollment analytics behind the DepEd dashboard, without the UI: reading the enrollment exports, the column
+maps, filtering, totals and year-over-year growth, on pandas or polars (DEPED_ENGINE or set_engine).
+
+    import deped
+
+    present = deped.load('present.csv')
+    previous = deped.load('previous.csv')
+    ncr = deped.filter(present, Region='NCR')
+    regions = deped.aggregate(present, [{'Region': [region]} for region in present.index.values[0]])
+    change = deped.growth(present, previous, [{'Sector': ['Public']}, {'Sector': ['Private']}])
+"""
+from .analytics import Dataset, aggregate, filter, growth, load, selections
+from .columns import (ALL_GENDER_COLUMNS, FILTER_COLUMNS, GROWTH_LEVELS, K10_LEVELS, LEVEL_COLUMNS,
+                      STRAND_COLUMNS)
+from .engine import ENGINES, set_engine
+
+__all__ = [
+    'Dataset', 'aggregate', 'filter', 'growth', 'load', 'selections',
+    'ALL_GENDER_COLUMNS', 'FILTER_COLUMNS', 'GROWTH_LEVELS', 'K10_LEVELS', 'LEVEL_COLUMNS', 'STRAND_COLUMNS',
+    'ENGINES', 'set_engine',
+]
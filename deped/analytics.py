@@ -0,0 +1,292 @@
+"""
+Filtering, totals and growth over loaded uploads, one filter state or many at a time.
+
+load() reads an export into a Dataset keyed by a hash of its bytes. filter() and aggregate() go through the same
+per-upload row masks, level blocks and view cache as the dashboard, so the second look at a slice costs a lookup
+and a batch of hundreds of slices never rescans the rows.
+"""
+import base64
+import hashlib
+import os
+
+from . import engine
+from .columns import ALL_GENDER_COLUMNS, FILTER_COLUMNS, K10_LEVELS, LEVEL_COLUMNS, SENIOR_FEMALE, SENIOR_MALE
+from .columns import GROWTH_LEVELS, STRAND_COLUMNS
+from .engine import clean_columns, column_sums, concat_frames, distinct_count, enrollment_summary, fill_missing
+from .engine import empty_frame, masked_rows, pd, read_upload, row_mask
+from .indexes import BLOCKS, FILTER_INDEXES, ROW_MASKS, VIEW_CACHE, EnrollmentBlocks, FilterIndex, LRUCache
+
+# Datasets loaded here by engine and handle, so loading the same file again reuses its rows and indexes
+DATASETS = LRUCache(int(os.environ.get('DEPED_FRAME_CACHE', '4')))
+
+
+def read_dataset(decoded, filename):
+    """Rows of an export file's bytes, with missing values filled and the column names cleaned"""
+    df = read_upload(decoded, filename or 'upload.csv', skiprows=4)
+    df = fill_missing(df)
+
+    # Clean column names:
+    return clean_columns(df)
+
+
+def parse_upload(task):
+    """
+    Rows of one dcc.Upload file, given as a (contents, filename) pair, and None, or None and the error text.
+    Importable by name, so the dashboard's ingest pool can run it in spawned worker processes.
+    """
+    contents, filename = task
+    try:
+        if contents is None:
+            return empty_frame(), None
+        content_type, content_string = contents.split(',')
+        return read_dataset(base64.b64decode(content_string), filename), None
+    except Exception as e:
+        return None, str(e)
+
+
+def filtered_view(df, filters):
+    """
+    Everything the main dashboard charts need from the rows matching the filters: the per-column totals, the
+    number of schools offering each level and the number of distinct schools
+    """
+    sums, offering = enrollment_summary(df, ALL_GENDER_COLUMNS, LEVEL_COLUMNS, filters)
+    totals = dict(zip(ALL_GENDER_COLUMNS, (int(total) for total in sums)))
+    return totals, offering, int(distinct_count(df, 'BEIS School ID', filters))
+
+
+def national_baseline(df):
+    """
+    Nationwide totals of an upload, computed once at ingest: enrollment per gender, level, grade and SHS track,
+    per enrollment column, and the number of distinct schools by 'BEIS School ID'
+    """
+    enrollment_cols = [col for col in df.columns if 'Male' in col or 'Female' in col]
+    columns = {col: int(total) for col, total in zip(enrollment_cols, column_sums(df, enrollment_cols))}
+    totals = {col: columns.get(col, 0) for col in ALL_GENDER_COLUMNS}
+
+    grades, tracks = {}, {}
+    for col, total in totals.items():
+        name = col.rsplit(' ', 1)[0]  # 'G11 ACAD ABM Male' -> 'G11 ACAD ABM'
+        if col in SENIOR_MALE or col in SENIOR_FEMALE:
+            grade, track = name.split(' ', 1)
+            tracks[track] = tracks.get(track, 0) + total
+        else:
+            grade = name
+        grades[grade] = grades.get(grade, 0) + total
+
+    return {
+        'enrollment': sum(columns.values()),
+        'schools': int(distinct_count(df, 'BEIS School ID')) if 'BEIS School ID' in df.columns else 0,
+        'gender': {gender: sum(total for col, total in totals.items() if col.endswith(f' {gender}'))
+                   for gender in ('Male', 'Female')},
+        'levels': {level: sum(totals[col] for col in cols) for level, cols in LEVEL_COLUMNS.items()},
+        'grades': grades,
+        'tracks': tracks,
+        'columns': columns,
+    }
+
+
+def add_baselines(baseline, delta):
+    """Baseline of an upload with new schools appended, from the baselines of the upload and of the new rows"""
+    combined = {'enrollment': baseline['enrollment'] + delta['enrollment'],
+                'schools': baseline['schools'] + delta['schools']}
+    for part in ('gender', 'levels', 'grades', 'tracks', 'columns'):
+        totals = dict(baseline[part])
+        for name, total in delta[part].items():
+            totals[name] = totals.get(name, 0) + total
+        combined[part] = totals
+    return combined
+
+
+def add_views(view, delta):
+    """
+    Filtered view of an upload with new schools appended, from the views of the upload and of the new rows over
+    the same filters; the new schools are never counted twice, so every part adds up
+    """
+    parts = []
+    for part, delta_part in zip(view[:2], delta[:2]):
+        totals = dict(part)
+        for name, total in delta_part.items():
+            totals[name] = totals.get(name, 0) + total
+        parts.append(totals)
+    return parts[0], parts[1], view[2] + delta[2]
+
+
+def growth_summary(present_totals, previous_totals):
+    """
+    Year-over-year numbers behind the growth card and charts, from the per-column totals of both years: overall,
+    per level (with dropouts), per SHS strand and per grade from Kinder to Grade 10
+    """
+    total_present = sum(present_totals.values())
+    total_previous = sum(previous_totals.values())
+    difference = total_present - total_previous
+
+    # Columns are matched on their grade token, so 'G1' does not pick up G10-G12
+    def level_total(column_totals, grades):
+        return sum(total for col, total in column_totals.items()
+                   if col.split(' ', 1)[0] in grades and col.endswith((' Male', ' Female')))
+
+    levels = {}
+    for label, grades in GROWTH_LEVELS.items():
+        previous, present = level_total(previous_totals, grades), level_total(present_totals, grades)
+        dropouts = max(previous - present, 0)
+        levels[label] = {'previous': previous, 'present': present, 'dropouts': dropouts,
+                         'dropout_rate': dropouts / previous * 100 if previous else 0}
+
+    def compare(columns):
+        return {'previous': sum(previous_totals.get(col, 0) for col in columns),
+                'present': sum(present_totals.get(col, 0) for col in columns)}
+
+    return {
+        'previous': total_previous,
+        'present': total_present,
+        'difference': difference,
+        'percent_change': difference / total_previous * 100 if total_previous != 0 else 0,
+        'levels': levels,
+        'strands': {strand: compare(columns) for strand, columns in STRAND_COLUMNS.items()},
+        'k10': {level: compare([f'{level} Male', f'{level} Female']) for level in K10_LEVELS},
+    }
+
+
+def selection_key(filters):
+    """Hashable form of a filter state, the same whatever the order of the selected values"""
+    return tuple(tuple(sorted((filters or {}).get(column) or [], key=str)) for column in FILTER_COLUMNS)
+
+
+def dataset_mask(key, df, filters):
+    """Row mask of a filter state over an upload's cached frame, kept for the next request"""
+    cache_key = key, selection_key(filters)
+    mask = ROW_MASKS.get(cache_key)
+    if mask is None:
+        mask = row_mask(df, filters)
+        ROW_MASKS.put(cache_key, mask)
+    return mask
+
+
+class Dataset:
+    """One loaded upload: its handle, its rows and its nationwide baseline"""
+
+    def __init__(self, key, frame, name=None):
+        self.key = key
+        self.frame = frame
+        self.name = name
+        self.baseline = dict(national_baseline(frame), dataset=key)
+
+    @property
+    def index(self):
+        """The upload's FilterIndex, built on first use"""
+        index = FILTER_INDEXES.get(self.key)
+        if index is None:
+            index = FilterIndex(self.frame)
+            FILTER_INDEXES.put(self.key, index)
+        return index
+
+    @property
+    def blocks(self):
+        """The upload's EnrollmentBlocks, built on first use"""
+        blocks = BLOCKS.get(self.key)
+        if blocks is None:
+            blocks = EnrollmentBlocks(self.frame)
+            BLOCKS.put(self.key, blocks)
+        return blocks
+
+    def view(self, filters=None):
+        """(totals, offering, schools) of the rows matching a filter state, through the view cache"""
+        filters = selections(filters)
+        key = self.key, selection_key(filters)
+        view = VIEW_CACHE.get(key)
+        if view is None:
+            view = self.blocks.view(filters)
+            VIEW_CACHE.put(key, view)
+        return view
+
+    def __repr__(self):
+        return f"<Dataset {self.name or self.key}: {self.baseline['schools']:,} schools>"
+
+
+def selections(filters=None, **columns):
+    """
+    A filter state from a dict of column -> values and/or keyword arguments, where underscores stand for spaces
+    (Modified_COC=['Purely ES']). A single value may be given without a list.
+    """
+    state = dict(filters or {})
+    state.update({name.replace('_', ' '): values for name, values in columns.items()})
+    by_name = {column.casefold(): column for column in FILTER_COLUMNS}
+    unknown = sorted(name for name in state if name.casefold() not in by_name)
+    if unknown:
+        raise ValueError(f"Unknown filter columns: {', '.join(unknown)}; expected {', '.join(FILTER_COLUMNS)}")
+    return {by_name[name.casefold()]: [values] if isinstance(values, str) or not hasattr(values, '__iter__')
+            else list(values) for name, values in state.items() if values is not None}
+
+
+def load(source, name=None):
+    """
+    Read an enrollment export (a path, its bytes, or a list of either for one export per region) into a Dataset.
+    Anything read_upload accepts works: CSV, Excel, Parquet, gzip-compressed CSV or a zip archive of them.
+    """
+    sources = source if isinstance(source, (list, tuple)) else [source]
+    parts = []
+    for item in sources:
+        if isinstance(item, (bytes, bytearray)):
+            parts.append((bytes(item), name or 'upload.csv'))
+        else:
+            with open(item, 'rb') as f:
+                parts.append((f.read(), os.path.basename(os.fspath(item))))
+    digest = hashlib.sha1()
+    for raw, _ in parts:
+        digest.update(raw)
+    key = digest.hexdigest()[:16]
+
+    # Loaded once per engine, so the Dataset's rows are always a frame of the current one; the handle, and with it
+    # the index, blocks and views, is shared by both
+    dataset = DATASETS.get((engine.ENGINE, key))
+    if dataset is None:
+        frame = concat_frames([read_dataset(raw, filename) for raw, filename in parts])
+        dataset = Dataset(key, frame, name or ', '.join(filename for _, filename in parts))
+        DATASETS.put((engine.ENGINE, key), dataset)
+    return dataset
+
+
+def filter(dataset, filters=None, **columns):
+    """The rows of a Dataset matching a filter state, as a frame of the current engine"""
+    state = selections(filters, **columns)
+    return masked_rows(dataset.frame, dataset_mask(dataset.key, dataset.frame, state))
+
+
+def _label(state):
+    return '; '.join(f"{column}={', '.join(map(str, values))}" for column, values in state.items() if values) or 'All'
+
+
+def aggregate(dataset, states, detail=False):
+    """
+    Totals of many filter states at once, as a pandas DataFrame with one row per state: schools, enrollment by
+    gender and level, and the schools offering each level. `detail` adds a column per grade, strand and gender.
+    """
+    states = [selections(state) for state in ([states] if isinstance(states, dict) else states)]
+    rows = []
+    for state in states:
+        totals, offering, schools = dataset.view(state)
+        row = {'Schools': schools, 'Enrollment': sum(totals.values()),
+               'Male': sum(total for col, total in totals.items() if col.endswith(' Male')),
+               'Female': sum(total for col, total in totals.items() if col.endswith(' Female'))}
+        for level, columns in LEVEL_COLUMNS.items():
+            row[level] = sum(totals[col] for col in columns)
+            row[f'{level} Schools'] = offering[level]
+        if detail:
+            row.update(totals)
+        rows.append(row)
+    return pd.DataFrame(rows, index=pd.Index([_label(state) for state in states], name='Filters'))
+
+
+def growth(present, previous, states=None):
+    """
+    Year-over-year change of many filter states between two Datasets, as a pandas DataFrame with one row per
+    state: enrollment of both years, the difference and the percent change, and each level's dropouts
+    """
+    states = [selections(state) for state in ([states] if isinstance(states, dict) else states or [{}])]
+    rows = []
+    for state in states:
+        summary = growth_summary(present.view(state)[0], previous.view(state)[0])
+        row = {key: summary[key] for key in ('previous', 'present', 'difference', 'percent_change')}
+        row.update({f'{level} dropouts': numbers['dropouts'] for level, numbers in summary['levels'].items()})
+        rows.append(row)
+    return pd.DataFrame(rows, index=pd.Index([_label(state) for state in states], name='Filters'))
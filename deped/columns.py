@@ -0,0 +1,50 @@
+"""Columns of the enrollment exports: the filters, and the enrollment columns per level, grade and SHS strand"""
+
+FILTER_COLUMNS = [
+    'Region', 'Province', 'Division', 'District', 'Municipality', 'Legislative District',
+    'Sector', 'School Type', 'Modified COC', 'School Subclassification'
+]
+
+# Enrollment columns per education level
+ELEMENTARY_MALE = ['K Male', 'G1 Male', 'G2 Male', 'G3 Male', 'G4 Male', 'G5 Male', 'G6 Male', 'Elem NG Male']
+ELEMENTARY_FEMALE = ['K Female', 'G1 Female', 'G2 Female', 'G3 Female', 'G4 Female', 'G5 Female', 'G6 Female',
+                     'Elem NG Female']
+JUNIOR_MALE = ['G7 Male', 'G8 Male', 'G9 Male', 'G10 Male', 'JHS NG Male']
+JUNIOR_FEMALE = ['G7 Female', 'G8 Female', 'G9 Female', 'G10 Female', 'JHS NG Female']
+SENIOR_MALE = [
+    'G11 ACAD ABM Male', 'G11 ACAD HUMSS Male', 'G11 ACAD STEM Male', 'G11 ACAD GAS Male', 'G11 ACAD PBM Male',
+    'G11 TVL Male', 'G11 SPORTS Male', 'G11 ARTS Male', 'G12 ACAD ABM Male', 'G12 ACAD HUMSS Male',
+    'G12 ACAD STEM Male', 'G12 ACAD GAS Male', 'G12 ACAD PBM Male', 'G12 TVL Male', 'G12 SPORTS Male',
+    'G12 ARTS Male'
+]
+SENIOR_FEMALE = [
+    'G11 ACAD ABM Female', 'G11 ACAD HUMSS Female', 'G11 ACAD STEM Female', 'G11 ACAD GAS Female',
+    'G11 ACAD PBM Female',
+    'G11 TVL Female', 'G11 SPORTS Female', 'G11 ARTS Female', 'G12 ACAD ABM Female', 'G12 ACAD HUMSS Female',
+    'G12 ACAD STEM Female', 'G12 ACAD GAS Female', 'G12 ACAD PBM Female', 'G12 TVL Female', 'G12 SPORTS Female',
+    'G12 ARTS Female'
+]
+ALL_GENDER_COLUMNS = ELEMENTARY_MALE + ELEMENTARY_FEMALE + JUNIOR_MALE + JUNIOR_FEMALE + SENIOR_MALE + SENIOR_FEMALE
+LEVEL_COLUMNS = {
+    'Elementary': ELEMENTARY_MALE + ELEMENTARY_FEMALE,
+    'Junior High School': JUNIOR_MALE + JUNIOR_FEMALE,
+    'Senior High School': SENIOR_MALE + SENIOR_FEMALE,
+}
+
+# Grades and SHS strands compared across school years
+GROWTH_LEVELS = {
+    'Elementary': ['K', 'G1', 'G2', 'G3', 'G4', 'G5', 'G6'],
+    'JHS': ['G7', 'G8', 'G9', 'G10'],
+    'SHS': ['G11', 'G12']
+}
+STRAND_COLUMNS = {
+    'ABM': ['G11 ACAD ABM Male', 'G11 ACAD ABM Female', 'G12 ACAD ABM Male', 'G12 ACAD ABM Female'],
+    'HUMSS': ['G11 ACAD HUMSS Male', 'G11 ACAD HUMSS Female', 'G12 ACAD HUMSS Male', 'G12 ACAD HUMSS Female'],
+    'STEM': ['G11 ACAD STEM Male', 'G11 ACAD STEM Female', 'G12 ACAD STEM Male', 'G12 ACAD STEM Female'],
+    'GAS': ['G11 ACAD GAS Male', 'G11 ACAD GAS Female', 'G12 ACAD GAS Male', 'G12 ACAD GAS Female'],
+    'PBM': ['G11 ACAD PBM Male', 'G11 ACAD PBM Female', 'G12 ACAD PBM Male', 'G12 ACAD PBM Female'],
+    'TVL': ['G11 TVL Male', 'G11 TVL Female', 'G12 TVL Male', 'G12 TVL Female'],
+    'SPORTS': ['G11 SPORTS Male', 'G11 SPORTS Female', 'G12 SPORTS Male', 'G12 SPORTS Female'],
+    'ARTS': ['G11 ARTS Male', 'G11 ARTS Female', 'G12 ARTS Male', 'G12 ARTS Female']
+}
+K10_LEVELS = ['K', 'G1', 'G2', 'G3', 'G4', 'G5', 'G6', 'Elem NG', 'G7', 'G8', 'G9', 'G10', 'JHS NG']
@@ -0,0 +1,466 @@
+"""
+Row-level ingest and aggregation of the enrollment exports on pandas or polars. pandas, NumPy and pyarrow take most
+of the import time, so they are loaded on first use.
+"""
+import codecs
+import functools
+import gzip
+import importlib
+import io
+import os
+import re
+import tempfile
+import zipfile
+
+
+class LazyModule:
+    """Stand-in for a heavy module, imported the first time one of its attributes is used"""
+
+    def __init__(self, name):
+        self._name = name
+
+    def __getattr__(self, attr):
+        module = self.__dict__.get('_module')
+        if module is None:
+            module = self.__dict__['_module'] = importlib.import_module(self._name)
+        return getattr(module, attr)
+
+
+pd = LazyModule('pandas')
+np = LazyModule('numpy')
+pa = LazyModule('pyarrow')
+pq = LazyModule('pyarrow.parquet')
+pl = None  # polars, imported by set_engine('polars')
+
+# Ingest and aggregation run on either pandas or polars. The engine is picked once at startup with the
+# DEPED_ENGINE environment variable or the --engine command line flag, and both engines return the same numbers.
+ENGINES = ('pandas', 'polars')
+ENGINE = 'pandas'
+
+
+def set_engine(name):
+    """Select the library used by the ingest and aggregation helpers"""
+    global ENGINE, pl
+    name = (name or 'pandas').strip().lower()
+    if name not in ENGINES:
+        raise ValueError(f"Unknown engine '{name}', expected one of: {', '.join(ENGINES)}")
+    if name == 'polars' and pl is None:
+        try:
+            import polars
+        except ImportError:
+            raise ImportError("The polars engine needs the 'polars' package (pip install polars)") from None
+        pl = polars
+    ENGINE = name
+    return ENGINE
+
+
+set_engine(os.environ.get('DEPED_ENGINE', 'pandas'))
+
+
+def is_polars(df):
+    return pl is not None and isinstance(df, pl.DataFrame)
+
+
+def empty_frame():
+    return pl.DataFrame() if ENGINE == 'polars' else pd.DataFrame()
+
+
+def read_csv_bytes(decoded, skiprows=4):
+    """Read a raw enrollment export, falling back to latin-1 when the file is not UTF-8"""
+    if ENGINE == 'polars':
+        try:
+            decoded.decode('utf-8')
+        except UnicodeDecodeError:
+            decoded = decoded.decode('latin-1').encode('utf-8')
+        # The polars reader parses on all cores; the full-file schema scan keeps it from failing on late odd values
+        return pl.read_csv(decoded, skip_rows=skiprows, infer_schema_length=None)
+
+    try:
+        return pd.read_csv(io.StringIO(decoded.decode('utf-8')), skiprows=skiprows)  # **EDIT HERE**
+    except UnicodeDecodeError:
+        return pd.read_csv(io.StringIO(decoded.decode('latin-1')), skiprows=skiprows)  # **EDIT HERE**
+
+
+def read_excel_bytes(decoded, skiprows=4):
+    df = pd.read_excel(io.BytesIO(decoded), skiprows=skiprows)
+    return pl.from_pandas(df) if ENGINE == 'polars' else df
+
+
+def read_parquet_bytes(decoded):
+    """Parquet uploads are written by other tools and carry no report preamble"""
+    if ENGINE == 'polars':
+        return pl.read_parquet(io.BytesIO(decoded))
+    return pd.read_parquet(io.BytesIO(decoded))
+
+
+def _parquet_ready(df):
+    """pandas columns mixing numbers and 'Not Applicable' are stored as text"""
+    df = df.copy()
+    for column in df.columns[df.dtypes == object]:
+        if pd.api.types.infer_dtype(df[column], skipna=True) != 'string':
+            df[column] = df[column].astype(str)
+    return df
+
+
+def write_parquet(df, path):
+    """Save a frame as Parquet"""
+    if is_polars(df):
+        df.write_parquet(path)
+        return
+    _parquet_ready(df).to_parquet(path, index=False)
+
+
+def arrow_table(df, schema=None):
+    """A frame as an Arrow table, cast to `schema` when given so consecutive chunks line up"""
+    table = df.to_arrow() if is_polars(df) else pa.Table.from_pandas(_parquet_ready(df), preserve_index=False)
+    return table.cast(schema) if schema is not None else table
+
+
+def read_parquet_file(path):
+    return pl.read_parquet(path) if ENGINE == 'polars' else pd.read_parquet(path)
+
+
+def _copy_as_utf8(opener, target, chunk_size=1 << 20):
+    """Copy a stream to `target` chunk by chunk, transcoding from latin-1 when it turns out not to be UTF-8"""
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    try:
+        with opener() as source:
+            for chunk in iter(lambda: source.read(chunk_size), b''):
+                decoder.decode(chunk)
+                target.write(chunk)
+            decoder.decode(b'', final=True)
+        return
+    except UnicodeDecodeError:
+        target.seek(0)
+        target.truncate()
+    with opener() as source:
+        text = io.TextIOWrapper(source, encoding='latin-1')
+        for chunk in iter(lambda: text.read(chunk_size), ''):
+            target.write(chunk.encode('utf-8'))
+
+
+def read_csv_stream(opener, skiprows=4):
+    """
+    Read a CSV from a decompressing stream. `opener` returns a fresh binary stream, so the read can restart
+    with latin-1. pandas parses the stream chunk by chunk; polars parses a spooled temporary copy on disk.
+    """
+    if ENGINE == 'polars':
+        with tempfile.NamedTemporaryFile(suffix='.csv') as copy_file:
+            _copy_as_utf8(opener, copy_file)
+            copy_file.flush()
+            return pl.read_csv(copy_file.name, skip_rows=skiprows, infer_schema_length=None)
+
+    try:
+        with opener() as stream:
+            return pd.read_csv(stream, skiprows=skiprows, encoding='utf-8')
+    except UnicodeDecodeError:
+        with opener() as stream:
+            return pd.read_csv(stream, skiprows=skiprows, encoding='latin-1')
+
+
+UPLOAD_TYPES = ('.csv', '.csv.gz', '.xls', '.xlsx', '.zip', '.parquet')
+
+
+def _read_part(opener, name, skiprows):
+    """One file of an upload, picked by the extension of its lower-cased name"""
+    if name.endswith('.parquet'):
+        with opener() as stream:
+            return read_parquet_bytes(stream.read())
+    if name.endswith('.csv'):
+        return read_csv_stream(opener, skiprows)
+    if name.endswith(('.xls', '.xlsx')):
+        with opener() as stream:
+            return read_excel_bytes(stream.read(), skiprows)
+    raise ValueError(f"unsupported file type (expected one of {', '.join(UPLOAD_TYPES)})")
+
+
+def read_upload(decoded, filename, skiprows=4):
+    """
+    Read an uploaded file by its extension: CSV, Excel, Parquet, gzip-compressed CSV, or a zip archive of
+    CSV/Excel/Parquet files (merged when their headers match). Compressed data is inflated as a stream
+    straight into the parser.
+    """
+    name = filename.lower()
+    if name.endswith('.zip'):
+        archive = zipfile.ZipFile(io.BytesIO(decoded))
+        members = [info.filename for info in archive.infolist()
+                   if not info.is_dir() and not info.filename.startswith('__MACOSX/')
+                   and info.filename.lower().endswith(('.csv', '.xls', '.xlsx', '.parquet'))]
+        if not members:
+            raise ValueError("the archive holds no CSV, Excel or Parquet file")
+        frames = [_read_part(functools.partial(archive.open, member), member.lower(), skiprows)
+                  for member in members]
+        if any(set(frame.columns) != set(frames[0].columns) for frame in frames):
+            raise ValueError("the files in the archive have different headers")
+        return concat_frames(frames)
+    if name.endswith('.gz'):
+        return _read_part(lambda: gzip.GzipFile(fileobj=io.BytesIO(decoded)), name[:-3], skiprows)
+    if name.endswith('.csv'):
+        return read_csv_bytes(decoded, skiprows)
+    return _read_part(lambda: io.BytesIO(decoded), name, skiprows)
+
+
+def clean_columns(df):
+    """Drop dashes and collapse whitespace in the column names ('G11 ACAD - ABM Male' -> 'G11 ACAD ABM Male')"""
+    if is_polars(df):
+        return df.rename({col: re.sub(r'\s+', ' ', col.replace('-', '')).strip() for col in df.columns})
+
+    df.columns = (
+        df.columns
+        .str.replace('-', '', regex=False)
+        .str.replace(r'\s+', ' ', regex=True)
+        .str.strip()
+    )
+    return df
+
+
+def fill_missing(df):
+    """Mark empty cells as 'Not Applicable', the same way the source exports do"""
+    if is_polars(df):
+        null_counts = df.null_count().row(0)
+        exprs = [pl.col(col).cast(pl.String).fill_null('Not Applicable')
+                 for col, nulls in zip(df.columns, null_counts) if nulls]
+        return df.with_columns(exprs) if exprs else df
+    return df.fillna('Not Applicable')
+
+
+def load_records(data):
+    """Rebuild a frame from the records kept in a dcc.Store"""
+    if not data:
+        return empty_frame()
+    if ENGINE == 'polars':
+        # Columns mixing numbers and 'Not Applicable' come back as strings and are cast when summed
+        return pl.from_dicts(data, infer_schema_length=None)
+    return pd.DataFrame(data)
+
+
+def to_records(df):
+    """Serialize a frame for a dcc.Store"""
+    return df.to_dicts() if is_polars(df) else df.to_dict('records')
+
+
+def _filter_expr(filters):
+    exprs = [pl.col(column).is_in(list(values)) for column, values in (filters or {}).items() if values]
+    return pl.all_horizontal(exprs) if exprs else None
+
+
+def _lazy_filtered(df, filters):
+    lf = df.lazy()
+    expr = _filter_expr(filters)
+    return lf.filter(expr) if expr is not None else lf
+
+
+def row_mask(df, filters=None):
+    """Boolean NumPy mask of the rows matching the filters"""
+    if is_polars(df):
+        expr = _filter_expr(filters)
+        if expr is None:
+            return np.ones(df.height, dtype=bool)
+        return df.select(expr.fill_null(False)).to_series().to_numpy()
+
+    mask = np.ones(len(df), dtype=bool)
+    for column, values in (filters or {}).items():
+        if values:
+            mask &= df[column].isin(values).to_numpy()
+    return mask
+
+
+def row_sums(df, columns):
+    """Per-row sum of the given enrollment columns as a NumPy array; text such as 'Not Applicable' counts as 0"""
+    columns = [col for col in columns if col in df.columns]
+    if is_polars(df):
+        if not columns:
+            return np.zeros(df.height, dtype=np.int64)
+        total = pl.sum_horizontal([pl.col(col).cast(pl.Float64, strict=False).fill_null(0) for col in columns])
+        return df.select(total).to_series().to_numpy().astype(np.int64)
+    return df[columns].apply(pd.to_numeric, errors='coerce').fillna(0).sum(axis=1).to_numpy().astype(np.int64)
+
+
+def row_chunks(df, mask, size):
+    """The masked rows in frames of at most `size` rows, at least one (possibly empty) frame"""
+    positions = np.flatnonzero(mask)
+    for start in range(0, max(len(positions), 1), size):
+        rows = positions[start:start + size]
+        yield df[rows] if is_polars(df) else df.iloc[rows]
+
+
+def row_count(df, filters=None):
+    """Number of rows matching the filters"""
+    if is_polars(df):
+        if df.is_empty():
+            return 0
+        return _lazy_filtered(df, filters).select(pl.len()).collect().item()
+    return len(apply_filters(df, filters) if filters else df)
+
+
+def distinct_count(df, column, filters=None):
+    """Number of distinct values of a column among the rows matching the filters"""
+    if is_polars(df):
+        if df.is_empty():
+            return 0
+        return _lazy_filtered(df, filters).select(pl.col(column).n_unique()).collect().item()
+    df = apply_filters(df, filters) if filters else df
+    return df[column].nunique()
+
+
+def column_sums(df, columns, filters=None):
+    """
+    Sum each of the given columns over the rows matching the filters, as a NumPy array aligned with `columns`.
+    Non-numeric cells such as 'Not Applicable' count as 0 and columns missing from the frame sum to 0.
+    """
+    if not columns:
+        return np.zeros(0, dtype=np.int64)
+
+    if is_polars(df):
+        if df.is_empty():
+            return np.zeros(len(columns), dtype=np.int64)
+        # One lazy plan for filter + all sums; the single-row result converts straight to NumPy
+        exprs = [
+            pl.col(col).cast(pl.Float64, strict=False).sum().alias(col) if col in df.columns
+            else pl.lit(0.0).alias(col)
+            for col in columns
+        ]
+        sums = _lazy_filtered(df, filters).select(exprs).collect().to_numpy().ravel()
+    else:
+        df = apply_filters(df, filters) if filters else df
+        present = [col for col in columns if col in df.columns]
+        sums = (
+            df[present].apply(pd.to_numeric, errors='coerce').sum()
+            .reindex(columns, fill_value=0)
+            .to_numpy(dtype=float)
+        )
+    return np.rint(np.nan_to_num(sums)).astype(np.int64)
+
+
+def enrollment_summary(df, columns, groups, filters=None):
+    """
+    One reduction over the enrollment matrix of the rows matching the filters. Returns the column sums aligned
+    with `columns` (as column_sums does) and, for each named group of columns, the number of rows with any
+    enrollment in that group, i.e. the schools that offer the level.
+    """
+    if is_polars(df):
+        if df.is_empty():
+            return np.zeros(len(columns), dtype=np.int64), {name: 0 for name in groups}
+
+        def numeric(col):
+            return pl.col(col).cast(pl.Float64, strict=False).fill_null(0) if col in df.columns else pl.lit(0.0)
+
+        exprs = [numeric(col).sum().alias(col) for col in columns]
+        exprs += [(pl.sum_horizontal([numeric(col) for col in cols]) > 0).sum().alias(f'__{name}')
+                  for name, cols in groups.items()]
+        row = _lazy_filtered(df, filters).select(exprs).collect().row(0)
+        sums = np.rint(np.nan_to_num(np.array(row[:len(columns)], dtype=float))).astype(np.int64)
+        return sums, {name: int(count) for name, count in zip(groups, row[len(columns):])}
+
+    df = apply_filters(df, filters) if filters else df
+    present = [col for col in columns if col in df.columns]
+    matrix = (
+        df[present].apply(pd.to_numeric, errors='coerce')
+        .reindex(columns=columns, fill_value=0)
+        .to_numpy(dtype=float, na_value=0)
+    )
+    # Column membership of each group; matrix @ membership gives every school's enrollment per group at once
+    position = {col: i for i, col in enumerate(columns)}
+    membership = np.zeros((len(columns), len(groups)))
+    for j, cols in enumerate(groups.values()):
+        membership[[position[col] for col in cols], j] = 1
+    offering = ((matrix @ membership) > 0).sum(axis=0)
+    sums = np.rint(matrix.sum(axis=0)).astype(np.int64)
+    return sums, {name: int(count) for name, count in zip(groups, offering)}
+
+
+def enrollment_matrix(df, columns):
+    """
+    The enrollment columns as an int32 NumPy matrix of rows x columns; text such as 'Not Applicable' and columns
+    missing from the frame count as 0
+    """
+    if is_polars(df):
+        exprs = [pl.col(col).cast(pl.Float64, strict=False).fill_null(0).alias(col) if col in df.columns
+                 else pl.lit(0.0).alias(col) for col in columns]
+        matrix = df.select(exprs).to_numpy() if columns else np.zeros((df.height, 0))
+    else:
+        present = [col for col in columns if col in df.columns]
+        matrix = (
+            df[present].apply(pd.to_numeric, errors='coerce')
+            .reindex(columns=columns, fill_value=0)
+            .to_numpy(dtype=float, na_value=0)
+        )
+    return np.rint(np.nan_to_num(matrix)).astype(np.int32)
+
+
+def grouped_sums(df, keys, columns):
+    """
+    Sums of the enrollment columns per combination of the key columns, in one grouped pass over the rows, as
+    (dict of key arrays, matrix of groups x columns); text such as 'Not Applicable' counts as 0
+    """
+    if is_polars(df):
+        grouped = (
+            df.lazy()
+            .group_by(keys)
+            .agg([pl.col(col).cast(pl.Float64, strict=False).fill_null(0).sum() for col in columns])
+            .collect()
+        )
+        return {key: grouped[key].to_numpy() for key in keys}, grouped.select(columns).to_numpy()
+
+    values = df[columns].apply(pd.to_numeric, errors='coerce').fillna(0)
+    grouped = values.groupby([df[key] for key in keys], dropna=False, sort=False).sum()
+    return ({key: grouped.index.get_level_values(i).to_numpy() for i, key in enumerate(keys)},
+            grouped.to_numpy())
+
+
+def masked_rows(df, mask):
+    """The rows selected by a boolean NumPy mask"""
+    return df.filter(pl.Series(mask)) if is_polars(df) else df[mask]
+
+
+def concat_frames(frames):
+    """Stack frames with the same columns, in any order; mixed column types widen as they would in one file"""
+    if len(frames) == 1:
+        return frames[0]
+    if is_polars(frames[0]):
+        return pl.concat(frames, how='diagonal_relaxed')
+    return pd.concat(frames, ignore_index=True)
+
+
+def filter_cube(df, columns):
+    """
+    Distinct schools and total enrollment for every combination of the given columns that occurs in the frame,
+    as a dict of NumPy arrays: one array per column plus 'schools' and 'enrollment'
+    """
+    gender_cols = [col for col in df.columns if 'Male' in col or 'Female' in col]
+    if is_polars(df):
+        enrollment = pl.sum_horizontal([pl.col(col).cast(pl.Float64, strict=False).fill_null(0)
+                                        for col in gender_cols]) if gender_cols else pl.lit(0.0)
+        cube = (
+            df.lazy()
+            .group_by(columns)
+            .agg(pl.col('BEIS School ID').n_unique().alias('schools'), enrollment.sum().alias('enrollment'))
+            .collect()
+        )
+        return {col: cube[col].to_numpy() for col in cube.columns}
+
+    frame = df[columns].assign(
+        schools=df['BEIS School ID'],
+        enrollment=df[gender_cols].apply(pd.to_numeric, errors='coerce').sum(axis=1),
+    )
+    cube = (
+        frame.groupby(columns, dropna=False, sort=False)
+        .agg(schools=('schools', 'nunique'), enrollment=('enrollment', 'sum'))
+        .reset_index()
+    )
+    return {col: cube[col].to_numpy() for col in cube.columns}
+
+
+def apply_filters(df, filters):
+    """Apply all active filters to the dataframe"""
+    if is_polars(df):
+        expr = _filter_expr(filters)
+        return df.filter(expr) if expr is not None and not df.is_empty() else df
+
+    if df.empty:
+        return df
+
+    for column, values in filters.items():
+        if values:
+            df = df[df[column].isin(values)]
+    return df
@@ -0,0 +1,329 @@
+"""
+Per-upload indexes and the per-process caches that hold them, keyed by the upload's handle.
+
+The dropdown options and their "(5,210 schools · 3.1M)" facet counts come from a FilterIndex, a cube of every filter
+combination built once per upload. Columns that can hold thousands of values (District, Municipality) switch to
+search past DEPED_SEARCH_THRESHOLD options and list at most DEPED_SEARCH_LIMIT matches for the typed text.
+Filtered views are summed from the upload's EnrollmentBlocks.
+"""
+import bisect
+import collections
+import copy
+import os
+import threading
+
+from .columns import ALL_GENDER_COLUMNS, FILTER_COLUMNS, LEVEL_COLUMNS
+from .engine import enrollment_matrix, filter_cube, np, pd
+
+SEARCH_COLUMNS = ('District', 'Municipality')
+SEARCH_THRESHOLD = int(os.environ.get('DEPED_SEARCH_THRESHOLD', '500'))
+SEARCH_LIMIT = int(os.environ.get('DEPED_SEARCH_LIMIT', '50'))
+
+
+def _trigrams(text, complete=True):
+    """Word-anchored trigrams; the last word of text still being typed is left open at its end"""
+    words = text.split()
+    grams = set()
+    for n, word in enumerate(words):
+        padded = f"  {word} " if complete or n < len(words) - 1 else f"  {word}"
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class ValueSearch:
+    """Prefix and trigram lookup over the sorted values of one filter column"""
+
+    def __init__(self, values):
+        self.keys = [str(value).casefold() for value in values]
+        self.by_key = sorted(range(len(self.keys)), key=self.keys.__getitem__)
+        self.sorted_keys = [self.keys[code] for code in self.by_key]
+        postings = collections.defaultdict(list)
+        for code, key in enumerate(self.keys):
+            for gram in _trigrams(key):
+                postings[gram].append(code)
+        self.postings = {gram: np.array(codes) for gram, codes in postings.items()}
+
+    def match(self, text):
+        """Value codes ranked for the text: prefix matches first, then values sharing most of its trigrams"""
+        text = text.casefold().strip()
+        start = bisect.bisect_left(self.sorted_keys, text)
+        end = bisect.bisect_left(self.sorted_keys, text + '\U0010ffff')
+        prefix = np.array(self.by_key[start:end], dtype=np.int64)
+
+        grams = _trigrams(text, complete=False)
+        scores = np.zeros(len(self.keys))
+        for gram in grams:
+            if gram in self.postings:
+                scores[self.postings[gram]] += 1
+        ranked = np.flatnonzero(scores >= max(1, (len(grams) + 1) // 2))
+        ranked = ranked[np.argsort(-scores[ranked], kind='stable')]
+        return np.concatenate([prefix, ranked[~np.isin(ranked, prefix)]])
+
+
+class FilterIndex:
+    """Filter columns of one upload, dictionary-encoded, with the schools and enrollment of each combination"""
+
+    def __init__(self, df, columns=FILTER_COLUMNS):
+        self.columns = list(columns)
+        self.values = [[] for _ in self.columns]
+        self.lookup = [{} for _ in self.columns]
+        self.codes = np.zeros((0, len(self.columns)), dtype=np.int64)
+        self.schools = np.zeros(0)
+        self.enrollment = np.zeros(0)
+        self.searches = {}
+        self._add(filter_cube(df, self.columns))
+
+    def extended(self, df):
+        """A new index with the rows of `df` added; only those rows are aggregated and this index is left as is"""
+        index = copy.copy(self)
+        index._add(filter_cube(df, self.columns))
+        return index
+
+    def _add(self, cube):
+        """Append the cells of a cube, re-encoding a column only when the cube brings new values to it"""
+        values, lookup, codes, searches = [], [], [], dict(self.searches)
+        for i, column in enumerate(self.columns):
+            cube_codes, uniques = pd.factorize(cube[column], sort=True)
+            old_codes = self.codes[:, i]
+            if all(value in self.lookup[i] for value in uniques):
+                column_values, column_lookup = self.values[i], self.lookup[i]
+            else:
+                column_values = sorted(set(self.values[i]).union(uniques))
+                column_lookup = {value: code for code, value in enumerate(column_values)}
+                # Missing values keep the code after the last value so they can be counted and ignored
+                old_codes = np.array([column_lookup[v] for v in self.values[i]] + [len(column_values)],
+                                     dtype=np.int64)[old_codes]
+                if column in SEARCH_COLUMNS:
+                    searches[i] = ValueSearch(column_values)
+            # Code -1 (missing) picks the last entry of the mapping, the missing-value code
+            mapping = np.array([column_lookup[v] for v in uniques] + [len(column_values)], dtype=np.int64)
+            codes.append(np.concatenate([old_codes, mapping[cube_codes]]))
+            values.append(column_values)
+            lookup.append(column_lookup)
+
+        self.values, self.lookup, self.searches = values, lookup, searches
+        self.codes = np.column_stack(codes) if codes else self.codes
+        self.schools = np.concatenate([self.schools, cube['schools'].astype(float)])
+        self.enrollment = np.concatenate([self.enrollment, np.nan_to_num(cube['enrollment'].astype(float))])
+
+    def _mask(self, position, selected):
+        """Cells whose value in the column is one of the selected values, or None when nothing is selected"""
+        if not selected:
+            return None
+        allowed = np.zeros(len(self.values[position]) + 1, dtype=bool)
+        allowed[[self.lookup[position][v] for v in selected if v in self.lookup[position]]] = True
+        return allowed[self.codes[:, position]]
+
+    @staticmethod
+    def _combine(masks):
+        masks = [mask for mask in masks if mask is not None]
+        return np.logical_and.reduce(masks) if masks else slice(None)
+
+    def _present(self, masks, position):
+        """Whether each value of the column occurs among the cells left by the masks"""
+        counts = np.bincount(self.codes[self._combine(masks), position], minlength=len(self.values[position]) + 1)
+        return counts[:-1] > 0
+
+    def _facet(self, masks, position):
+        """Schools and enrollment behind each value of the column among the cells left by the masks"""
+        keep = self._combine(masks)
+        codes = self.codes[keep, position]
+        size = len(self.values[position]) + 1
+        return (np.bincount(codes, weights=self.schools[keep], minlength=size),
+                np.bincount(codes, weights=self.enrollment[keep], minlength=size))
+
+    def _search(self, position, text, present, schools, selected):
+        """Selected values plus the best SEARCH_LIMIT matches for the text, or the largest values without one"""
+        lookup = self.lookup[position]
+        chosen = [lookup[v] for v in selected or [] if v in lookup and present[lookup[v]]]
+        if text and text.strip():
+            ranked = self.searches[position].match(text)
+        else:
+            ranked = np.argsort(-schools[:-1], kind='stable')
+        ranked = ranked[present[ranked]]
+        ranked = ranked[~np.isin(ranked, chosen)]
+        return chosen + ranked[:SEARCH_LIMIT].tolist()
+
+    def labelled_options(self, option_selections, facet_selections, searches=None, positions=None):
+        """
+        Dropdown options labelled 'Region IV-A (5,210 schools · 3.1M)', for every column or only `positions`.
+        Options list the values left by the option selections made before the column; counts are taken under
+        the facet selections of every other column. A column in `searches` (position -> typed text) with more
+        than SEARCH_THRESHOLD options is answered from its search index instead of listing every value.
+        """
+        option_masks = [self._mask(i, selected) for i, selected in enumerate(option_selections)]
+        facet_masks = [self._mask(i, selected) for i, selected in enumerate(facet_selections)]
+        searches = searches or {}
+        result = []
+        for i in range(len(self.columns)) if positions is None else positions:
+            present = self._present(option_masks[:i], i)
+            schools, enrollment = self._facet(facet_masks[:i] + facet_masks[i + 1:], i)
+            codes = np.flatnonzero(present).tolist()
+            if i in searches and i in self.searches and len(codes) > SEARCH_THRESHOLD:
+                codes = self._search(i, searches[i], present, schools, facet_selections[i])
+
+            column_options = []
+            for code in codes:
+                count = int(schools[code])
+                label = (f"{self.values[i][code]} ({count:,} school{'' if count == 1 else 's'} · "
+                         f"{compact_number(enrollment[code])})")
+                column_options.append({'label': label, 'value': self.values[i][code]})
+            result.append(column_options)
+        return result
+
+
+class EnrollmentBlocks:
+    """
+    Enrollment matrix of one upload stored per level: each block keeps only the rows with enrollment at that level,
+    as int32, with the filter codes present in those rows. Most schools are elementary only, so the JHS and SHS
+    blocks hold a fraction of the rows; a block none of whose rows can match the filters is skipped outright.
+    """
+
+    def __init__(self, df, columns=FILTER_COLUMNS, levels=LEVEL_COLUMNS):
+        self.columns = list(columns)
+        self.codes, self.lookup = [], []
+        for column in self.columns:
+            codes, uniques = pd.factorize(df[column].to_numpy())
+            # Missing values take the code after the last value, which no selection allows
+            self.codes.append(np.where(codes < 0, len(uniques), codes).astype(np.int32))
+            self.lookup.append({value: code for code, value in enumerate(uniques)})
+        school_codes, schools = pd.factorize(df['BEIS School ID'].to_numpy())
+        self.school_codes, self.school_count = school_codes.astype(np.int32), len(schools)
+
+        self.blocks = {}
+        for level, level_columns in levels.items():
+            matrix = enrollment_matrix(df, level_columns)
+            rows = np.flatnonzero((matrix != 0).any(axis=1))
+            values = matrix[rows]
+            present = [np.bincount(codes[rows], minlength=len(lookup) + 1) > 0
+                       for codes, lookup in zip(self.codes, self.lookup)]
+            self.blocks[level] = (level_columns, rows, values, values.sum(axis=1) > 0, present)
+
+    def _allowed(self, position, selected):
+        """Codes of the column the selected values allow, or None when nothing is selected"""
+        if not selected:
+            return None
+        allowed = np.zeros(len(self.lookup[position]) + 1, dtype=bool)
+        allowed[[self.lookup[position][v] for v in selected if v in self.lookup[position]]] = True
+        return allowed
+
+    def view(self, filters):
+        """The same (totals, offering, schools) as filtered_view over the rows matching the filters"""
+        allowed = {i: self._allowed(i, (filters or {}).get(column)) for i, column in enumerate(self.columns)}
+        allowed = {i: codes for i, codes in allowed.items() if codes is not None}
+        mask = None
+        for i, codes in allowed.items():
+            selected = codes[self.codes[i]]
+            mask = selected if mask is None else mask & selected
+
+        totals = dict.fromkeys(ALL_GENDER_COLUMNS, 0)
+        offering = {}
+        for level, (level_columns, rows, values, offers, present) in self.blocks.items():
+            offering[level] = 0
+            if any(not (codes & present[i]).any() for i, codes in allowed.items()):
+                continue
+            if mask is not None:
+                keep = mask[rows]
+                values, offers = values[keep], offers[keep]
+            sums = values.sum(axis=0, dtype=np.int64)
+            totals.update((col, int(total)) for col, total in zip(level_columns, sums))
+            offering[level] = int(offers.sum())
+
+        schools = self.school_codes if mask is None else self.school_codes[mask]
+        schools = schools[schools >= 0]
+        if mask is None:
+            count = self.school_count
+        else:
+            count = int(np.count_nonzero(np.bincount(schools, minlength=self.school_count)))
+        return totals, offering, count
+
+    def extended(self, df):
+        """
+        New blocks with the rows of `df` appended; only those rows are read and these blocks are left as is. Their
+        schools must be new to the upload, as append_upload makes sure.
+        """
+        blocks = copy.copy(self)
+        blocks.codes, blocks.lookup, remaps = [], [], []
+        for column, old_codes, old_lookup in zip(self.columns, self.codes, self.lookup):
+            codes, uniques = pd.factorize(df[column].to_numpy())
+            lookup = dict(old_lookup)
+            for value in uniques:
+                lookup.setdefault(value, len(lookup))
+            # Old codes keep their values; the missing-value code moves past the values the rows bring
+            remap = np.append(np.arange(len(old_lookup)), len(lookup))
+            mapping = np.array([lookup[value] for value in uniques] + [len(lookup)], dtype=np.int32)
+            blocks.codes.append(np.concatenate([remap[old_codes], mapping[codes]]).astype(np.int32))
+            blocks.lookup.append(lookup)
+            remaps.append(remap)
+        school_codes, schools = pd.factorize(df['BEIS School ID'].to_numpy())
+        blocks.school_codes = np.concatenate([self.school_codes,
+                                              np.where(school_codes < 0, -1, school_codes + self.school_count)
+                                              .astype(np.int32)])
+        blocks.school_count = self.school_count + len(schools)
+
+        offset = len(self.school_codes)
+        blocks.blocks = {}
+        for level, (level_columns, rows, values, offers, present) in self.blocks.items():
+            matrix = enrollment_matrix(df, level_columns)
+            new_rows = np.flatnonzero((matrix != 0).any(axis=1))
+            new_values = matrix[new_rows]
+            new_present = []
+            for codes, lookup, remap, old_present in zip(blocks.codes, blocks.lookup, remaps, present):
+                column_present = np.zeros(len(lookup) + 1, dtype=bool)
+                column_present[remap] = old_present
+                column_present |= np.bincount(codes[new_rows + offset], minlength=len(lookup) + 1) > 0
+                new_present.append(column_present)
+            blocks.blocks[level] = (level_columns, np.concatenate([rows, new_rows + offset]),
+                                    np.concatenate([values, new_values.astype(values.dtype)]),
+                                    np.concatenate([offers, new_values.sum(axis=1) > 0]), new_present)
+        return blocks
+
+    def nbytes(self):
+        """Memory held by the blocks and codes"""
+        return (sum(codes.nbytes for codes in self.codes) + self.school_codes.nbytes +
+                sum(rows.nbytes + values.nbytes + offers.nbytes for _, rows, values, offers, _ in self.blocks.values()))
+
+
+class LRUCache:
+    """Thread-safe mapping that keeps the most recently used entries of this worker"""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.limit:
+                self._entries.popitem(last=False)
+
+    def items(self):
+        with self._lock:
+            return list(self._entries.items())
+
+
+def compact_number(value):
+    """3,114,520 -> '3.1M', 45,210 -> '45.2K'"""
+    if value >= 1_000_000:
+        return f"{value / 1_000_000:.1f}M"
+    if value >= 1_000:
+        return f"{value / 1_000:.1f}K"
+    return f"{int(value):,}"
+
+
+FILTER_INDEXES = LRUCache(int(os.environ.get('DEPED_INDEX_CACHE', '16')))
+
+# Aggregates of the rows matching a filter state per (upload handle, selections)
+VIEW_CACHE = LRUCache(int(os.environ.get('DEPED_VIEW_CACHE', '256')))
+# Level blocks of the enrollment matrix per upload handle, which views are aggregated from
+BLOCKS = LRUCache(int(os.environ.get('DEPED_INDEX_CACHE', '16')))
+ROW_MASKS = LRUCache(int(os.environ.get('DEPED_MASK_CACHE', '32')))